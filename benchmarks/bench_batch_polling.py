@@ -0,0 +1,42 @@
+'''
+Measure status request rate against the number of tasks in flight.
+
+Submits N tasks with wait = False to a local fake server and reports the
+number of /checkProcessingStatus requests per second while they run, with
+and without multi-ID status support on the server.
+
+    python benchmarks/bench_batch_polling.py --latency 5 --tasks 1 4 16 64
+'''
+
+import argparse, time
+from concurrent.futures import wait
+
+from phosphomatics.phosphomatics import Phosphomatics
+from phosphomatics.transport import Transport
+from phosphomatics.fakeserver import FakePhosphomaticsServer
+
+def run(tasks, latency, batch_status):
+    with FakePhosphomaticsServer(task_latency = latency, batch_status = batch_status) as server:
+        exp = Phosphomatics(key = 'KEY', transport = Transport(server.url))
+        exp.startNewExperiment()
+        t1 = time.time()
+        wait([exp.getPCA(wait = False) for _ in range(tasks)])
+        elapsed = time.time() - t1
+        polls = server.requests['checkProcessingStatus']
+        exp.close()
+    return elapsed, polls
+
+def main():
+    parser = argparse.ArgumentParser(description = __doc__)
+    parser.add_argument('--latency', type = float, default = 5, help = 'task latency (s)')
+    parser.add_argument('--tasks', type = int, nargs = '+', default = [1, 4, 16, 64])
+    args = parser.parse_args()
+
+    print('%-14s %6s %10s %8s %10s' %('server', 'tasks', 'elapsed', 'polls', 'polls/s'))
+    for label, batch_status in (('multi-ID', True), ('single-ID', False)):
+        for tasks in args.tasks:
+            elapsed, polls = run(tasks, args.latency, batch_status)
+            print('%-14s %6d %9.2fs %8d %10.1f' %(label, tasks, elapsed, polls, polls / elapsed))
+
+if __name__ == '__main__':
+    main()
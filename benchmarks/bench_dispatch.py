@@ -0,0 +1,43 @@
+'''
+Micro-benchmarks for client-side overhead that does not involve the network:
+attribute access, token-checked method dispatch and request payload
+construction.
+
+    python benchmarks/bench_dispatch.py --number 200000
+'''
+
+import argparse, timeit
+
+from phosphomatics.phosphomatics import Phosphomatics, get_kwargs
+from phosphomatics.transport import Transport
+from phosphomatics.fakeserver import FakePhosphomaticsServer
+
+def payload(exp, substrateUPID = 'P12345', position = 15, residue = 'S', plotType = None, container = None, wait = True):
+    return exp._Phosphomatics__addArgsToDefaultDict(
+        args = get_kwargs(), target = 'makeFeatureAbundancePlot'
+    )
+
+def main():
+    parser = argparse.ArgumentParser(description = __doc__)
+    parser.add_argument('--number', type = int, default = 200000, help = 'iterations per case')
+    args = parser.parse_args()
+
+    with FakePhosphomaticsServer() as server:
+        exp = Phosphomatics(key = 'KEY', transport = Transport(server.url))
+        exp.startNewExperiment()
+
+        cases = [
+            ('attribute access', lambda: exp.datasetToken),
+            ('exempt method call', lambda: exp.getDataSetToken()),
+            ('token-checked method call', lambda: exp.setSelectedGroup('not an id')),
+            ('get_kwargs + payload', lambda: payload(exp)),
+        ]
+
+        print('%-28s %12s' %('case', 'ns / call'))
+        for name, case in cases:
+            seconds = min(timeit.repeat(case, number = args.number, repeat = 5))
+            print('%-28s %12.1f' %(name, seconds / args.number * 1e9))
+        exp.close()
+
+if __name__ == '__main__':
+    main()
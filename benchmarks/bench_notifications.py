@@ -0,0 +1,61 @@
+'''
+Completion latency and status traffic for many concurrent tasks, waited on
+by polling, by a webhook listener and by a server event stream. Slack is
+the time between a task finishing on the server and its RemoteTask
+resolving.
+
+    python benchmarks/bench_notifications.py --tasks 1000 --max-latency 10
+'''
+
+import argparse, time, random, statistics
+from concurrent.futures import wait
+
+from phosphomatics.phosphomatics import Phosphomatics
+from phosphomatics.transport import Transport
+from phosphomatics.fakeserver import FakePhosphomaticsServer
+from phosphomatics.notifications import WebhookListener, EventStreamListener
+
+MODES = {
+    'polling': lambda: None,
+    'webhook': WebhookListener,
+    'events': EventStreamListener,
+}
+
+def main():
+    parser = argparse.ArgumentParser(description = __doc__, formatter_class = argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--tasks', type = int, default = 500, help = 'concurrent tasks')
+    parser.add_argument('--max-latency', type = float, default = 8, help = 'task latencies are uniform between 0.5 s and this')
+    args = parser.parse_args()
+
+    print('%-10s %10s %10s %10s %12s' %('mode', 'mean slack', 'max slack', 'requests', 'request KB'))
+    for name, listener in MODES.items():
+        latencies = random.Random(1)
+        with FakePhosphomaticsServer(task_latency = lambda target: latencies.uniform(0.5, args.max_latency)) as server:
+            notifications = listener()
+            exp = Phosphomatics(
+                key = 'KEY', transport = Transport(server.url, pool_size = 32), progress = False,
+                notifications = notifications
+            )
+            exp.startNewExperiment()
+            server.requests.clear()
+            server.bytes_received.clear()
+
+            finished = {}
+            tasks = [exp.getPCA(wait = False) for _ in range(args.tasks)]
+            for task in tasks:
+                task.add_done_callback(lambda task: finished.__setitem__(task.taskID, time.time()))
+            wait(tasks)
+            # callbacks run just after waiters are woken, the last one may still be pending
+            end = time.time()
+
+            slack = [finished.get(_.taskID, end) - server.tasks[_.taskID][0] for _ in tasks]
+            print('%-10s %10.3f %10.3f %10s %12s' %(
+                name, statistics.mean(slack), max(slack), server.requests['checkProcessingStatus'],
+                server.bytes_received['checkProcessingStatus'] // 1024
+            ))
+            exp.close()
+            if notifications is not None:
+                notifications.close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,47 @@
+'''
+Compare task polling strategies against a local fake server.
+
+Reports, for a short and a long remote task, the wall-clock time until the
+result is returned and the number of /checkProcessingStatus requests sent.
+
+    python benchmarks/bench_polling.py --short 0.05 --long 30
+'''
+
+import argparse, time
+
+from phosphomatics.phosphomatics import Phosphomatics
+from phosphomatics.transport import Transport
+from phosphomatics.polling import FixedInterval, ExponentialBackoff
+from phosphomatics.fakeserver import FakePhosphomaticsServer
+
+STRATEGIES = [
+    ('fixed 1 s', lambda: FixedInterval(1)),
+    ('backoff', lambda: ExponentialBackoff()),
+    ('backoff + long poll', lambda: ExponentialBackoff(long_poll = 10)),
+]
+
+def run(latency, polling):
+    with FakePhosphomaticsServer(task_latency = latency) as server:
+        exp = Phosphomatics(key = 'KEY', transport = Transport(server.url), polling = polling, progress = False)
+        exp.startNewExperiment()
+        t1 = time.time()
+        exp.getUserDataGroups()
+        elapsed = time.time() - t1
+        polls = server.requests['checkProcessingStatus']
+        exp.close()
+    return elapsed, polls
+
+def main():
+    parser = argparse.ArgumentParser(description = __doc__)
+    parser.add_argument('--short', type = float, default = 0.05, help = 'short task latency (s)')
+    parser.add_argument('--long', type = float, default = 30, help = 'long task latency (s)')
+    args = parser.parse_args()
+
+    print('%-22s %-8s %10s %8s' %('strategy', 'task', 'elapsed', 'polls'))
+    for name, factory in STRATEGIES:
+        for label, latency in (('short', args.short), ('long', args.long)):
+            elapsed, polls = run(latency, factory())
+            print('\r%-22s %-8s %9.3fs %8d' %(name, label, elapsed, polls))
+
+if __name__ == '__main__':
+    main()
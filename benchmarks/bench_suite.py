@@ -0,0 +1,145 @@
+'''
+End-to-end client benchmarks against the fake server, run in a separate
+process so that it does not compete with the client for the GIL:
+
+    latency      single analysis call, reported as overhead over the task latency
+    throughput   tasks per second with N tasks in flight (wait = False)
+    upload       MB/s for uncompressed and gzip uploads of in-memory data
+    memory       peak and retained client memory per result, per decoding mode
+
+Results can be saved and compared with an earlier run:
+
+    python benchmarks/bench_suite.py --json after.json --compare before.json
+    python benchmarks/bench_suite.py --only latency memory --result-size 100000
+'''
+
+import os, io, sys, gc, json, time, argparse, statistics, subprocess, tracemalloc, contextlib
+from concurrent.futures import wait
+
+import phosphomatics
+from phosphomatics.phosphomatics import Phosphomatics
+from phosphomatics.transport import Transport
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(phosphomatics.__file__)))
+
+@contextlib.contextmanager
+def serve(**options):
+    command = [sys.executable, '-m', 'phosphomatics.fakeserver', '--port', '0']
+    for key, value in options.items():
+        command += ['--%s' %key.replace('_', '-'), str(value)]
+    env = {**os.environ, 'PYTHONPATH': os.pathsep.join([ROOT, os.environ.get('PYTHONPATH', '')])}
+    process = subprocess.Popen(command, stdout = subprocess.PIPE, env = env, text = True)
+    try:
+        yield process.stdout.readline().strip()
+    finally:
+        process.terminate()
+        process.wait()
+
+def session(url, **options):
+    exp = Phosphomatics(key = 'KEY', transport = Transport(url, pool_size = 64), progress = False, **options)
+    exp.startNewExperiment()
+    return exp
+
+def latency(args):
+    results = {}
+    for task_latency in args.latency:
+        with serve(latency = task_latency) as url:
+            exp = session(url)
+            exp.getPCA()
+            times = []
+            for _ in range(args.repeat):
+                t1 = time.perf_counter()
+                exp.getPCA()
+                times.append(time.perf_counter() - t1)
+            exp.close()
+        results['latency %ss: overhead ms' %task_latency] = (statistics.median(times) - task_latency) * 1000
+    return results
+
+def throughput(args):
+    results = {}
+    with serve(latency = args.task_latency) as url:
+        for tasks in args.tasks:
+            exp = session(url)
+            t1 = time.perf_counter()
+            wait([exp.getPCA(wait = False) for _ in range(tasks)])
+            results['throughput %s tasks: tasks/s' %tasks] = tasks / (time.perf_counter() - t1)
+            exp.close()
+    return results
+
+def upload(args):
+    results = {}
+    row = b'P12345\tS\t15\t' + b'\t'.join(b'%.4f' %(i * 1.1) for i in range(12)) + b'\n'
+    data = row * (args.upload_mb * 2 ** 20 // len(row))
+    with serve() as url:
+        exp = session(url)
+        for compression in (None, 'gzip'):
+            times = []
+            for _ in range(3):
+                t1 = time.perf_counter()
+                exp.uploadExperimentalData(io.BytesIO(data), compression = compression)
+                times.append(time.perf_counter() - t1)
+            results['upload %s: MB/s' %(compression or 'raw')] = len(data) / 2 ** 20 / min(times)
+        exp.close()
+    return results
+
+def memory(args):
+    results = {}
+    modes = [
+        ('dict', {}),
+        ('streaming', {'streaming': True}),
+        ('typed', {'typed_results': True}),
+        ('typed+streaming', {'typed_results': True, 'streaming': True}),
+    ]
+    with serve(result_size = args.result_size, container_size = args.container_size) as url:
+        for name, options in modes:
+            try:
+                exp = session(url, **options)
+            except ImportError:
+                continue
+            gc.collect()
+            tracemalloc.start()
+            result = exp.makeClusterMap()
+            retained, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            del result
+            results['memory %s: peak MB' %name] = peak / 2 ** 20
+            results['memory %s: retained MB' %name] = retained / 2 ** 20
+            exp.close()
+    return results
+
+BENCHMARKS = {'latency': latency, 'throughput': throughput, 'upload': upload, 'memory': memory}
+
+def main():
+    parser = argparse.ArgumentParser(description = __doc__, formatter_class = argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--only', nargs = '+', choices = list(BENCHMARKS), help = 'benchmarks to run, default all')
+    parser.add_argument('--latency', type = float, nargs = '+', default = [0, 0.5], help = 'task latencies for the latency benchmark')
+    parser.add_argument('--repeat', type = int, default = 10, help = 'calls per latency')
+    parser.add_argument('--task-latency', type = float, default = 1, help = 'task latency for the throughput benchmark')
+    parser.add_argument('--tasks', type = int, nargs = '+', default = [1, 16, 64, 256], help = 'tasks in flight')
+    parser.add_argument('--upload-mb', type = int, default = 64, help = 'upload size in MB')
+    parser.add_argument('--result-size', type = int, default = 50000, help = 'records per result for the memory benchmark')
+    parser.add_argument('--container-size', type = int, default = 2 ** 20, help = 'discarded container bytes per result')
+    parser.add_argument('--json', help = 'save results to this file')
+    parser.add_argument('--compare', help = 'earlier --json output to compare against')
+    args = parser.parse_args()
+
+    results = {}
+    for name in args.only or BENCHMARKS:
+        results.update(BENCHMARKS[name](args))
+
+    baseline = {}
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+
+    print('%-40s %12s %12s' %('benchmark', 'value', 'baseline' if baseline else ''))
+    for name, value in results.items():
+        before = baseline.get(name)
+        print('%-40s %12.2f %12s' %(name, value, '%.2f' %before if before is not None else ''))
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent = 1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,52 @@
+'''
+Makespan of a standard report (process, then PCA, LDA, volcano and KSEA
+for every data group) run serially and as a Workflow.
+
+    python benchmarks/bench_workflow.py --latency 0.5
+'''
+
+import argparse, time
+
+from phosphomatics.phosphomatics import Phosphomatics
+from phosphomatics.transport import Transport
+from phosphomatics.fakeserver import FakePhosphomaticsServer
+from phosphomatics.workflow import Workflow
+
+ANALYSES = ('getPCA', 'getLDA', 'makeVolcano', 'doKSEAAnslysis')
+GROUPS = (1, 2)
+
+def serial(exp):
+    exp.process()
+    for group in GROUPS:
+        exp.setSelectedGroup(group)
+        for analysis in ANALYSES:
+            getattr(exp, analysis)()
+    return len(GROUPS)
+
+def workflow(exp):
+    flow = Workflow(exp)
+    flow.add('process')
+    # declared analysis by analysis, the engine regroups them
+    for analysis in ANALYSES:
+        for group in GROUPS:
+            flow.add('%s-%s' %(analysis, group), analysis, group = group, after = ['process'])
+    flow.run()
+    return flow.switches
+
+def main():
+    parser = argparse.ArgumentParser(description = __doc__)
+    parser.add_argument('--latency', type = float, default = 0.5, help = 'task latency in seconds')
+    args = parser.parse_args()
+
+    print('%-10s %12s %10s' %('mode', 'makespan s', 'switches'))
+    for name, run in (('serial', serial), ('workflow', workflow)):
+        with FakePhosphomaticsServer(task_latency = args.latency) as server:
+            exp = Phosphomatics(key = 'KEY', transport = Transport(server.url), progress = False)
+            exp.startNewExperiment()
+            t1 = time.time()
+            switches = run(exp)
+            print('%-10s %12.2f %10s' %(name, time.time() - t1, switches))
+            exp.close()
+
+if __name__ == '__main__':
+    main()
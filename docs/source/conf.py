@@ -12,8 +12,8 @@
 #
 import os
 import sys
-sys.path.insert(0, os.path.abspath('../../phosphomatics/'))
-print(os.path.abspath('../../phosphomatics/'))
+sys.path.insert(0, os.path.abspath('../../'))
+print(os.path.abspath('../../'))
 
 # -- Project information -----------------------------------------------------
 
@@ -0,0 +1,443 @@
+import os, asyncio, time
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+from .phosphomatics import get_kwargs, DEFAULT_URL
+from .exceptions import NoDataSetTokenError, NoPhosphomaticsKey, InvalidKey, TaskTimeoutError
+from .transport import RETRY_STATUS_CODES
+from .polling import ExponentialBackoff
+from .tasks import finishedResult
+
+class AsyncTransport(object):
+    '''
+    Shared aiohttp connection pool and concurrency limiter for \
+    AsyncPhosphomatics sessions. A single transport can be shared between \
+    many sessions (e.g. one per dataset) running on the same event loop.
+
+    Args:
+        base_url (str): Root URL of the phosphomatics server.
+
+        pool_size (int): Maximum number of open connections to the server. Default = 100.
+
+        timeout (float): Total timeout in seconds for a single request. Default = 120.
+
+        retries (int): Number of times an idempotent request is retried after a connection error or a 429/502/503/504 response. Default = 3.
+
+        backoff_factor (float): Retry delays grow as backoff_factor * 2 ** attempt seconds. Default = 0.5.
+
+        max_tasks (int): Maximum number of remote tasks in flight on the server at once. None for no limit. Default = None.
+
+        max_tasks_per_dataset (int): Maximum number of remote tasks in flight for a single datasetToken. None for no limit. Default = None.
+    '''
+
+    def __init__(self, base_url, pool_size = 100, timeout = 120, retries = 3,
+            backoff_factor = 0.5, max_tasks = None, max_tasks_per_dataset = None):
+
+        if aiohttp is None:
+            raise ImportError('AsyncTransport requires aiohttp. Install it with "pip install aiohttp"')
+
+        self.base_url = base_url.rstrip('/')
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff_factor = backoff_factor
+        self.max_tasks = max_tasks
+        self.max_tasks_per_dataset = max_tasks_per_dataset
+
+        self.session = None
+        self.server_limit = None
+        self.dataset_limits = {}
+        return
+
+    def __getSession(self):
+        if self.session is None or self.session.closed:
+            self.session = aiohttp.ClientSession(
+                connector = aiohttp.TCPConnector(limit = self.pool_size),
+                timeout = aiohttp.ClientTimeout(total = self.timeout)
+            )
+        return self.session
+
+    def limit(self, datasetToken):
+        '''
+        Async context manager bounding the number of concurrent remote tasks \
+        for the server and for a given datasetToken.
+        '''
+        if self.server_limit is None and self.max_tasks:
+            self.server_limit = asyncio.Semaphore(self.max_tasks)
+        if self.max_tasks_per_dataset and datasetToken not in self.dataset_limits:
+            self.dataset_limits[datasetToken] = asyncio.Semaphore(self.max_tasks_per_dataset)
+        return _Limit(self.server_limit, self.dataset_limits.get(datasetToken))
+
+    async def post(self, endpoint, data = None, files = None, idempotent = False, timeout = None):
+        '''
+        POST to an endpoint on the server and decode the JSON response.
+
+        Args:
+            endpoint (str): Path of the endpoint, e.g. '/apiTask'.
+
+            data (dict): Form data to send. None values are dropped.
+
+            files (dict): Files to send as multipart/form-data.
+
+            idempotent (bool): If True, the request is retried with exponential backoff on connection errors and transient server errors.
+
+            timeout (float): Overrides the transport timeout for this request.
+
+        Returns:
+            Decoded JSON response, or None for an empty response body.
+        '''
+
+        attempts = self.retries + 1 if idempotent else 1
+        if timeout is not None:
+            timeout = aiohttp.ClientTimeout(total = timeout)
+
+        for attempt in range(attempts):
+            last = attempt == attempts - 1
+            try:
+                async with self.__getSession().post(
+                        self.base_url + endpoint,
+                        data = _formData(data, files),
+                        timeout = timeout) as r:
+                    if last or r.status not in RETRY_STATUS_CODES:
+                        r.raise_for_status()
+                        body = await r.read()
+                        return await r.json(content_type = None) if body else None
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+                if last: raise
+            await asyncio.sleep(self.backoff_factor * 2 ** attempt)
+        return
+
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
+        return
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+        return
+
+class _Limit(object):
+
+    def __init__(self, *semaphores):
+        self.semaphores = [_ for _ in semaphores if _ is not None]
+        return
+
+    async def __aenter__(self):
+        for semaphore in self.semaphores:
+            await semaphore.acquire()
+        return self
+
+    async def __aexit__(self, *exc):
+        for semaphore in reversed(self.semaphores):
+            semaphore.release()
+        return
+
+def _formData(data, files):
+    data = {k: str(v) for k, v in (data or {}).items() if v is not None}
+    if not files:
+        return data
+    form = aiohttp.FormData(data)
+    for name, file in files.items():
+        form.add_field(name, file, filename = getattr(file, 'name', name))
+    return form
+
+class AsyncPhosphomatics(object):
+    '''
+    asyncio version of the Phosphomatics experiment session. Every public \
+    method of Phosphomatics is available as a coroutine and remote tasks are \
+    awaited without blocking the event loop, so many analyses can be in \
+    flight at once::
+
+        async with AsyncPhosphomatics(key = 'YOUR_API_KEY') as exp:
+            exp.setDataSetToken('DATASET_TOKEN')
+            pca, lda = await asyncio.gather(exp.getPCA(), exp.getLDA())
+
+    The key is validated when the session is entered (or open() is awaited).
+
+    Args:
+        key (str): Phosphomatics API key. Contact the developers to obtain a key.
+
+        transport (AsyncTransport): Optional transport. Share one transport between sessions to share its connection pool and concurrency limits. By default a new transport to BASE_URL is created.
+
+        polling (PollingStrategy): Controls how remote tasks are waited on. Default = ExponentialBackoff().
+
+        **transport_args: Passed to AsyncTransport when no transport is given, e.g. pool_size, max_tasks, max_tasks_per_dataset.
+    '''
+
+#    BASE_URL = 'https://phosphomatics.com'
+    # PHOSPHOMATICS_URL points the client at another server, as for Phosphomatics
+    BASE_URL = os.environ.get('PHOSPHOMATICS_URL', DEFAULT_URL)
+
+    def __init__(self, key = None, transport = None, polling = None, **transport_args):
+
+        if not key:
+            raise NoPhosphomaticsKey('A phosphomatics API key must be provided')
+
+        self.datasetToken = None
+        self.key = None
+        self.__pendingKey = key
+
+        self.ownsTransport = transport is None
+        if transport is None:
+            transport = AsyncTransport(self.BASE_URL, **transport_args)
+        self.transport = transport
+        self.BASE_URL = transport.base_url
+
+        if polling is None:
+            polling = ExponentialBackoff()
+        self.polling = polling
+        return
+
+    async def open(self):
+        '''
+        Validate the API key. Called automatically when used as an async \
+        context manager.
+
+        Raises:
+            InvalidKey: Raised if the API key is not valid.
+        '''
+        if self.key is None:
+            r = await self.transport.post(
+                '/authenticateAPIKey', data = {'key': self.__pendingKey}, idempotent = True
+            )
+            if r['valid'] != 'true':
+                raise InvalidKey('The API key you have supplied is not avlid')
+            self.key = self.__pendingKey
+        return self
+
+    async def close(self):
+        '''
+        Close the transport if it was created by this session.
+        '''
+        if self.ownsTransport:
+            await self.transport.close()
+        return
+
+    async def __aenter__(self):
+        return await self.open()
+
+    async def __aexit__(self, *exc):
+        await self.close()
+        return
+
+    def __checkToken(self):
+        if not self.datasetToken:
+            raise NoDataSetTokenError(
+                'No data set token is set! Run getDataSetToken() to begin a new experiment'
+            )
+        if self.key is None:
+            raise InvalidKey('Session not opened. Use "async with" or await open() first')
+        return
+
+    def __addArgsToDefaultDict(self, args = None, target = None):
+        data = {'datasetToken': self.datasetToken, 'key': self.key, 'api': True}
+        if args:
+            data = {**data, **args}
+        if target:
+            data['apiFunctionTarget'] = target
+        return data
+
+    async def __monitorRemoteTask(self, taskID, supplemental_args = None):
+
+        data = self.__addArgsToDefaultDict(args = {'taskID': taskID})
+        if supplemental_args:
+            data = {**data, **supplemental_args}
+
+        timeout = None
+        if self.polling.long_poll:
+            data['wait'] = self.polling.long_poll
+            timeout = self.polling.long_poll + self.transport.timeout
+
+        t1 = time.time()
+
+        for delay in self.polling.delays():
+            if self.polling.timeout is not None and \
+                    time.time() + delay - t1 > self.polling.timeout:
+                raise TaskTimeoutError(
+                    'Task %s did not finish within %s s' %(taskID, self.polling.timeout)
+                )
+            await asyncio.sleep(delay)
+
+            r = await self.transport.post(
+                '/checkProcessingStatus', data = data, idempotent = True, timeout = timeout
+            )
+            r = finishedResult(r)
+            if r is not None:
+                return r
+        return
+
+    async def __apiTask(self, target, kwargs):
+        self.__checkToken()
+        data = self.__addArgsToDefaultDict(args = kwargs, target = target)
+        async with self.transport.limit(self.datasetToken):
+            r = await self.transport.post('/apiTask', data = data)
+            return await self.__monitorRemoteTask(r['taskID'])
+
+    def setDataSetToken(self, datasetToken):
+        '''
+        Sets the datasetToken for a prior phosphomatics analysis.
+
+        Args:
+            datasetToken (str): An existing phosphomaitcs datasetToken
+        '''
+        self.datasetToken = datasetToken
+        return
+
+    def getDataSetToken(self):
+        '''
+        Get the datasetToken for the current analysis.
+
+        Returns:
+            DatasetToken for the current analysis
+        '''
+        return self.datasetToken
+
+    async def startNewExperiment(self):
+        '''
+        Coroutine version of :meth:`Phosphomatics.startNewExperiment`.
+
+        Raises:
+            NoPhosphomaticsKey: Raised if the session was not opened, so no validated key is available.
+        '''
+        if self.key is None:
+            raise NoPhosphomaticsKey('Session not opened. Use "async with" or await open() first')
+        r = await self.transport.post('/getNewDataSetToken', data = {'key': self.key})
+        try:
+            self.datasetToken = r['datasetToken']
+        except Exception as e:
+            raise Exception('Error getting data set token')
+        return self.getDataSetToken()
+
+    async def __upload(self, endpoint, file):
+        self.__checkToken()
+        data = self.__addArgsToDefaultDict()
+        if isinstance(file, str):
+            with open(file, 'rb') as f:
+                await self.transport.post(endpoint, data = data, files = {'file': f})
+        else:
+            await self.transport.post(endpoint, data = data, files = {'file': file})
+        return
+
+    async def uploadExperimentalData(self, file):
+        '''
+        Coroutine version of :meth:`Phosphomatics.uploadExperimentalData`.
+        '''
+        await self.__upload('/uploadExperimentalData', file)
+        return
+
+    async def uploadParameterSet(self, file):
+        '''
+        Coroutine version of :meth:`Phosphomatics.uploadParameterSet`.
+        '''
+        await self.__upload('/uploadParameterSet', file)
+        return
+
+    async def process(self):
+        '''
+        Coroutine version of :meth:`Phosphomatics.process`.
+        '''
+        self.__checkToken()
+        args = {'url': '/processSampleGroupings'}
+        data = self.__addArgsToDefaultDict(args = args)
+        async with self.transport.limit(self.datasetToken):
+            r = await self.transport.post('/process', data = data)
+            await self.__monitorRemoteTask(r['taskID'], supplemental_args = args)
+        return
+
+    async def volcano(self, kwargs):
+        return await self.__apiTask('getVolcanoPlot', kwargs)
+
+    async def getUserDataGroups(self):
+        '''
+        Coroutine version of :meth:`Phosphomatics.getUserDataGroups`.
+        '''
+        result = await self.__apiTask('getUserDataGroups', {})
+        return result['userDataGroups']
+
+    async def getActiveDataGroup(self):
+        '''
+        Coroutine version of :meth:`Phosphomatics.getActiveDataGroup`.
+        '''
+        groups = await self.getUserDataGroups()
+        selected_group = [_ for _ in groups if _['selected'] == 'true']
+        if selected_group:
+            return selected_group[0]
+        else:
+            return None
+
+    async def setSelectedGroup(self, id = None):
+        '''
+        Coroutine version of :meth:`Phosphomatics.setSelectedGroup`.
+        '''
+        if not isinstance(id, int):
+            return None
+        self.__checkToken()
+        data = self.__addArgsToDefaultDict(args = {'groupid': str(id)}, target = 'setSelectedGroup')
+        await self.transport.post('/apiTask', data = data)
+        return
+
+    async def makeDistributionPlot(self, sample = None):
+        return await self.__apiTask('makeDistributionPlot', get_kwargs())
+
+    async def makeCorrelationMatrix(self, method = None, transform = None, container = None):
+        return await self.__apiTask('makeCorrelationMatrix', get_kwargs())
+
+    async def makeQuantilePlot(self, container = None, sample = None):
+        return await self.__apiTask('makeQuantilePlot', get_kwargs())
+
+    async def makeClusterMap(self, fc = None, pval = None, pvalType = None, numClusters = None, transformation = None, metric = None, method = None, container = None, targetClusters = None):
+        return await self.__apiTask('makeClusterMap', get_kwargs())
+
+    async def getPCA(self, pval = 0.5, pvalType = 'raw', fc = 0.5, transformation = None):
+        '''
+        Coroutine version of :meth:`Phosphomatics.getPCA`.
+        '''
+        return await self.__apiTask('getPCAPlot', get_kwargs())
+
+    async def getLDA(self, pval = 0.5, pvalType = 'raw', fc = 0.5, transformation = None):
+        '''
+        Coroutine version of :meth:`Phosphomatics.getLDA`.
+        '''
+        return await self.__apiTask('getLDAPlot', get_kwargs())
+
+    async def makeVolcano(self, fc = None, pval = None, pvalType = None, group1 = None, group2 = None, container = None):
+        return await self.__apiTask('makeVolcano', get_kwargs())
+
+    async def makeSCurve(self, group1 = None, group2 = None, container = None):
+        return await self.__apiTask('makeSCurve', get_kwargs())
+
+    async def doKSEAAnslysis(self, group1 = None, group2 = None, networkin = None, networkinThreshold = None, mThreshold = None, pThreshold = None, container = None):
+        return await self.__apiTask('doKSEAAnslysis', get_kwargs())
+
+    async def makePhosphorylationNetworks(self, group1 = None, group2 = None, specificity = None, container = None):
+        return await self.__apiTask('makePhosphorylationNetworks', get_kwargs())
+
+    async def getEnrichmentForProteinList(self, container = None):
+        return await self.__apiTask('getEnrichmentForProteinList', get_kwargs())
+
+    async def getSequenceAnslysis(self, displayType = None, palette = None, showN = None, container = None):
+        return await self.__apiTask('getSequenceAnslysis', get_kwargs())
+
+    async def makeKinaseClusterMap(self, numClusters = None, transformation = None, palette = None, metric = None, method = None, specificity = None, container = None, targetClusters = None):
+        return await self.__apiTask('makeKinaseClusterMap', get_kwargs())
+
+    async def makeKinaseVolcanoPlot(self, fc = None, pval = None, pvalType = None, group1 = None, group2 = None, container = None, specificity = None):
+        return await self.__apiTask('makeKinaseVolcanoPlot', get_kwargs())
+
+    async def makeKinaseSCurve(self, group1 = None, group2 = None, specificity = None, container = None):
+        return await self.__apiTask('makeKinaseSCurve', get_kwargs())
+
+    async def getQuantitationPlotForSelectedKinase(self, specificity = None, kinaseUPID = None, plotType = None, container = None):
+        return await self.__apiTask('getQuantitationPlotForSelectedKinase', get_kwargs())
+
+    async def makeSubstrateCorrelationPlot(self, substrateUPID = None, position = None, residue = None, topN = None, method = None, plotType = None, container = None):
+        return await self.__apiTask('makeSubstrateCorrelationPlot', get_kwargs())
+
+    async def makeFeatureAbundancePlot(self, substrateUPID = None, position = None, residue = None, plotType = None, container = None):
+        return await self.__apiTask('makeFeatureAbundancePlot', get_kwargs())
@@ -0,0 +1,316 @@
+import os, csv, json, threading, tempfile, traceback
+from concurrent.futures import ThreadPoolExecutor
+
+from .phosphomatics import Phosphomatics
+from .journal import TaskJournal
+from .transport import Transport
+from .parameters import ParameterSet
+from .streaming import writeResult
+from .writers import SINKS
+
+STAGE_LIMITS = {'upload': 2, 'process': 8, 'analysis': 8}
+
+FORMATS = ('json', 'csv', 'parquet', 'arrow', 'hdf5')
+
+def saveResult(result, path, format = 'json', target = None, partition = None):
+    '''
+    Write an analysis result to disk.
+
+    With format 'json' the result is written to <path>.json. With 'csv', \
+    'parquet', 'arrow' (Arrow IPC) or 'hdf5' a directory <path> is created \
+    holding one table per list of records in the result (<key>.csv, \
+    <key>.parquet, ...) and the remaining fields in fields.json. Parquet \
+    and Arrow require pyarrow, HDF5 requires h5py; these are written by \
+    the sinks in phosphomatics.writers.
+
+    Args:
+        result: Analysis result, a dict, Result or list of records.
+
+        path (str): Output path without extension.
+
+        format (str): One of 'json', 'csv', 'parquet', 'arrow' or 'hdf5'. Default = 'json'.
+
+        target (str): apiFunctionTarget of the result, used to look up its table schema. Default = None.
+
+        partition (dict): Partition values for 'parquet' and 'arrow', see TableSink. Default = None.
+
+    Returns:
+        List of files written.
+    '''
+    if format not in FORMATS:
+        raise ValueError('format must be one of %s, not "%s"' %(', '.join(FORMATS), format))
+
+    if hasattr(result, 'raw'):
+        target = target or result.target
+        result = result.raw
+    if isinstance(result, list):
+        result = {'data': result}
+
+    if format == 'json':
+        with open(path + '.json', 'w') as f:
+            json.dump(result, f)
+        return [path + '.json']
+
+    if format in SINKS:
+        sink = SINKS[format](path, partition = partition)
+        writeResult(sink, result or {}, target = target)
+        return sink.written
+
+    os.makedirs(path, exist_ok = True)
+    written, fields = [], {}
+    for key, value in (result or {}).items():
+        if not (isinstance(value, list) and value and all(isinstance(_, dict) for _ in value)):
+            fields[key] = value
+            continue
+        file = os.path.join(path, '%s.%s' %(key, format))
+        names = list(dict.fromkeys(name for record in value for name in record))
+        with open(file, 'w', newline = '') as f:
+            writer = csv.DictWriter(f, names)
+            writer.writeheader()
+            writer.writerows(value)
+        written.append(file)
+
+    file = os.path.join(path, 'fields.json')
+    with open(file, 'w') as f:
+        json.dump(fields, f)
+    return written + [file]
+
+def readManifest(manifest):
+    '''
+    Read a batch manifest.
+
+    A manifest lists one dataset per row (CSV) or list item (YAML, either a \
+    list or a mapping with a 'datasets' list). Each dataset has a 'data' \
+    and a 'parameters' file and an optional unique 'name', which defaults \
+    to the data file name without extension. Relative paths are resolved \
+    against the directory of the manifest.
+
+    Args:
+        manifest (str): Path to a .csv, .yaml or .yml manifest, or a list of dicts.
+
+    Returns:
+        List of dicts with keys name, data and parameters.
+    '''
+    root = ''
+    if isinstance(manifest, str):
+        root = os.path.dirname(os.path.abspath(manifest))
+        if manifest.endswith(('.yaml', '.yml')):
+            import yaml
+            with open(manifest) as f:
+                entries = yaml.safe_load(f) or []
+            if isinstance(entries, dict):
+                entries = entries.get('datasets', [])
+        else:
+            with open(manifest, newline = '') as f:
+                entries = list(csv.DictReader(f))
+    else:
+        entries = manifest
+
+    datasets, names = [], set()
+    for i, entry in enumerate(entries):
+        if not entry.get('data') or not entry.get('parameters'):
+            raise ValueError('Manifest entry %s needs both "data" and "parameters"' %(i + 1))
+        dataset = {
+            'data': os.path.join(root, entry['data']),
+            'parameters': os.path.join(root, entry['parameters']),
+        }
+        dataset['name'] = entry.get('name') or os.path.splitext(os.path.basename(entry['data']))[0]
+        if dataset['name'] in names:
+            raise ValueError('Duplicate dataset name "%s" in manifest' %dataset['name'])
+        names.add(dataset['name'])
+        datasets.append(dataset)
+    return datasets
+
+class BatchState(object):
+    '''
+    Resumable record of batch progress stored as JSON. Written atomically \
+    after every completed stage so a crashed batch can continue where it \
+    stopped.
+
+    Args:
+        path (str): State file location.
+    '''
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.datasets = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                self.datasets = json.load(f)
+        return
+
+    def get(self, name):
+        with self.lock:
+            return dict(self.datasets.get(name, {}))
+
+    def update(self, name, **values):
+        with self.lock:
+            self.datasets.setdefault(name, {}).update(values)
+            directory = os.path.dirname(os.path.abspath(self.path))
+            fd, tmp = tempfile.mkstemp(dir = directory, suffix = '.tmp')
+            with os.fdopen(fd, 'w') as f:
+                json.dump(self.datasets, f, indent = 1)
+            os.replace(tmp, self.path)
+        return
+
+class BatchRunner(object):
+    '''
+    Run the full pipeline (startNewExperiment, upload data and parameters, \
+    process, analyses) for many datasets concurrently::
+
+        runner = BatchRunner('YOUR_API_KEY', 'manifest.csv', 'results',
+            analyses = {'getPCA': {}, 'getLDA': {'pval': 0.05}})
+        summary = runner.run()
+
+    Each analysis result is written to <output>/<dataset name>/<analysis>.json \
+    (or a directory of tables, see saveResult()). \
+    Progress is recorded in a state file; running the same batch again \
+    skips completed stages and reuses existing datasetTokens. Submitted \
+    tasks are recorded in a task journal, so a batch restarted while \
+    processing or analyses were running waits on those tasks instead of \
+    submitting them again.
+
+    Args:
+        key (str): Phosphomatics API key.
+
+        manifest: Manifest path or list of dataset dicts, see readManifest().
+
+        output (str): Output directory.
+
+        analyses (dict): Analyses to run after processing, as label: kwargs. The label is the Phosphomatics method name unless kwargs contains a 'method' key. Default = None (process only).
+
+        jobs (int): Number of datasets processed concurrently. Default = 4.
+
+        stage_limits (dict): Maximum concurrent 'upload', 'process' and 'analysis' stages across all datasets. Uploads are limited by bandwidth and processing by the server. Default = {'upload': 2, 'process': 8, 'analysis': 8}.
+
+        state (str): State file. Default = <output>/batch_state.json.
+
+        validate (bool): Validate each parameter file against its data file header before uploading (requires PyYAML). Default = True.
+
+        format (str): Result format, one of FORMATS. See saveResult(). Default = 'json'.
+
+        partition (bool): With format 'parquet' or 'arrow', append the results of all datasets to one partitioned table per analysis and records key, <output>/<analysis>/<key>/dataset=<name>/part-0.parquet, instead of writing them per dataset. The tables can be queried while the batch runs, e.g. with pyarrow.dataset.dataset('<output>/getPCA/data', partitioning = 'hive'). Default = False.
+
+        transport (Transport): Transport shared by all sessions. Default = a new Transport with a pool large enough for all jobs.
+
+        journal (TaskJournal or str): Task journal shared by all sessions, or the path of one. Default = <output>/batch_journal.sqlite.
+
+        **session_args: Passed to every Phosphomatics session, e.g. polling or cache.
+    '''
+
+    def __init__(self, key, manifest, output, analyses = None, jobs = 4,
+            stage_limits = None, state = None, validate = True, format = 'json', partition = False, transport = None,
+            journal = None, **session_args):
+
+        self.key = key
+        self.datasets = readManifest(manifest)
+        self.output = output
+        self.analyses = analyses or {}
+        self.jobs = jobs
+        self.validate = validate
+        if format not in FORMATS:
+            raise ValueError('format must be one of %s, not "%s"' %(', '.join(FORMATS), format))
+        self.format = format
+        if partition and format not in ('parquet', 'arrow'):
+            raise ValueError('partition requires format "parquet" or "arrow", not "%s"' %format)
+        self.partition = partition
+        self.session_args = session_args
+
+        limits = {**STAGE_LIMITS, **(stage_limits or {})}
+        self.limits = {k: threading.BoundedSemaphore(v) for k, v in limits.items()}
+
+        os.makedirs(output, exist_ok = True)
+        self.state = BatchState(state or os.path.join(output, 'batch_state.json'))
+
+        if not isinstance(journal, TaskJournal):
+            journal = TaskJournal(journal or os.path.join(output, 'batch_journal.sqlite'))
+        self.journal = journal
+
+        if transport is None:
+            transport = Transport(Phosphomatics.BASE_URL, pool_size = max(10, 2 * jobs))
+        self.transport = transport
+        return
+
+    def run(self):
+        '''
+        Run every dataset in the manifest.
+
+        Returns:
+            Dict mapping dataset name to 'done' or the error message for failed datasets.
+        '''
+        with ThreadPoolExecutor(max_workers = self.jobs) as pool:
+            futures = {
+                dataset['name']: pool.submit(self.runDataset, dataset)
+                for dataset in self.datasets
+            }
+        return {name: future.result() for name, future in futures.items()}
+
+    def runDataset(self, dataset):
+        '''
+        Run the pipeline for one manifest entry, resuming from the state file.
+
+        Returns:
+            'done', or the error message if the pipeline failed.
+        '''
+        name = dataset['name']
+        try:
+            self.__run(dataset)
+        except Exception as e:
+            self.state.update(name, error = '%s: %s' %(type(e).__name__, e), traceback = traceback.format_exc())
+            return '%s: %s' %(type(e).__name__, e)
+        self.state.update(name, error = None, traceback = None)
+        return 'done'
+
+    def __run(self, dataset):
+        name = dataset['name']
+        state = self.state.get(name)
+        stages = set(state.get('stages', []))
+        directory = os.path.join(self.output, name)
+        os.makedirs(directory, exist_ok = True)
+
+        def done(stage):
+            stages.add(stage)
+            self.state.update(name, stages = sorted(stages))
+
+        exp = Phosphomatics(key = self.key, transport = self.transport, journal = self.journal, **self.session_args)
+
+        if state.get('datasetToken'):
+            exp.setDataSetToken(state['datasetToken'])
+        else:
+            if self.validate:
+                ParameterSet.fromFile(dataset['parameters']).validate(data = dataset['data'])
+            self.state.update(name, datasetToken = exp.startNewExperiment())
+
+        if 'upload' not in stages:
+            with self.limits['upload']:
+                exp.uploadExperimentalData(dataset['data'])
+                exp.uploadParameterSet(dataset['parameters'])
+            done('upload')
+
+        if 'process' not in stages:
+            with self.limits['process']:
+                # re-attaches to processing journaled by a run that stopped
+                exp.process()
+            done('process')
+
+        pending = [_ for _ in self.analyses if 'analysis:%s' %_ not in stages]
+        if not pending:
+            return
+
+        with self.limits['analysis']:
+            tasks = {}
+            for label in pending:
+                kwargs = dict(self.analyses[label] or {})
+                method = kwargs.pop('method', label)
+                tasks[label] = getattr(exp, method)(wait = False, **kwargs)
+            for label, task in tasks.items():
+                if self.partition:
+                    saveResult(
+                        task.result(), os.path.join(self.output, label), self.format,
+                        target = task.target, partition = {'dataset': name}
+                    )
+                else:
+                    saveResult(task.result(), os.path.join(directory, label), self.format, target = task.target)
+                done('analysis:%s' %label)
+        return
@@ -0,0 +1,232 @@
+import os, json, time, copy, hashlib, threading, tempfile, collections
+
+def cacheKey(datasetToken, target, kwargs):
+    '''
+    Content address for an analysis result.
+
+    Args:
+        datasetToken (str): Dataset the analysis ran on.
+
+        target (str): apiFunctionTarget of the analysis.
+
+        kwargs (dict): Analysis arguments as produced by get_kwargs().
+
+    Returns:
+        Hex digest identifying the result.
+    '''
+    payload = json.dumps([datasetToken, target, kwargs], sort_keys = True, default = str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+class ResultCache(object):
+    '''
+    Base class for analysis result caches. Results are stored per \
+    datasetToken so that everything computed for a dataset can be dropped \
+    at once when its data, parameters or selected group change.
+    '''
+
+    def get(self, datasetToken, key):
+        '''
+        Returns:
+            The cached result, or None if there is no valid entry.
+        '''
+        raise NotImplementedError
+
+    def set(self, datasetToken, key, result):
+        raise NotImplementedError
+
+    def invalidate(self, datasetToken):
+        '''
+        Drop every cached result for a dataset.
+        '''
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+class MemoryCache(ResultCache):
+    '''
+    In-memory least-recently-used result cache.
+
+    Args:
+        maxsize (int): Maximum number of results kept. Default = 128.
+
+        ttl (float): Seconds after which a result expires. None to keep results until evicted. Default = None.
+    '''
+
+    def __init__(self, maxsize = 128, ttl = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.entries = collections.OrderedDict()
+        self.lock = threading.Lock()
+        return
+
+    def get(self, datasetToken, key):
+        with self.lock:
+            entry = self.entries.get((datasetToken, key))
+            if entry is None:
+                return None
+            created, result = entry
+            if self.ttl is not None and time.time() - created > self.ttl:
+                del self.entries[(datasetToken, key)]
+                return None
+            self.entries.move_to_end((datasetToken, key))
+        return copy.deepcopy(result)
+
+    def set(self, datasetToken, key, result):
+        with self.lock:
+            self.entries[(datasetToken, key)] = (time.time(), copy.deepcopy(result))
+            self.entries.move_to_end((datasetToken, key))
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last = False)
+        return
+
+    def invalidate(self, datasetToken):
+        with self.lock:
+            for k in [_ for _ in self.entries if _[0] == datasetToken]:
+                del self.entries[k]
+        return
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+        return
+
+class DiskCache(ResultCache):
+    '''
+    On-disk result cache that can be shared between processes. Each result \
+    is stored as a JSON file under a directory per datasetToken.
+
+    Args:
+        path (str): Cache directory. Created if it does not exist.
+
+        max_size (int): Maximum total size of cached results in bytes. Least recently used results are evicted first. None for no limit. Default = 1 GB.
+
+        ttl (float): Seconds after which a result expires. None to keep results until evicted. Default = None.
+    '''
+
+    def __init__(self, path, max_size = 2 ** 30, ttl = None):
+        self.path = path
+        self.max_size = max_size
+        self.ttl = ttl
+        os.makedirs(path, exist_ok = True)
+        return
+
+    def __datasetDir(self, datasetToken):
+        return os.path.join(
+            self.path, hashlib.sha256(str(datasetToken).encode()).hexdigest()[:32]
+        )
+
+    def __file(self, datasetToken, key):
+        return os.path.join(self.__datasetDir(datasetToken), key + '.json')
+
+    def get(self, datasetToken, key):
+        file = self.__file(datasetToken, key)
+        try:
+            with open(file) as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if self.ttl is not None and time.time() - entry['created'] > self.ttl:
+            _remove(file)
+            return None
+        try:
+            os.utime(file)
+        except OSError:
+            pass
+        return entry['result']
+
+    def set(self, datasetToken, key, result):
+        directory = self.__datasetDir(datasetToken)
+        os.makedirs(directory, exist_ok = True)
+        fd, tmp = tempfile.mkstemp(dir = directory, suffix = '.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump({'created': time.time(), 'result': result}, f)
+        os.replace(tmp, self.__file(datasetToken, key))
+        if self.max_size is not None:
+            self.__evict()
+        return
+
+    def __entries(self):
+        for root, _, files in os.walk(self.path):
+            for name in files:
+                if name.endswith('.json'):
+                    file = os.path.join(root, name)
+                    try:
+                        yield file, os.stat(file)
+                    except OSError:
+                        pass
+
+    def __evict(self):
+        entries = sorted(self.__entries(), key = lambda _: _[1].st_mtime)
+        total = sum(stat.st_size for _, stat in entries)
+        for file, stat in entries:
+            if total <= self.max_size:
+                break
+            _remove(file)
+            total -= stat.st_size
+        return
+
+    def invalidate(self, datasetToken):
+        directory = self.__datasetDir(datasetToken)
+        if os.path.isdir(directory):
+            for name in os.listdir(directory):
+                _remove(os.path.join(directory, name))
+        return
+
+    def clear(self):
+        for file, _ in list(self.__entries()):
+            _remove(file)
+        return
+
+def _remove(file):
+    try:
+        os.remove(file)
+    except OSError:
+        pass
+    return
+
+class KeyCache(object):
+    '''
+    Record of API keys the server has recently accepted, so that new \
+    sessions can skip the /authenticateAPIKey round trip. Stored as one \
+    empty marker file per key and server under path, named by a hash; the \
+    key itself is never written. Can be shared between processes.
+
+    Args:
+        path (str): Cache directory. Created if it does not exist. Default = ~/.phosphomatics/keys.
+
+        ttl (float): Seconds a validation is trusted for. Default = 3600.
+    '''
+
+    def __init__(self, path = None, ttl = 3600):
+        if path is None:
+            path = os.path.join(os.path.expanduser('~'), '.phosphomatics', 'keys')
+        self.path = path
+        self.ttl = ttl
+        os.makedirs(path, mode = 0o700, exist_ok = True)
+        return
+
+    def __file(self, url, key):
+        return os.path.join(self.path, hashlib.sha256(('%s\n%s' %(url, key)).encode()).hexdigest())
+
+    def valid(self, url, key):
+        '''
+        Returns:
+            True if key was accepted by the server at url less than ttl seconds ago.
+        '''
+        try:
+            validated = os.stat(self.__file(url, key)).st_mtime
+        except OSError:
+            return False
+        return time.time() - validated <= self.ttl
+
+    def set(self, url, key):
+        file = self.__file(url, key)
+        with open(file, 'a'):
+            pass
+        os.utime(file)
+        return
+
+    def discard(self, url, key):
+        _remove(self.__file(url, key))
+        return
@@ -0,0 +1,255 @@
+'''
+Command line interface::
+
+    phosphomatics new
+    phosphomatics upload --token TOKEN --data data.tsv --parameters parameters.yaml
+    phosphomatics process --token TOKEN
+    phosphomatics run getPCA makeVolcano --token TOKEN --arg fc=1 --format parquet --output results
+    phosphomatics pipeline manifest.csv --analysis getPCA --jobs 8 --output results
+
+The API key is read from --key, the PHOSPHOMATICS_API_KEY environment \
+variable or the system keyring (service 'phosphomatics', username \
+'api_key', requires the keyring package), in that order. The dataset \
+token can be given with --token or PHOSPHOMATICS_DATASET_TOKEN.
+
+Only argparse is imported at startup; the client and its dependencies are \
+imported once a command runs, so --help stays fast.
+'''
+
+import os, sys, json, argparse, contextlib
+
+KEY_VARIABLE = 'PHOSPHOMATICS_API_KEY'
+TOKEN_VARIABLE = 'PHOSPHOMATICS_DATASET_TOKEN'
+URL_VARIABLE = 'PHOSPHOMATICS_URL'
+# phosphomatics.phosphomatics.DEFAULT_URL, repeated so that --help does not import the client
+DEFAULT_URL = 'http://127.0.0.1:8000'
+
+class CommandError(Exception):
+    pass
+
+def getKey(key = None):
+    '''
+    API key from the argument, the environment or the keyring.
+    '''
+    if key:
+        return key
+    if os.environ.get(KEY_VARIABLE):
+        return os.environ[KEY_VARIABLE]
+    try:
+        import keyring
+    except ImportError:
+        keyring = None
+    if keyring is not None:
+        key = keyring.get_password('phosphomatics', 'api_key')
+        if key:
+            return key
+    raise CommandError(
+        'No API key. Pass --key, set %s or store it with "keyring set phosphomatics api_key"' %KEY_VARIABLE
+    )
+
+def parseArgs(pairs):
+    '''
+    Parse KEY=VALUE analysis arguments. Values are decoded as JSON where \
+    possible, so numbers, true/false and null keep their type; anything \
+    else is a string.
+    '''
+    kwargs = {}
+    for pair in pairs or []:
+        if '=' not in pair:
+            raise CommandError('Analysis arguments must be KEY=VALUE, not "%s"' %pair)
+        key, value = pair.split('=', 1)
+        try:
+            kwargs[key] = json.loads(value)
+        except ValueError:
+            kwargs[key] = value
+    return kwargs
+
+def session(args, token = True):
+    from .phosphomatics import Phosphomatics
+    from .transport import Transport
+    from .cache import KeyCache
+
+    # commands that restore a dataset token do not need to validate the key
+    url = args.url or Phosphomatics.BASE_URL
+    exp = Phosphomatics(
+        key = getKey(args.key), transport = Transport(url, pool_size = max(10, args.jobs)),
+        journal = args.journal, key_cache = KeyCache(), lazy_auth = True
+    )
+    if token:
+        datasetToken = args.token or os.environ.get(TOKEN_VARIABLE)
+        if not datasetToken:
+            raise CommandError('No dataset token. Pass --token or set %s' %TOKEN_VARIABLE)
+        exp.setDataSetToken(datasetToken)
+    return exp
+
+def emit(results, args):
+    '''
+    Write results to --output in --format, or as JSON to stdout.
+    '''
+    if not args.output:
+        if args.format != 'json':
+            raise CommandError('--format %s requires --output' %args.format)
+        json.dump(results, args.stdout, indent = 1, default = lambda _: getattr(_, 'raw', str(_)))
+        args.stdout.write('\n')
+        return
+
+    from .batch import saveResult
+
+    os.makedirs(args.output, exist_ok = True)
+    for label, result in results.items():
+        for path in saveResult(result, os.path.join(args.output, label), args.format):
+            print(path, file = args.stdout)
+    return
+
+def new(args):
+    exp = session(args, token = False)
+    print(exp.startNewExperiment(), file = args.stdout)
+    exp.close()
+    return
+
+def upload(args):
+    if not args.data and not args.parameters:
+        raise CommandError('Nothing to upload. Pass --data and/or --parameters')
+    exp = session(args)
+    if args.parameters and args.validate:
+        from .parameters import ParameterSet
+        ParameterSet.fromFile(args.parameters).validate(data = args.data)
+    if args.data:
+        exp.uploadExperimentalData(args.data, compression = args.compression)
+    if args.parameters:
+        exp.uploadParameterSet(args.parameters)
+    exp.close()
+    return
+
+def process(args):
+    exp = session(args)
+    exp.process()
+    exp.close()
+    return
+
+def run(args):
+    from .tasks import mapTasks
+
+    exp = session(args)
+    kwargs = parseArgs(args.arg)
+    for analysis in args.analysis:
+        if analysis.startswith('_') or not callable(getattr(exp, analysis, None)):
+            raise CommandError('Unknown analysis "%s"' %analysis)
+
+    def submit(analysis):
+        return getattr(exp, analysis)(wait = False, **kwargs)
+
+    results = dict(mapTasks(submit, args.analysis, max_in_flight = args.jobs))
+    emit({_: results[_] for _ in args.analysis}, args)
+    exp.close()
+    return
+
+def resume(args):
+    exp = session(args)
+    if exp.journal is None:
+        raise CommandError('resume requires --journal')
+    pending = {_['taskID']: _['target'] for _ in exp.journal.pending(exp.datasetToken)}
+    results = exp.resume()
+    emit({'%s-%s' %(pending[k], k): v for k, v in results.items()}, args)
+    exp.close()
+    return
+
+def pipeline(args):
+    from .batch import BatchRunner
+    from .transport import Transport
+
+    analyses = {}
+    if args.analyses:
+        with open(args.analyses) as f:
+            if args.analyses.endswith(('.yaml', '.yml')):
+                import yaml
+                analyses = yaml.safe_load(f) or {}
+            else:
+                analyses = json.load(f)
+    for analysis in args.analysis or []:
+        analyses.setdefault(analysis, {})
+
+    transport = None
+    if args.url:
+        transport = Transport(args.url, pool_size = max(10, 2 * args.jobs))
+
+    runner = BatchRunner(
+        getKey(args.key), args.manifest, args.output or '.', analyses = analyses,
+        jobs = args.jobs, validate = args.validate, format = args.format, partition = args.partition,
+        transport = transport, journal = args.journal
+    )
+    summary = runner.run()
+    json.dump(summary, args.stdout, indent = 1)
+    args.stdout.write('\n')
+    if any(_ != 'done' for _ in summary.values()):
+        return 1
+    return
+
+def parser():
+    common = argparse.ArgumentParser(add_help = False)
+    common.add_argument('--key', help = 'API key. Default = $%s or the keyring' %KEY_VARIABLE)
+    common.add_argument('--url', help = 'Server URL. Default = $%s or %s' %(URL_VARIABLE, DEFAULT_URL))
+    common.add_argument('--journal', help = 'Task journal file, see Phosphomatics(journal = ...)')
+
+    dataset = argparse.ArgumentParser(add_help = False)
+    dataset.add_argument('--token', help = 'Dataset token. Default = $%s' %TOKEN_VARIABLE)
+
+    output = argparse.ArgumentParser(add_help = False)
+    output.add_argument('--output', '-o', help = 'Output directory. Default = JSON on stdout')
+    output.add_argument('--format', '-f', choices = ('json', 'csv', 'parquet', 'arrow', 'hdf5'), default = 'json',
+        help = 'Result format. csv, parquet, arrow and hdf5 write one table per list of records. Default = json')
+    output.add_argument('--jobs', '-j', type = int, default = 4, help = 'Concurrent tasks. Default = 4')
+
+    parser = argparse.ArgumentParser(prog = 'phosphomatics', description = 'Phosphomatics API client')
+    commands = parser.add_subparsers(dest = 'command', metavar = 'command')
+    commands.required = True
+
+    p = commands.add_parser('new', parents = [common], help = 'Start a new experiment and print its dataset token')
+    p.set_defaults(func = new, jobs = 1)
+
+    p = commands.add_parser('upload', parents = [common, dataset], help = 'Upload experimental data and/or a parameter file')
+    p.add_argument('--data', help = 'Experimental data file')
+    p.add_argument('--parameters', help = 'Parameter file')
+    p.add_argument('--compression', choices = ('gzip', 'zstd'), help = 'Compress the data while uploading')
+    p.add_argument('--no-validate', dest = 'validate', action = 'store_false',
+        help = 'Do not check the parameter file before uploading')
+    p.set_defaults(func = upload, jobs = 1)
+
+    p = commands.add_parser('process', parents = [common, dataset], help = 'Process uploaded data and wait until done')
+    p.set_defaults(func = process, jobs = 1)
+
+    p = commands.add_parser('run', parents = [common, dataset, output], help = 'Run one or more analyses concurrently')
+    p.add_argument('analysis', nargs = '+', help = 'Phosphomatics method name, e.g. getPCA or makeVolcano')
+    p.add_argument('--arg', '-a', action = 'append', metavar = 'KEY=VALUE', help = 'Analysis argument, may be repeated')
+    p.set_defaults(func = run)
+
+    p = commands.add_parser('resume', parents = [common, dataset, output], help = 'Collect journaled tasks that are still running')
+    p.set_defaults(func = resume)
+
+    p = commands.add_parser('pipeline', parents = [common, output], help = 'Run the full pipeline for every dataset in a manifest')
+    p.add_argument('manifest', help = 'CSV or YAML manifest, see BatchRunner')
+    p.add_argument('--analysis', action = 'append', help = 'Analysis to run for each dataset, may be repeated')
+    p.add_argument('--analyses', help = 'JSON or YAML file mapping analysis labels to arguments')
+    p.add_argument('--no-validate', dest = 'validate', action = 'store_false',
+        help = 'Do not check parameter files before uploading')
+    p.add_argument('--partition', action = 'store_true',
+        help = 'With --format parquet or arrow, append all datasets to one partitioned table per analysis')
+    p.set_defaults(func = pipeline)
+    return parser
+
+def main(argv = None):
+    args = parser().parse_args(argv)
+    # results go to stdout, progress messages printed by the client to stderr
+    args.stdout = sys.stdout
+    try:
+        with contextlib.redirect_stdout(sys.stderr):
+            return args.func(args)
+    except CommandError as e:
+        print('phosphomatics: error: %s' %e, file = sys.stderr)
+        return 2
+    except Exception as e:
+        print('phosphomatics: %s: %s' %(type(e).__name__, e), file = sys.stderr)
+        return 1
+
+if __name__ == '__main__':
+    sys.exit(main())
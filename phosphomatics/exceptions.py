@@ -0,0 +1,14 @@
+class NoDataSetTokenError(Exception):
+    pass
+
+class NoPhosphomaticsKey(Exception):
+    pass
+
+class InvalidKey(Exception):
+    pass
+
+class TaskTimeoutError(Exception):
+    pass
+
+class InvalidParameterSet(Exception):
+    pass
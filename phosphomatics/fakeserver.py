@@ -0,0 +1,378 @@
+import sys, json, time, heapq, random, argparse, threading, uuid, collections, urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+ENDPOINTS = (
+    'authenticateAPIKey', 'getNewDataSetToken', 'uploadExperimentalData',
+    'uploadParameterSet', 'process', 'apiTask', 'checkProcessingStatus', 'taskEvents'
+)
+
+class FakePhosphomaticsServer(object):
+    '''
+    In-process stand-in for the phosphomatics server. Intended for tests \
+    and benchmarks; it implements the endpoints used by the client and \
+    returns canned results.
+
+    Args:
+        task_latency (float or callable): Seconds a remote task takes to finish. A callable is given the apiFunctionTarget and returns the latency. Default = 0.
+
+        keys (list): API keys accepted by /authenticateAPIKey. None accepts any key. Default = None.
+
+        host (str): Interface to bind. Default = '127.0.0.1'.
+
+        port (int): Port to bind. 0 selects a free port. Default = 0.
+
+        batch_status (bool): Accept multi-ID status requests (a comma separated taskIDs field) on /checkProcessingStatus. Default = True.
+
+        result_size (int): Number of records in the 'data' list of analysis results other than the canned group and PCA/LDA results. 0 returns a minimal result. Default = 0.
+
+        container_size (int): Length of the 'container' string sent with every finished result, which the client discards. Default = 0.
+
+        failure_rate (float): Fraction of requests, to any endpoint, answered with 503 Service Unavailable. Default = 0.
+
+        seed (int): Seed for the failure generator. Default = None.
+
+        heartbeat (float): Seconds between keep-alive comments on /taskEvents streams. Default = 15.
+
+    Task finished events are emitted when each task's latency has passed: \
+    to every /taskEvents stream opened with the task's key, as server-sent \
+    events 'data: {"taskID": ...}', and as a POST of {"taskID": ...} to the \
+    task's callbackURL if one was submitted. Counted in server.events.
+
+    Example::
+
+        with FakePhosphomaticsServer(task_latency = 0.2) as server:
+            exp = Phosphomatics(key = 'KEY', transport = Transport(server.url))
+    '''
+
+    def __init__(self, task_latency = 0, keys = None, host = '127.0.0.1', port = 0, batch_status = True,
+            result_size = 0, container_size = 0, failure_rate = 0, seed = None, heartbeat = 15):
+        self.task_latency = task_latency
+        self.keys = keys
+        self.batch_status = batch_status
+        self.result_size = result_size
+        self.container_size = container_size
+        self.failure_rate = failure_rate
+        self.random = random.Random(seed)
+        self.failures = collections.Counter()
+        self.requests = collections.Counter()
+        self.bytes_received = collections.Counter()
+        self.tasks = {}
+        self.datasets = {}
+        self.lock = threading.Lock()
+
+        self.heartbeat = heartbeat
+        self.events = collections.Counter()
+        self.finished = []
+        self.schedule = []
+        self.eventCondition = threading.Condition()
+        self.stopping = threading.Event()
+        self.emitter = None
+        self.streamGeneration = 0
+
+        self.httpd = ThreadingHTTPServer((host, port), _handler_for(self))
+        self.httpd.daemon_threads = True
+        self.url = 'http://%s:%s' %self.httpd.server_address[:2]
+        self.thread = None
+        return
+
+    def start(self):
+        self.thread = threading.Thread(target = self.httpd.serve_forever, daemon = True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.stopping.set()
+        with self.eventCondition:
+            self.eventCondition.notify_all()
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        return
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+        return
+
+    def latency(self, target):
+        if callable(self.task_latency):
+            return self.task_latency(target)
+        return self.task_latency
+
+    def newTask(self, target, result, params = None):
+        taskID = uuid.uuid4().hex
+        ready = time.time() + self.latency(target)
+        with self.lock:
+            self.tasks[taskID] = (ready, result)
+        params = params or {}
+        with self.eventCondition:
+            heapq.heappush(self.schedule, (ready, taskID, params.get('key'), params.get('callbackURL')))
+            if self.emitter is None:
+                self.emitter = threading.Thread(target = self.emit, daemon = True)
+                self.emitter.start()
+            self.eventCondition.notify_all()
+        return taskID
+
+    def emit(self):
+        '''
+        Emit task finished events as tasks become ready.
+        '''
+        while not self.stopping.is_set():
+            with self.eventCondition:
+                if not self.schedule:
+                    self.eventCondition.wait()
+                    continue
+                ready, taskID, key, callbackURL = self.schedule[0]
+                if ready > time.time():
+                    self.eventCondition.wait(ready - time.time())
+                    continue
+                heapq.heappop(self.schedule)
+                self.finished.append((key, taskID))
+                self.events['stream'] += 1
+                self.eventCondition.notify_all()
+            if callbackURL:
+                self.callback(callbackURL, taskID)
+        return
+
+    def dropStreams(self):
+        '''
+        End every open /taskEvents stream, e.g. to test reconnection. \
+        Events emitted before a client reconnects are not sent to it.
+        '''
+        with self.eventCondition:
+            self.streamGeneration += 1
+            self.eventCondition.notify_all()
+        return
+
+    def callback(self, url, taskID):
+        request = urllib.request.Request(
+            url, data = json.dumps({'taskID': taskID}).encode(), headers = {'Content-Type': 'application/json'}
+        )
+        try:
+            urllib.request.urlopen(request, timeout = 5).close()
+            self.events['webhook'] += 1
+        except OSError:
+            self.events['webhook_failed'] += 1
+        return
+
+    def result(self, target, params):
+        dataset = self.datasets.setdefault(params.get('datasetToken'), {'selected': 1})
+        if target == 'getUserDataGroups':
+            return {'userDataGroups': [
+                {'id': i, 'name': 'group %s' %i, 'selected': 'true' if i == dataset['selected'] else 'false'}
+                for i in (1, 2)
+            ]}
+        if target in ('getPCAPlot', 'getLDAPlot'):
+            return {
+                'data': [
+                    {'x': float(i), 'y': float(-i), 'label': 'S%s' %i, 'group': 'G%s' %(i % 2)}
+                    for i in range(6)
+                ],
+                'xLabel': 'PC1 (50%)', 'yLabel': 'PC2 (25%)'
+            }
+        if self.result_size:
+            return {'target': target, 'data': [
+                {
+                    'id': 'P%05d_S%s' %(i, i % 500), 'group': 'cluster %s' %(i % 8),
+                    'log2FC': (i % 200) / 50 - 2, 'pval': (i % 1000) / 1000, 'significant': i % 7 == 0
+                } for i in range(self.result_size)
+            ]}
+        return {'target': target}
+
+    def fail(self, endpoint):
+        '''
+        Decide whether a request is answered with an injected 503.
+        '''
+        if not self.failure_rate:
+            return False
+        with self.lock:
+            failed = self.random.random() < self.failure_rate
+            if failed:
+                self.failures[endpoint] += 1
+        return failed
+
+    # endpoint handlers, each returns a JSON serialisable object
+
+    def authenticateAPIKey(self, params):
+        valid = self.keys is None or params.get('key') in self.keys
+        return {'valid': 'true' if valid else 'false'}
+
+    def getNewDataSetToken(self, params):
+        token = uuid.uuid4().hex
+        self.datasets[token] = {'selected': 1}
+        return {'datasetToken': token}
+
+    def uploadExperimentalData(self, params):
+        return {}
+
+    def uploadParameterSet(self, params):
+        return {}
+
+    def process(self, params):
+        return {'taskID': self.newTask('process', {}, params)}
+
+    def apiTask(self, params):
+        target = params.get('apiFunctionTarget')
+        if target == 'setSelectedGroup':
+            dataset = self.datasets.setdefault(params.get('datasetToken'), {})
+            dataset['selected'] = int(params['groupid'])
+            return {}
+        return {'taskID': self.newTask(target, self.result(target, params), params)}
+
+    def taskStatus(self, taskID):
+        with self.lock:
+            ready, result = self.tasks[taskID]
+        if time.time() < ready:
+            return {}
+        return {**result, 'processingDone': True, 'container': 'x' * self.container_size or None}
+
+    def checkProcessingStatus(self, params):
+        if self.batch_status and 'taskIDs' in params:
+            return {'tasks': {
+                taskID: self.taskStatus(taskID) for taskID in params['taskIDs'].split(',')
+            }}
+        wait = float(params.get('wait', 0))
+        if wait:
+            with self.lock:
+                ready = self.tasks[params['taskID']][0]
+            time.sleep(max(0, min(ready - time.time(), wait)))
+        return self.taskStatus(params['taskID'])
+
+def _handler_for(server):
+
+    class Handler(BaseHTTPRequestHandler):
+
+        protocol_version = 'HTTP/1.1'
+        disable_nagle_algorithm = True
+
+        def log_message(self, *args):
+            return
+
+        def readChunks(self):
+            if self.headers.get('Transfer-Encoding', '').lower() == 'chunked':
+                while True:
+                    size = int(self.rfile.readline().split(b';')[0], 16)
+                    if size == 0:
+                        self.rfile.readline()
+                        return
+                    yield self.rfile.read(size)
+                    self.rfile.readline()
+            else:
+                remaining = int(self.headers.get('Content-Length', 0))
+                while remaining:
+                    chunk = self.rfile.read(min(remaining, 2 ** 16))
+                    if not chunk:
+                        return
+                    remaining -= len(chunk)
+                    yield chunk
+
+        def do_POST(self):
+            endpoint = self.path.strip('/')
+            form = self.headers.get('Content-Type', '').startswith('application/x-www-form-urlencoded')
+
+            # only form bodies are kept, uploads are counted and discarded
+            body, received = [], 0
+            for chunk in self.readChunks():
+                received += len(chunk)
+                if form:
+                    body.append(chunk)
+
+            with server.lock:
+                server.requests[endpoint] += 1
+                server.bytes_received[endpoint] += received
+
+            params = {}
+            if form:
+                params = {k: v[0] for k, v in parse_qs(b''.join(body).decode()).items()}
+
+            if endpoint not in ENDPOINTS:
+                self.send_error(404)
+                return
+
+            if server.fail(endpoint):
+                self.send_error(503)
+                return
+
+            if endpoint == 'taskEvents':
+                self.streamEvents(params.get('key'))
+                return
+
+            try:
+                payload = json.dumps(getattr(server, endpoint)(params)).encode()
+            except Exception:
+                self.send_error(500)
+                return
+
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+            return
+
+        def streamEvents(self, key):
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/event-stream')
+            self.send_header('Cache-Control', 'no-cache')
+            self.send_header('Connection', 'close')
+            self.end_headers()
+            self.close_connection = True
+
+            with server.eventCondition:
+                sent = len(server.finished)
+                generation = server.streamGeneration
+            try:
+                while not server.stopping.is_set() and server.streamGeneration == generation:
+                    with server.eventCondition:
+                        server.eventCondition.wait_for(
+                            lambda: len(server.finished) > sent or server.stopping.is_set() or \
+                                server.streamGeneration != generation,
+                            server.heartbeat
+                        )
+                        events = server.finished[sent:]
+                        sent = len(server.finished)
+                    messages = [
+                        'data: %s\n\n' %json.dumps({'taskID': taskID})
+                        for owner, taskID in events if owner == key
+                    ]
+                    self.wfile.write((''.join(messages) or ': keepalive\n\n').encode())
+                    self.wfile.flush()
+            except OSError:
+                pass
+            return
+
+    return Handler
+
+def main(argv = None):
+    '''
+    Run the fake server in the foreground, e.g. to benchmark a client in a \
+    separate process::
+
+        python -m phosphomatics.fakeserver --port 8000 --latency 0.5 --result-size 10000
+    '''
+    parser = argparse.ArgumentParser(description = 'Local stand-in phosphomatics server')
+    parser.add_argument('--host', default = '127.0.0.1')
+    parser.add_argument('--port', type = int, default = 8000)
+    parser.add_argument('--latency', type = float, default = 0, help = 'task latency in seconds')
+    parser.add_argument('--result-size', type = int, default = 0, help = 'records per analysis result')
+    parser.add_argument('--container-size', type = int, default = 0, help = 'bytes of discarded container per result')
+    parser.add_argument('--failure-rate', type = float, default = 0, help = 'fraction of requests answered with 503')
+    parser.add_argument('--no-batch-status', dest = 'batch_status', action = 'store_false')
+    args = parser.parse_args(argv)
+
+    server = FakePhosphomaticsServer(
+        task_latency = args.latency, host = args.host, port = args.port, batch_status = args.batch_status,
+        result_size = args.result_size, container_size = args.container_size, failure_rate = args.failure_rate
+    )
+    print(server.url, flush = True)
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    server.httpd.server_close()
+    return
+
+if __name__ == '__main__':
+    sys.exit(main())
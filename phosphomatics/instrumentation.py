@@ -0,0 +1,314 @@
+import sys, time, logging, threading, contextlib, collections
+
+try:
+    from opentelemetry import trace as otel_trace, metrics as otel_metrics
+except ImportError:
+    otel_trace = otel_metrics = None
+
+try:
+    import prometheus_client
+except ImportError:
+    prometheus_client = None
+
+class Instrumentation(object):
+    '''
+    Collects timing spans and counters from a session and forwards them to \
+    sinks. With no sinks nothing is recorded.
+
+    Spans recorded by Phosphomatics, all in seconds with the target and \
+    taskID as attributes:
+
+        submit: POST of the task to the server.
+
+        first_poll: From submission until the first status response.
+
+        done: From submission until the finished result was received, i.e. server queue and compute time plus polling slack.
+
+        decode: Decoding the finished result.
+
+        upload: Sending a data or parameter file, with the number of bytes as attribute.
+
+    Counters: requests, retries, bytes_sent and bytes_received per \
+    endpoint (recorded by Transport), polls per task, and failed for \
+    tasks that raised or were cancelled.
+
+    Args:
+        *sinks (MetricsSink): Sinks receiving every span and counter.
+    '''
+
+    def __init__(self, *sinks):
+        self.sinks = list(sinks)
+        return
+
+    def __bool__(self):
+        return bool(self.sinks)
+
+    def span(self, name, start, end = None, **attributes):
+        '''
+        Record a finished span. start and end are time.time() values.
+        '''
+        if not self.sinks:
+            return
+        if end is None:
+            end = time.time()
+        for sink in self.sinks:
+            sink.span(name, start, end - start, attributes)
+        return
+
+    @contextlib.contextmanager
+    def timer(self, name, **attributes):
+        '''
+        Context manager recording the enclosed block as a span.
+        '''
+        start = time.time()
+        try:
+            yield attributes
+        finally:
+            self.span(name, start, **attributes)
+
+    def count(self, name, value = 1, **attributes):
+        for sink in self.sinks:
+            sink.count(name, value, attributes)
+        return
+
+class MetricsSink(object):
+    '''
+    Base class for instrumentation sinks.
+    '''
+
+    def span(self, name, start, duration, attributes):
+        raise NotImplementedError
+
+    def count(self, name, value, attributes):
+        raise NotImplementedError
+
+class LoggingSink(MetricsSink):
+    '''
+    Log every span and counter.
+
+    Args:
+        logger (str or logging.Logger): Default = 'phosphomatics'.
+
+        level (int): Default = logging.DEBUG.
+    '''
+
+    def __init__(self, logger = 'phosphomatics', level = logging.DEBUG):
+        if isinstance(logger, str):
+            logger = logging.getLogger(logger)
+        self.logger = logger
+        self.level = level
+        return
+
+    def span(self, name, start, duration, attributes):
+        self.logger.log(self.level, '%s %.4f s %s', name, duration, _format(attributes))
+        return
+
+    def count(self, name, value, attributes):
+        self.logger.log(self.level, '%s +%s %s', name, value, _format(attributes))
+        return
+
+class CallbackSink(MetricsSink):
+    '''
+    Call callback(kind, name, value, attributes) for every span (kind \
+    'span', value is the duration in seconds) and counter (kind 'count').
+    '''
+
+    def __init__(self, callback):
+        self.callback = callback
+        return
+
+    def span(self, name, start, duration, attributes):
+        self.callback('span', name, duration, attributes)
+        return
+
+    def count(self, name, value, attributes):
+        self.callback('count', name, value, attributes)
+        return
+
+class SummarySink(MetricsSink):
+    '''
+    Aggregate spans and counters in memory, e.g. for benchmarks.
+
+    Attributes:
+        spans (dict): Span name to list of durations.
+
+        counts (collections.Counter): Counter name to total.
+    '''
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.spans = collections.defaultdict(list)
+        self.counts = collections.Counter()
+        return
+
+    def span(self, name, start, duration, attributes):
+        with self.lock:
+            self.spans[name].append(duration)
+        return
+
+    def count(self, name, value, attributes):
+        with self.lock:
+            self.counts[name] += value
+        return
+
+    def summary(self):
+        '''
+        Returns:
+            Dict of span name to count, total, mean and max duration, and the counter totals.
+        '''
+        with self.lock:
+            spans = {
+                name: {
+                    'count': len(values), 'total': sum(values),
+                    'mean': sum(values) / len(values), 'max': max(values)
+                } for name, values in self.spans.items()
+            }
+            return {'spans': spans, 'counts': dict(self.counts)}
+
+class OpenTelemetrySink(MetricsSink):
+    '''
+    Export spans as OpenTelemetry spans and counters as OpenTelemetry \
+    counters. Requires the opentelemetry-api package; configure exporters \
+    with the OpenTelemetry SDK as usual.
+
+    Args:
+        tracer: Default = the global tracer provider's 'phosphomatics' tracer.
+
+        meter: Default = the global meter provider's 'phosphomatics' meter.
+    '''
+
+    def __init__(self, tracer = None, meter = None):
+        if otel_trace is None:
+            raise ImportError('OpenTelemetrySink requires opentelemetry. Install it with "pip install opentelemetry-api"')
+        self.tracer = tracer or otel_trace.get_tracer('phosphomatics')
+        self.meter = meter or otel_metrics.get_meter('phosphomatics')
+        self.counters = {}
+        return
+
+    def span(self, name, start, duration, attributes):
+        span = self.tracer.start_span(
+            'phosphomatics.' + name, start_time = int(start * 1e9), attributes = _clean(attributes)
+        )
+        span.end(end_time = int((start + duration) * 1e9))
+        return
+
+    def count(self, name, value, attributes):
+        if name not in self.counters:
+            self.counters[name] = self.meter.create_counter('phosphomatics.' + name)
+        self.counters[name].add(value, attributes = _clean(attributes))
+        return
+
+class PrometheusSink(MetricsSink):
+    '''
+    Record spans in a Prometheus histogram (phosphomatics_span_seconds, \
+    labelled by span name and target) and counters as Prometheus counters \
+    (phosphomatics_<name>_total, labelled by endpoint or target). \
+    Requires prometheus_client.
+
+    Args:
+        registry: Default = the prometheus_client default registry.
+
+        namespace (str): Metric name prefix. Default = 'phosphomatics'.
+    '''
+
+    def __init__(self, registry = None, namespace = 'phosphomatics'):
+        if prometheus_client is None:
+            raise ImportError('PrometheusSink requires prometheus_client. Install it with "pip install prometheus-client"')
+        if registry is None:
+            registry = prometheus_client.REGISTRY
+        self.registry = registry
+        self.namespace = namespace
+        self.lock = threading.Lock()
+        self.histogram = prometheus_client.Histogram(
+            'span_seconds', 'Duration of phosphomatics client operations',
+            ['span', 'target'], namespace = namespace, registry = registry
+        )
+        self.counters = {}
+        return
+
+    def span(self, name, start, duration, attributes):
+        self.histogram.labels(name, attributes.get('target') or '').observe(duration)
+        return
+
+    def count(self, name, value, attributes):
+        with self.lock:
+            if name not in self.counters:
+                self.counters[name] = prometheus_client.Counter(
+                    name, 'phosphomatics client %s' %name, ['label'],
+                    namespace = self.namespace, registry = self.registry
+                )
+        label = attributes.get('endpoint') or attributes.get('target') or ''
+        self.counters[name].labels(label).inc(value)
+        return
+
+class ProgressReporter(object):
+    '''
+    Receives progress of tasks a session is waiting on. Replace it to \
+    show progress differently, or pass progress = False to Phosphomatics \
+    to disable progress output.
+    '''
+
+    def update(self, taskID, target, elapsed):
+        '''
+        Called before every status check with the seconds waited so far.
+        '''
+        return
+
+    def done(self, taskID, target, elapsed):
+        return
+
+class ConsoleProgress(ProgressReporter):
+    '''
+    The classic single line 'processing: N s' progress display.
+
+    Args:
+        stream: Default = sys.stdout.
+    '''
+
+    def __init__(self, stream = None):
+        self.stream = stream
+        return
+
+    def update(self, taskID, target, elapsed):
+        print(
+            'processing: %s s' %(
+                int(elapsed)
+            ), end = '\r', flush = True, file = self.stream or sys.stdout
+        )
+        return
+
+class LoggingProgress(ProgressReporter):
+    '''
+    Log a line when a task finishes, and while waiting at most once every \
+    interval seconds. Suitable for batch jobs.
+
+    Args:
+        logger (str or logging.Logger): Default = 'phosphomatics'.
+
+        interval (float): Default = 30.
+    '''
+
+    def __init__(self, logger = 'phosphomatics', interval = 30):
+        if isinstance(logger, str):
+            logger = logging.getLogger(logger)
+        self.logger = logger
+        self.interval = interval
+        self.last = {}
+        return
+
+    def update(self, taskID, target, elapsed):
+        if elapsed - self.last.get(taskID, 0) >= self.interval:
+            self.last[taskID] = elapsed
+            self.logger.info('%s %s running for %.1f s', target or 'task', taskID, elapsed)
+        return
+
+    def done(self, taskID, target, elapsed):
+        self.last.pop(taskID, None)
+        self.logger.info('%s %s finished after %.1f s', target or 'task', taskID, elapsed)
+        return
+
+def _clean(attributes):
+    return {k: v for k, v in attributes.items() if v is not None}
+
+def _format(attributes):
+    return ' '.join('%s=%s' %(k, v) for k, v in attributes.items() if v is not None)
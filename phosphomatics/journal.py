@@ -0,0 +1,179 @@
+import os, json, time, sqlite3, threading
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS tasks (
+    taskID TEXT PRIMARY KEY,
+    datasetToken TEXT,
+    target TEXT,
+    args TEXT,
+    supplemental TEXT,
+    submitted REAL,
+    finished REAL,
+    status TEXT,
+    epoch INTEGER DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS tasks_status ON tasks (status, datasetToken);
+CREATE TABLE IF NOT EXISTS epochs (
+    datasetToken TEXT PRIMARY KEY,
+    epoch INTEGER
+);
+'''
+
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+class TaskJournal(object):
+    '''
+    Persistent record of every remote task submitted by a session, stored \
+    in SQLite. If the client process dies while a task is running, its \
+    taskID survives in the journal and Phosphomatics.resume() can collect \
+    the result without submitting the task again.
+
+    The journal may be shared by several sessions, threads and processes.
+
+    Each dataset has an epoch, advanced whenever the state analyses depend \
+    on changes on the server (data or parameters uploaded, data processed, \
+    selected group changed). Tasks are journaled with the current epoch and \
+    find() only re-attaches to tasks of the current epoch, so a task \
+    submitted for another data group is never returned for this one.
+
+    Args:
+        path (str): Database file. Created if it does not exist. Default = ~/.phosphomatics/journal.sqlite.
+
+        max_age (float): Seconds after submission during which find() re-attaches to a running task. Older tasks are still returned by pending(). None for no limit. Default = 86400.
+    '''
+
+    def __init__(self, path = None, max_age = 24 * 3600):
+        if path is None:
+            path = os.path.join(os.path.expanduser('~'), '.phosphomatics', 'journal.sqlite')
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok = True)
+
+        self.path = path
+        self.max_age = max_age
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, timeout = 30, check_same_thread = False, isolation_level = None)
+        self.db.row_factory = sqlite3.Row
+        self.db.execute('PRAGMA journal_mode = WAL')
+        self.db.executescript(SCHEMA)
+        # journals written before epochs were introduced
+        columns = [_['name'] for _ in self.db.execute('PRAGMA table_info(tasks)')]
+        if 'epoch' not in columns:
+            self.db.execute('ALTER TABLE tasks ADD COLUMN epoch INTEGER DEFAULT 0')
+        return
+
+    def epoch(self, datasetToken):
+        '''
+        Returns:
+            The current epoch of a dataset, 0 if it was never advanced.
+        '''
+        with self.lock:
+            return self.__epoch(datasetToken)
+
+    def __epoch(self, datasetToken):
+        row = self.db.execute('SELECT epoch FROM epochs WHERE datasetToken = ?', (datasetToken,)).fetchone()
+        return row['epoch'] if row is not None else 0
+
+    def advance(self, datasetToken):
+        '''
+        Start a new epoch for a dataset, so that tasks journaled before are \
+        no longer re-attached to by find(). They are still returned by pending().
+
+        Returns:
+            The new epoch.
+        '''
+        with self.lock:
+            # one transaction, so concurrent processes never skip or repeat an epoch
+            self.db.execute('BEGIN IMMEDIATE')
+            try:
+                self.db.execute('INSERT OR IGNORE INTO epochs VALUES (?, 0)', (datasetToken,))
+                self.db.execute('UPDATE epochs SET epoch = epoch + 1 WHERE datasetToken = ?', (datasetToken,))
+                epoch = self.__epoch(datasetToken)
+            finally:
+                self.db.execute('COMMIT')
+            return epoch
+
+    def record(self, taskID, datasetToken, target, args = None, supplemental = None):
+        '''
+        Journal a newly submitted task as running, in the current epoch of its dataset.
+        '''
+        with self.lock:
+            self.db.execute(
+                'INSERT OR REPLACE INTO tasks '
+                '(taskID, datasetToken, target, args, supplemental, submitted, finished, status, epoch) '
+                'VALUES (?, ?, ?, ?, ?, ?, NULL, ?, ?)', (
+                    taskID, datasetToken, target, _dumps(args), _dumps(supplemental),
+                    time.time(), RUNNING, self.__epoch(datasetToken)
+                )
+            )
+        return
+
+    def finish(self, taskID, status = DONE):
+        '''
+        Mark a task as finished, with status 'done' or 'failed'.
+        '''
+        with self.lock:
+            self.db.execute(
+                'UPDATE tasks SET status = ?, finished = ? WHERE taskID = ?',
+                (status, time.time(), taskID)
+            )
+        return
+
+    def find(self, datasetToken, target, args = None):
+        '''
+        Returns:
+            The most recently submitted running task with the same dataset, target and arguments in the current epoch of the dataset, submitted at most max_age seconds ago, or None.
+        '''
+        submitted = time.time() - self.max_age if self.max_age is not None else 0
+        with self.lock:
+            row = self.db.execute(
+                'SELECT * FROM tasks WHERE status = ? AND datasetToken = ? AND target = ? AND args = ? AND epoch = ? '
+                'AND submitted >= ? ORDER BY submitted DESC LIMIT 1',
+                (RUNNING, datasetToken, target, _dumps(args), self.__epoch(datasetToken), submitted)
+            ).fetchone()
+        return _task(row) if row is not None else None
+
+    def pending(self, datasetToken = None):
+        '''
+        Tasks that were submitted but never seen to finish, oldest first.
+
+        Args:
+            datasetToken (str): Only return tasks for this dataset. Default = None (all datasets).
+
+        Returns:
+            List of dicts with keys taskID, datasetToken, target, args, supplemental, submitted, finished, status and epoch.
+        '''
+        query = 'SELECT * FROM tasks WHERE status = ?'
+        params = [RUNNING]
+        if datasetToken is not None:
+            query += ' AND datasetToken = ?'
+            params.append(datasetToken)
+        with self.lock:
+            rows = self.db.execute(query + ' ORDER BY submitted', params).fetchall()
+        return [_task(_) for _ in rows]
+
+    def prune(self, age = 7 * 24 * 3600):
+        '''
+        Delete finished tasks, and running tasks submitted more than age seconds ago.
+        '''
+        with self.lock:
+            self.db.execute(
+                'DELETE FROM tasks WHERE status != ? OR submitted < ?',
+                (RUNNING, time.time() - age)
+            )
+        return
+
+    def close(self):
+        with self.lock:
+            self.db.close()
+        return
+
+def _dumps(value):
+    return json.dumps(value or {}, sort_keys = True, default = str)
+
+def _task(row):
+    task = dict(row)
+    task['args'] = json.loads(task['args'])
+    task['supplemental'] = json.loads(task['supplemental']) or None
+    return task
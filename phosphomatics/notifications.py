@@ -0,0 +1,244 @@
+import json, time, logging, threading, collections
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger('phosphomatics')
+
+class CompletionListener(object):
+    '''
+    Receives task finished events so that sessions do not need to poll. \
+    Pass a listener to Phosphomatics(notifications = ...): waiting calls and \
+    the background poller then sleep until the event for their task \
+    arrives and fetch the result with a single status request. If no event \
+    arrives within fallback seconds the task is polled anyway, and from \
+    then on every fallback seconds, so lost events only delay a result.
+
+    A listener may be shared by several sessions. Subclasses deliver events \
+    by calling notify().
+
+    Args:
+        fallback (float): Seconds to wait for an event before polling. Default = 30.
+
+        history (int): Number of recent finished taskIDs remembered, so that events arriving before anyone waits on the task are not lost. Default = 100000.
+    '''
+
+    def __init__(self, fallback = 30, history = 100000):
+        self.fallback = fallback
+        self.history = history
+        self.condition = threading.Condition()
+        self.finished = collections.OrderedDict()
+        self.subscribers = []
+        self.events = 0
+        return
+
+    def start(self, transport, key):
+        '''
+        Called by every session using the listener, with the session's \
+        transport and API key.
+        '''
+        return
+
+    def submitArgs(self):
+        '''
+        Returns:
+            Extra form data sent with each /apiTask request.
+        '''
+        return {}
+
+    def notify(self, taskID):
+        '''
+        Record that a task finished and wake everything waiting on it.
+        '''
+        with self.condition:
+            self.events += 1
+            self.finished[taskID] = time.time()
+            while len(self.finished) > self.history:
+                self.finished.popitem(last = False)
+            self.condition.notify_all()
+            subscribers = list(self.subscribers)
+        for callback in subscribers:
+            callback(taskID)
+        return
+
+    def isFinished(self, taskID):
+        return taskID in self.finished
+
+    def wait(self, taskID, timeout = None):
+        '''
+        Block until the event for taskID arrives or timeout seconds pass.
+
+        Returns:
+            True if the task was reported finished.
+        '''
+        with self.condition:
+            return self.condition.wait_for(lambda: taskID in self.finished, timeout)
+
+    def subscribe(self, callback):
+        '''
+        Call callback(taskID) for every event, e.g. to wake a TaskPoller.
+        '''
+        with self.condition:
+            self.subscribers.append(callback)
+        return
+
+    def unsubscribe(self, callback):
+        '''
+        Stop calling a callback passed to subscribe().
+        '''
+        with self.condition:
+            if callback in self.subscribers:
+                self.subscribers.remove(callback)
+        return
+
+    def close(self):
+        return
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return
+
+class WebhookListener(CompletionListener):
+    '''
+    Local HTTP server receiving completion callbacks. Each task is \
+    submitted with a callbackURL field; the server POSTs a JSON body \
+    {"taskID": ...} (or {"taskIDs": [...]}) to it when the task finishes.
+
+    Args:
+        host (str): Interface to listen on. Default = '127.0.0.1'.
+
+        port (int): Port to listen on. 0 selects a free port. Default = 0.
+
+        url (str): Callback URL given to the server, for when the listener is reachable under another address, e.g. behind a proxy. Default = http://<host>:<port>/taskFinished.
+
+        **listener_args: fallback and history, see CompletionListener.
+    '''
+
+    def __init__(self, host = '127.0.0.1', port = 0, url = None, **listener_args):
+        super().__init__(**listener_args)
+        self.httpd = ThreadingHTTPServer((host, port), _webhookHandler(self))
+        self.httpd.daemon_threads = True
+        self.url = url or 'http://%s:%s/taskFinished' %self.httpd.server_address[:2]
+        self.thread = threading.Thread(target = self.httpd.serve_forever, daemon = True)
+        self.thread.start()
+        return
+
+    def submitArgs(self):
+        return {'callbackURL': self.url}
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        return
+
+def _webhookHandler(listener):
+
+    class Handler(BaseHTTPRequestHandler):
+
+        protocol_version = 'HTTP/1.1'
+
+        def log_message(self, *args):
+            return
+
+        def do_POST(self):
+            try:
+                body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+                taskIDs = body.get('taskIDs') or [body['taskID']]
+            except (ValueError, KeyError, AttributeError):
+                self.send_error(400)
+                return
+            self.send_response(204)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            for taskID in taskIDs:
+                listener.notify(str(taskID))
+            return
+
+    return Handler
+
+class EventStreamListener(CompletionListener):
+    '''
+    Subscribe to the server's task event stream: a server-sent events \
+    response from POST /taskEvents with the API key, carrying one \
+    'data: {"taskID": ...}' message per finished task of that key. A \
+    background thread holds the stream open and reconnects when it drops.
+
+    Args:
+        endpoint (str): Event stream endpoint. Default = '/taskEvents'.
+
+        read_timeout (float): Seconds without data, including keep-alive comments, after which the stream is reopened. Default = 60.
+
+        **listener_args: fallback and history, see CompletionListener.
+    '''
+
+    def __init__(self, endpoint = '/taskEvents', read_timeout = 60, **listener_args):
+        super().__init__(**listener_args)
+        self.endpoint = endpoint
+        self.read_timeout = read_timeout
+        self.streams = {}
+        self.closed = threading.Event()
+        return
+
+    def start(self, transport, key):
+        # one stream per server and key, however many sessions share it
+        with self.condition:
+            if (transport.base_url, key) in self.streams:
+                return
+            thread = threading.Thread(target = self.__listen, args = (transport, key), daemon = True)
+            self.streams[(transport.base_url, key)] = thread
+        thread.start()
+        return
+
+    def __listen(self, transport, key):
+        delay = 1
+        while not self.closed.is_set():
+            try:
+                r = transport.post(
+                    self.endpoint, data = {'key': key}, idempotent = True, stream = True,
+                    timeout = (transport.connect_timeout, self.read_timeout)
+                )
+                r.raise_for_status()
+                delay = 1
+                with r:
+                    for line in _lines(r):
+                        if self.closed.is_set():
+                            return
+                        if line and line.startswith('data:'):
+                            self.__message(line[5:].strip())
+            except Exception as e:
+                logger.debug('Task event stream %s: %s', transport.url(self.endpoint), e)
+                self.closed.wait(delay)
+                delay = min(delay * 2, 30)
+        return
+
+    def __message(self, data):
+        try:
+            body = json.loads(data)
+            taskIDs = body.get('taskIDs') or [body['taskID']]
+        except (ValueError, KeyError, AttributeError):
+            return
+        for taskID in taskIDs:
+            self.notify(str(taskID))
+        return
+
+    def close(self):
+        self.closed.set()
+        return
+
+def _lines(r):
+    '''
+    Lines of a streamed response, each as soon as it has arrived. \
+    Response.iter_lines() waits for a full chunk_size block instead.
+    '''
+    read = getattr(r.raw, 'read1', None)
+    if read is not None:
+        chunks = iter(lambda: read(2 ** 16), b'')
+    else:
+        chunks = r.iter_content(chunk_size = None)
+    buffer = b''
+    for chunk in chunks:
+        *lines, buffer = (buffer + chunk).split(b'\n')
+        for line in lines:
+            yield line.rstrip(b'\r').decode('utf-8')
+    return
@@ -0,0 +1,291 @@
+import gzip, copy
+
+from .exceptions import InvalidParameterSet
+
+BLOCKS = ('sampleAlias', 'columnAssignments', 'sampleMaps', 'comparisons', 'processing')
+
+OPTIONS = {
+    ('filtering', 'minValuesIn'): ('total', 'group'),
+    ('imputation', 'imputeCategory'): ('group', 'site'),
+    ('imputation', 'imputeType'): ('min', 'median', 'mean'),
+    ('normalisation',): ('none', 'median', 'tic', 'quantile'),
+    ('transform',): ('none', 'log2'),
+}
+
+class ParameterSet(object):
+    '''
+    Local model of a phosphomatics parameter file. See \
+    :doc:`parameter_files` for the format.
+
+    The parameter set can be checked before it is uploaded, including \
+    against the column header of the experimental data, so that mistakes \
+    are found without waiting for server-side processing::
+
+        params = ParameterSet.fromFile('parameters.yaml')
+        params.validate(data = 'phospho_data.tsv')
+        exp.uploadParameterSet(params)
+
+    Args:
+        parameters (dict): Parsed parameter file.
+    '''
+
+    def __init__(self, parameters):
+        if not isinstance(parameters, dict):
+            raise InvalidParameterSet('A parameter set must be a mapping, not %s' %type(parameters).__name__)
+        self.parameters = parameters
+        return
+
+    @classmethod
+    def fromYAML(cls, text):
+        '''
+        Parse a parameter set from YAML text. Requires PyYAML.
+        '''
+        import yaml
+
+        try:
+            return cls(yaml.safe_load(text))
+        except yaml.YAMLError as e:
+            raise InvalidParameterSet('Parameter file is not valid YAML: %s' %e)
+
+    @classmethod
+    def fromFile(cls, file):
+        '''
+        Read a parameter set from a path or open file. Requires PyYAML.
+        '''
+        if isinstance(file, str):
+            with open(file, 'rb') as f:
+                return cls.fromYAML(f.read())
+        return cls.fromYAML(file.read())
+
+    def __getitem__(self, key):
+        return self.parameters[key]
+
+    def get(self, key, default = None):
+        return self.parameters.get(key, default)
+
+    @property
+    def sampleAlias(self):
+        return self.parameters.get('sampleAlias') or {}
+
+    @property
+    def quantColumns(self):
+        return list((self.parameters.get('columnAssignments') or {}).get('quantColumns') or [])
+
+    def requiredColumns(self):
+        '''
+        Column names that must be present in the experimental data file, \
+        i.e. the identifier columns and the original (un-aliased) names of \
+        the quantitation columns.
+        '''
+        columns = self.parameters.get('columnAssignments') or {}
+        original = {v: k for k, v in self.sampleAlias.items()}
+        required = [columns.get(_) for _ in ('upidColumn', 'residueColumn', 'siteColumn')]
+        required += [original.get(_, _) for _ in self.quantColumns]
+        return [_ for _ in required if _ is not None]
+
+    def errors(self, data = None):
+        '''
+        Check the parameter set.
+
+        Args:
+            data: Optional experimental data to check column names against. Either a path to a tab or comma separated data file (only the header line is read), an open file, a list of column names, or an in-memory table accepted by uploadExperimentalData.
+
+        Returns:
+            List of error messages. Empty if the parameter set is valid.
+        '''
+        errors = []
+        p = self.parameters
+
+        for block in BLOCKS:
+            if block not in p:
+                errors.append('Missing block "%s"' %block)
+
+        alias = p.get('sampleAlias') or {}
+        if not isinstance(alias, dict):
+            errors.append('sampleAlias must be a mapping of column names to aliases')
+            alias = {}
+        elif len(set(alias.values())) != len(alias):
+            errors.append('sampleAlias maps several columns to the same alias')
+
+        columns = p.get('columnAssignments') or {}
+        quant = []
+        if not isinstance(columns, dict):
+            errors.append('columnAssignments must be a mapping')
+        else:
+            for key in ('upidColumn', 'residueColumn', 'siteColumn'):
+                if not isinstance(columns.get(key), str):
+                    errors.append('columnAssignments.%s must be a column name' %key)
+            quant = columns.get('quantColumns')
+            if not isinstance(quant, list) or not quant:
+                errors.append('columnAssignments.quantColumns must be a non-empty list')
+                quant = []
+            else:
+                duplicates = sorted(set(str(_) for _ in quant if quant.count(_) > 1))
+                if duplicates:
+                    errors.append('Duplicate quantColumns: %s' %', '.join(duplicates))
+                aliased = [_ for _ in quant if _ in alias and _ not in alias.values()]
+                if aliased:
+                    errors.append(
+                        'quantColumns must use sample aliases, not original names: %s' %', '.join(map(str, aliased))
+                    )
+
+        groups = set()
+        maps = p.get('sampleMaps') or {}
+        if not isinstance(maps, dict) or not isinstance(maps.get('sampleGroupMap'), dict):
+            errors.append('sampleMaps.sampleGroupMap must be a mapping of samples to groups')
+        else:
+            groupMap = maps['sampleGroupMap']
+            groups = set(groupMap.values())
+            missing = [_ for _ in quant if _ not in groupMap]
+            if missing:
+                errors.append('Samples missing from sampleGroupMap: %s' %', '.join(map(str, missing)))
+            unknown = [_ for _ in groupMap if _ not in quant]
+            if unknown:
+                errors.append('sampleGroupMap samples not in quantColumns: %s' %', '.join(map(str, unknown)))
+
+            indexMap = maps.get('sampleIndexMap')
+            if indexMap is not None:
+                if not isinstance(indexMap, dict):
+                    errors.append('sampleMaps.sampleIndexMap must be a mapping of samples to indices')
+                else:
+                    unknown = [_ for _ in indexMap if _ not in quant]
+                    if unknown:
+                        errors.append('sampleIndexMap samples not in quantColumns: %s' %', '.join(map(str, unknown)))
+                    if not all(_isNumber(_, int) for _ in indexMap.values()):
+                        errors.append('sampleIndexMap values must be integers')
+                    elif len(set(int(_) for _ in indexMap.values())) != len(indexMap):
+                        errors.append('sampleIndexMap indices must be unique')
+
+        comparisons = p.get('comparisons') or []
+        if not isinstance(comparisons, list):
+            errors.append('comparisons must be a list')
+            comparisons = []
+        names = []
+        for i, comparison in enumerate(comparisons):
+            where = 'comparisons[%s]' %i
+            if not isinstance(comparison, dict):
+                errors.append('%s must be a mapping' %where)
+                continue
+            for key in ('group1', 'group2', 'name'):
+                if key not in comparison:
+                    errors.append('%s is missing %s' %(where, key))
+            for key in ('group1', 'group2'):
+                if key in comparison and groups and comparison[key] not in groups:
+                    errors.append('%s.%s "%s" is not a group in sampleGroupMap' %(where, key, comparison[key]))
+            if 'group1' in comparison and comparison.get('group1') == comparison.get('group2'):
+                errors.append('%s compares group %s with itself' %(where, comparison['group1']))
+            for key in ('foldChangeThreshold', 'pvalThreshold'):
+                if key in comparison and not _isNumber(comparison[key], float):
+                    errors.append('%s.%s must be a number' %(where, key))
+            names.append(comparison.get('name'))
+        duplicates = sorted(set(str(_) for _ in names if _ is not None and names.count(_) > 1))
+        if duplicates:
+            errors.append('Duplicate comparison names: %s' %', '.join(duplicates))
+
+        processing = p.get('processing') or {}
+        if not isinstance(processing, dict):
+            errors.append('processing must be a mapping')
+        else:
+            for path, options in OPTIONS.items():
+                value = _lookup(processing, path)
+                if value is not None and str(value) not in options:
+                    errors.append('processing.%s must be one of %s, not "%s"' %(
+                        '.'.join(path), ', '.join(options), value
+                    ))
+            filtering = processing.get('filtering') or {}
+            if 'minValues' in filtering and not _isNumber(filtering['minValues'], int):
+                errors.append('processing.filtering.minValues must be an integer')
+            if 'filterTerms' in filtering and not isinstance(filtering['filterTerms'], list):
+                errors.append('processing.filtering.filterTerms must be a list')
+
+        if data is not None:
+            # YAML reads a column named 2021 as an int, the header holds strings
+            header = set(str(_) for _ in readHeader(data))
+            missing = [_ for _ in self.requiredColumns() if str(_) not in header]
+            if missing:
+                errors.append('Columns not found in experimental data: %s' %', '.join(map(str, missing)))
+            unknown = [_ for _ in alias if str(_) not in header]
+            if unknown:
+                errors.append('sampleAlias columns not found in experimental data: %s' %', '.join(map(str, unknown)))
+
+        return errors
+
+    def validate(self, data = None):
+        '''
+        Check the parameter set and raise if it is not valid.
+
+        Args:
+            data: Optional experimental data to check column names against. See errors().
+
+        Returns:
+            The parameter set.
+
+        Raises:
+            InvalidParameterSet: Raised with every problem found.
+        '''
+        errors = self.errors(data = data)
+        if errors:
+            e = InvalidParameterSet('Invalid parameter set:\n  ' + '\n  '.join(errors))
+            e.errors = errors
+            raise e
+        return self
+
+    def compile(self):
+        '''
+        Serialise the parameter set to the YAML upload payload. Requires PyYAML.
+
+        Returns:
+            bytes
+        '''
+        import yaml
+
+        return yaml.safe_dump(copy.deepcopy(self.parameters), default_flow_style = False).encode()
+
+def readHeader(data):
+    '''
+    Column names of experimental data, reading only the header line of files.
+
+    Args:
+        data: Path to a tab or comma separated (optionally gzipped) file, an open file, a list of column names, or a pandas DataFrame, pyarrow Table or NumPy structured array.
+
+    Returns:
+        List of column names.
+    '''
+    if isinstance(data, (list, tuple)):
+        return list(data)
+    if hasattr(data, 'columns') and not hasattr(data, 'read'):
+        return [str(_) for _ in data.columns]
+    if hasattr(data, 'schema') and hasattr(data.schema, 'names'):
+        return list(data.schema.names)
+    if getattr(getattr(data, 'dtype', None), 'names', None):
+        return list(data.dtype.names)
+
+    if isinstance(data, str):
+        opener = gzip.open if data.endswith('.gz') else open
+        with opener(data, 'rb') as f:
+            line = f.readline()
+    else:
+        position = data.tell() if hasattr(data, 'seek') else None
+        line = data.readline()
+        if position is not None:
+            data.seek(position)
+
+    if isinstance(line, bytes):
+        line = line.decode('utf-8-sig')
+    line = line.rstrip('\r\n')
+    delimiter = '\t' if '\t' in line or ',' not in line else ','
+    return [_.strip().strip('"') for _ in line.split(delimiter)]
+
+def _lookup(mapping, path):
+    for key in path:
+        if not isinstance(mapping, dict):
+            return None
+        mapping = mapping.get(key)
+    return mapping
+
+def _isNumber(value, kind):
+    try:
+        kind(value)
+    except (TypeError, ValueError):
+        return False
+    return not isinstance(value, bool)
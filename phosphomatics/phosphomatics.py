@@ -1,85 +1,200 @@
-import os, sys, requests, json, time, inspect
+import os, sys, time, functools, threading, requests
+
+from .transport import Transport
+from .polling import ExponentialBackoff
+from .tasks import RemoteTask, TaskPoller, finishedResult, mapTasks
+from .cache import cacheKey, KeyCache
+from .journal import TaskJournal, FAILED
+from .instrumentation import Instrumentation, ProgressReporter, ConsoleProgress
+from .results import typedResult, decodeResponse
+from .streaming import decodeStream, writeResult
+from .sweep import runSweep
+from .volcano import VolcanoIndex, LOCAL_TARGETS, THRESHOLD_ARGS, FIELD_ARGS
+from .parameters import ParameterSet
+from .upload import MultipartEncoder, IterFile, tableChunks, parameterChunks
+from .exceptions import NoDataSetTokenError, NoPhosphomaticsKey, InvalidKey, TaskTimeoutError
+
+# server used when PHOSPHOMATICS_URL is not set
+DEFAULT_URL = 'http://127.0.0.1:8000'
 
 def get_kwargs():
-    frame = inspect.currentframe().f_back
-    keys, _, _, values = inspect.getargvalues(frame)
-    kwargs = {}
-    for key in keys:
-        if key != 'self':
-            kwargs[key] = values[key]
-    return kwargs
-
-class NoDataSetTokenError(Exception):
-    pass
-
-class NoPhosphomaticsKey(Exception):
-    pass
-
-class InvalidKey(Exception):
-    pass
+    frame = sys._getframe(1)
+    code = frame.f_code
+    values = frame.f_locals
+    return {
+        key: values[key] for key in code.co_varnames[:code.co_argcount]
+        if key not in ('self', 'wait', 'sink')
+    }
+
+def _transient(e):
+    # timeouts and connection errors may succeed later, anything else means the task is lost
+    return isinstance(e, (TaskTimeoutError, requests.RequestException))
+
+def requiresDataSetToken(func):
+    '''
+    Raise NoDataSetTokenError if func is called before a datasetToken is set.
+    '''
+    @functools.wraps(func)
+    def newfunc(self, *args, **kwargs):
+        if not self.datasetToken:
+            raise NoDataSetTokenError(
+                'No data set token is set! Run getDataSetToken() to begin a new experiment'
+            )
+        return func(self, *args, **kwargs)
+    return newfunc
 
+def validateDataSetToken(cls):
+    '''
+    Class decorator applying requiresDataSetToken once, at class creation, \
+    to every public method not listed in cls.validationRoutineExempt.
+    '''
+    for name, attr in list(vars(cls).items()):
+        if callable(attr) and not name.startswith('_') and \
+                name not in cls.validationRoutineExempt:
+            setattr(cls, name, requiresDataSetToken(attr))
+    return cls
+
+def _userDataGroups(result):
+    return result['userDataGroups']
+
+def _activeDataGroup(result):
+    selected_group = [
+        _ for _ in result['userDataGroups'] if _['selected'] == 'true'
+    ]
+    if selected_group:
+        return selected_group[0]
+    else:
+        return None
+
+def _site(site):
+    if isinstance(site, dict):
+        return (site['substrateUPID'], site['position'], site['residue'])
+    substrateUPID, position, residue = site
+    return (substrateUPID, position, residue)
+
+@validateDataSetToken
 class Phosphomatics(object):
     '''
     Phosphomatics experiment session.
 
     Args:
         key (str): Phosphomatics API key. Contact the developers to obtain a key.
-    '''
 
-    def __init__(self, key = None):
+        transport (Transport): Optional HTTP transport. By default a pooled keep-alive transport to BASE_URL is created and shared by every request made by this session.
 
-        self.validationRoutineExempt = [
-            '__setKey',
-            '__setDefaultDict',
-            'startNewExperiment',
-            'setDataSetToken',
-            'getDataSetToken'
-        ]
+        polling (PollingStrategy): Controls how remote tasks are waited on. Default = ExponentialBackoff().
 
-        self.datasetToken = None
+        typed_results (bool): Return analysis results as Result objects with columnar, NumPy backed storage instead of raw dicts. Result is a read-only mapping with the same keys as the raw dict. Requires NumPy. Default = False.
 
-#        self.BASE_URL = 'https://phosphomatics.com'
-        self.BASE_URL = 'http://127.0.0.1:8000'
+        streaming (bool): Decode task results incrementally as they are received. Keys that are discarded (e.g. 'container') are skipped without being built and, with typed_results, lists of records are collected straight into columnar tables, so the complete response is never held in memory at once. Requires ijson; without it results are decoded as usual. Applies to calls that wait for their result; tasks started with wait = False are decoded normally. Default = False.
 
-        if not key:
-            raise NoPhosphomaticsKey('A phosphomatics API key must be provided')
-        self.__setKey(key)
-        self.__setDefaultDict()
-        return
+        cache (ResultCache): Optional analysis result cache, e.g. MemoryCache() or DiskCache(path). Results are keyed on datasetToken, analysis target and arguments, and are invalidated when data or parameters are uploaded, the data is processed or the selected group changes. Default = None.
 
-    def __getattribute__(self,name):
-        """
-        Before any function call (except to those given in self.validationRoutineExempt,
-        check that a dataset token has been acquired and is vallid
-        """
+        journal (TaskJournal or str): Optional task journal, or the path of one. Every submitted task is recorded so that tasks still running when the client process stops can be collected with resume() instead of being submitted again. Calling an analysis while an identical task is journaled as running re-attaches to that task, unless data or parameters were uploaded, the data was processed or the selected group changed since it was submitted. A journaled task the server no longer knows is marked 'failed' and submitted again. Default = None.
 
-        attr = object.__getattribute__(self, name)
+        instrumentation (Instrumentation): Receives timing spans (submit, first_poll, done, decode, upload) and poll counts for every task, see Instrumentation. It is also given to the Transport created by the session, which records request, retry and byte counters; pass it to Transport yourself when supplying a transport. Default = no instrumentation.
 
-        if hasattr(attr, '__call__') and \
-                (attr.__name__ not in self.validationRoutineExempt):
+        key_cache (KeyCache or str): Optional cache of validated keys, or the directory of one. If the key was validated within the cache's ttl, possibly by another process, the session is created without contacting the server. Default = None.
 
-            def newfunc(*args, **kwargs):
+        lazy_auth (bool): Do not validate the key when the session is created. It is validated by startNewExperiment() instead, and not at all when an existing datasetToken is restored with setDataSetToken(); the server still rejects requests made with an invalid key. Default = False.
 
-                if not self.datasetToken:
-                    raise NoDataSetTokenError(
-                        'No data set token is set! Run getDataSetToken() to begin a new experiment'
+        progress (ProgressReporter): Reports progress while waiting on tasks. False disables progress output. Default = ConsoleProgress().
+
+        notifications (CompletionListener): Optional listener for task finished events, e.g. WebhookListener() or EventStreamListener(). Tasks are then polled only once their event arrives, or after the listener's fallback timeout. Default = None.
+
+        local_filtering (dict): Answer makeVolcano and makeKinaseVolcanoPlot from a VolcanoIndex. The dict gives the record fields of the volcano results, e.g. {'fc_field': 'log2FC', 'pval_field': 'pval', 'significant_field': 'significant'}, see VolcanoIndex. The per-site statistics are fetched once per dataset, groups and other non-threshold arguments, with fc = 0 and pval = 0, and fc, pval and pvalType are then applied locally, so changing a threshold needs no remote task. A threshold of None lets every site pass. Indexes are discarded when the cache would be invalidated. Requires NumPy. Default = None.
+
+        **transport_args: Passed to Transport when no transport is given, e.g. pool_size, timeout, retries.
+    '''
+
+#    BASE_URL = 'https://phosphomatics.com'
+    # PHOSPHOMATICS_URL points the client at another server, e.g. the local fake server
+    BASE_URL = os.environ.get('PHOSPHOMATICS_URL', DEFAULT_URL)
+
+    # methods that may be called before a datasetToken is set
+    validationRoutineExempt = [
+        'startNewExperiment',
+        'setDataSetToken',
+        'getDataSetToken',
+        'close'
+    ]
+
+    def __init__(self, key = None, transport = None, polling = None, cache = None, typed_results = False, streaming = False, journal = None,
+            instrumentation = None, progress = None, key_cache = None, lazy_auth = False, local_filtering = None,
+            notifications = None, **transport_args):
+
+        self.datasetToken = None
+
+        if instrumentation is None:
+            instrumentation = Instrumentation()
+        self.instrumentation = instrumentation
+
+        if progress is None:
+            progress = ConsoleProgress()
+        elif progress is False:
+            progress = ProgressReporter()
+        self.progress = progress
+
+        if transport is None:
+            transport = Transport(self.BASE_URL, instrumentation = instrumentation, **transport_args)
+        self.transport = transport
+        self.BASE_URL = transport.base_url
+
+        if polling is None:
+            polling = ExponentialBackoff()
+        self.polling = polling
+        self.poller = None
+        self.cache = cache
+        self.typed_results = typed_results
+        self.streaming = streaming
+        if local_filtering:
+            if not isinstance(local_filtering, dict) or set(local_filtering) - set(FIELD_ARGS) or \
+                    not set(FIELD_ARGS[:3]) <= set(local_filtering):
+                raise ValueError(
+                    'local_filtering must be a dict giving the volcano record fields %s, and optionally %s' %(
+                        ', '.join(FIELD_ARGS[:3]), FIELD_ARGS[3]
                     )
+                )
+        self.local_filtering = local_filtering
+        self.indexes = {}
+        self.indexLock = threading.Lock()
 
-                result = attr(*args, **kwargs)
+        if isinstance(journal, str):
+            journal = TaskJournal(journal)
+        self.journal = journal
 
-                return result
-            return newfunc
-        else:
-            return attr
+        if isinstance(key_cache, str):
+            key_cache = KeyCache(key_cache)
+        self.key_cache = key_cache
+        self.lazy_auth = lazy_auth
+
+        if not key:
+            raise NoPhosphomaticsKey('A phosphomatics API key must be provided')
+        self.__setKey(key)
+        self.__setDefaultDict()
+
+        self.notifications = notifications
+        if notifications is not None:
+            notifications.start(self.transport, key)
+        return
 
     def __setKey(self, key):
-        url = self.BASE_URL + '/authenticateAPIKey'
-        r = requests.post(url, data = { 'key': key })
+        self.key = key
+        self.keyValidated = self.key_cache is not None and self.key_cache.valid(self.BASE_URL, key)
+        if not self.keyValidated and not self.lazy_auth:
+            self.__validateKey()
+        return
+
+    def __validateKey(self):
+        r = self.transport.post('/authenticateAPIKey', data = { 'key': self.key }, idempotent = True)
         if r.json()['valid'] == 'true':
-            self.key = key
+            self.keyValidated = True
+            if self.key_cache is not None:
+                self.key_cache.set(self.BASE_URL, self.key)
         else:
+            if self.key_cache is not None:
+                self.key_cache.discard(self.BASE_URL, self.key)
             raise InvalidKey( 'The API key you have supplied is not avlid')
-            self.key = None
         return
 
     def __setDefaultDict(self):
@@ -101,33 +216,308 @@ class Phosphomatics(object):
 
         return data
 
-    def __monitorRemoteTask(self, taskID, supplemental_args = None):
+    def __monitorRemoteTask(self, taskID, supplemental_args = None, target = None, typed = False, sink = None, submitted = None):
 
-        data = self.__addArgsToDefaultDict(args = {'taskID': taskID})
+        data = self.__taskStatusArgs(taskID, supplemental_args)
 
+        timeout = None
+        if self.polling.long_poll:
+            data['wait'] = self.polling.long_poll
+            timeout = (self.transport.connect_timeout, self.polling.long_poll + self.transport.read_timeout)
+
+        t1 = time.time()
+        if submitted is None:
+            submitted = t1
+        polls = 0
+        listening = self.notifications is not None
+
+        for delay in self.polling.delays():
+            if self.polling.timeout is not None and \
+                    time.time() + delay - t1 > self.polling.timeout:
+                raise TaskTimeoutError(
+                    'Task %s did not finish within %s s' %(taskID, self.polling.timeout)
+                )
+
+            self.progress.update(taskID, target, time.time() - t1)
+            if listening:
+                # sleep until the task's finished event, polling every fallback seconds without one
+                pause = self.notifications.fallback
+                if self.polling.timeout is not None:
+                    pause = min(pause, max(0, t1 + self.polling.timeout - time.time()))
+                listening = not self.notifications.wait(taskID, pause)
+            else:
+                time.sleep(delay)
+
+            if self.streaming or sink is not None:
+                r, decoded = self.__streamTaskStatus(data, timeout, target, typed, sink)
+            else:
+                r = self.transport.post(
+                    '/checkProcessingStatus', data = data, idempotent = True, timeout = timeout
+                )
+                decoded = time.time()
+                r = finishedResult(decodeResponse(r))
+
+            polls += 1
+            if polls == 1:
+                self.instrumentation.span('first_poll', submitted, target = target, taskID = taskID)
+            if r is not None:
+                done = time.time()
+                self.instrumentation.span('decode', decoded, done, target = target, taskID = taskID)
+                self.instrumentation.span('done', submitted, done, target = target, taskID = taskID)
+                self.instrumentation.count('polls', polls, target = target)
+                self.progress.done(taskID, target, done - t1)
+                self.__journalDone(taskID)
+                return r
+        return
+
+    def __streamTaskStatus(self, data, timeout, target = None, typed = False, sink = None):
+        r = self.transport.post(
+            '/checkProcessingStatus', data = data, idempotent = True, timeout = timeout, stream = True
+        )
+        # reading and decoding overlap, so the decode span covers both
+        decoded = time.time()
+        try:
+            r.raw.decode_content = True
+            result = decodeStream(r.raw, typed = typed, sink = sink, target = target)
+            if self.instrumentation:
+                self.instrumentation.count('bytes_received', r.raw.tell(), endpoint = '/checkProcessingStatus')
+        finally:
+            r.close()
+        if 'processingDone' not in result:
+            return None, decoded
+        del result['processingDone']
+        return result, decoded
+
+    def __taskStatusArgs(self, taskID, supplemental_args = None):
+        data = self.__addArgsToDefaultDict(args = {'taskID': taskID})
         if supplemental_args:
             data = {**data, **supplemental_args}
+        return data
 
-        t1 = time.time()
-        url = self.BASE_URL + '/checkProcessingStatus'
+    def __submitRemoteTask(self, taskID, target = None, supplemental_args = None, transform = None, submitted = None):
+        if self.poller is None:
+            self.poller = TaskPoller(
+                self.transport, self.polling, notifications = self.notifications,
+                instrumentation = self.instrumentation
+            )
+        task = RemoteTask(taskID, target = target, transform = transform)
+        if self.instrumentation:
+            task.add_done_callback(functools.partial(self.__taskDone, submitted or time.time()))
+        if self.journal is not None:
+            task.add_done_callback(self.__journalCallback)
+        return self.poller.submit(task, self.__taskStatusArgs(taskID, supplemental_args), submitted = submitted)
+
+    def __taskDone(self, submitted, task):
+        if not task.cancelled() and task.exception() is None:
+            self.instrumentation.span('done', submitted, target = task.target, taskID = task.taskID)
+        else:
+            self.instrumentation.count('failed', target = task.target, taskID = task.taskID)
+        return
+
+    def __startTask(self, target, kwargs):
+        if self.journal is not None:
+            task = self.journal.find(self.datasetToken, target, kwargs)
+            if task is not None and self.__attach(task):
+                return task['taskID']
+
+        data = self.__addArgsToDefaultDict(args = kwargs, target = target)
+        if self.notifications is not None:
+            data.update(self.notifications.submitArgs())
+        with self.instrumentation.timer('submit', target = target) as span:
+            r = self.transport.post('/apiTask', data = data)
+            taskID = span['taskID'] = r.json()['taskID']
+
+        if self.journal is not None:
+            self.journal.record(taskID, self.datasetToken, target, kwargs)
+        return taskID
+
+    def __startProcess(self):
+        if self.journal is not None:
+            task = self.journal.find(self.datasetToken, 'process')
+            if task is not None and self.__attach(task):
+                return task['taskID'], task['supplemental']
+
+        supplemental_args = {'url': '/processSampleGroupings'}
+        data = self.__addArgsToDefaultDict(args = supplemental_args)
+        if self.notifications is not None:
+            data.update(self.notifications.submitArgs())
+        with self.instrumentation.timer('submit', target = 'process') as span:
+            r = self.transport.post('/process', data = data)
+            taskID = span['taskID'] = r.json()['taskID']
+
+        # processed data is a new state; the process task itself belongs to it
+        self.__advanceJournal()
+        if self.journal is not None:
+            self.journal.record(taskID, self.datasetToken, 'process', supplemental = supplemental_args)
+        return taskID, supplemental_args
+
+    def __attach(self, task):
+        # a journaled task may be unknown to the server, e.g. after a server restart
+        data = self.__taskStatusArgs(task['taskID'], task['supplemental'])
+        try:
+            decodeResponse(self.transport.post('/checkProcessingStatus', data = data, idempotent = True))
+        except Exception as e:
+            if _transient(e):
+                raise
+            self.journal.finish(task['taskID'], status = FAILED)
+            return False
+        return True
+
+    def __journalDone(self, taskID):
+        if self.journal is not None:
+            self.journal.finish(taskID)
+        return
 
-        while True:
-            print(
-                'processing: %s s' %(
-                    int(time.time() - t1)
-                ), end = '\r', flush = True
+    def __journalFailed(self, taskID, e):
+        # tasks that time out or lose their connection stay running so resume() can collect them
+        if self.journal is not None and not _transient(e):
+            self.journal.finish(taskID, status = FAILED)
+        return
+
+    def __journalCallback(self, task):
+        if task.cancelled():
+            return
+        if task.exception() is None:
+            self.journal.finish(task.taskID)
+        else:
+            self.__journalFailed(task.taskID, task.exception())
+        return
+
+    def __apiTask(self, target, kwargs, wait = True, transform = None, sink = None):
+
+        if sink is not None:
+            return self.__sinkTask(target, kwargs, wait, sink)
+
+        # the fetch of the full statistics passes transform = VolcanoIndex and goes to the server
+        if self.local_filtering and target in LOCAL_TARGETS and transform is None:
+            return self.__localTask(target, kwargs, wait)
+
+        typed = False
+        if transform is None and self.typed_results:
+            transform = functools.partial(typedResult, target = target)
+            # tables built while decoding are not JSON serialisable for the cache
+            typed = self.cache is None
+
+        if self.cache is not None:
+            datasetToken = self.datasetToken
+            key = cacheKey(datasetToken, target, kwargs)
+            result = self.cache.get(datasetToken, key)
+            if result is not None:
+                if not wait:
+                    task = RemoteTask(None, target = target, transform = transform)
+                    task.finish(result)
+                    return task
+                return transform(result) if transform is not None else result
+
+            transform = self.__storeResult(key, transform)
+
+        submitted = time.time()
+        taskID = self.__startTask(target, kwargs)
+
+        if not wait:
+            return self.__submitRemoteTask(taskID, target = target, transform = transform, submitted = submitted)
+
+        try:
+            result = self.__monitorRemoteTask(taskID, target = target, typed = typed, submitted = submitted)
+        except Exception as e:
+            self.instrumentation.count('failed', target = target, taskID = taskID)
+            self.__journalFailed(taskID, e)
+            raise
+        if transform is not None:
+            result = transform(result)
+        return result
+
+    def __sinkTask(self, target, kwargs, wait, sink):
+        # results written to a sink bypass the cache and typed results
+        submitted = time.time()
+        taskID = self.__startTask(target, kwargs)
+
+        if not wait:
+            return self.__submitRemoteTask(
+                taskID, target = target, submitted = submitted,
+                transform = functools.partial(writeResult, sink, target = target)
             )
-            time.sleep(1)
-
-            r = requests.post(url, data = data)
-            r = r.json()
-            if 'processingDone' in r:
-                del r['processingDone']
-                try:
-                    del r['container']
-                except:
-                    pass
-                return r
+
+        try:
+            self.__monitorRemoteTask(taskID, target = target, sink = sink, submitted = submitted)
+            return sink.close()
+        except Exception as e:
+            self.instrumentation.count('failed', target = target, taskID = taskID)
+            self.__journalFailed(taskID, e)
+            sink.abort()
+            raise
+
+    def __localTask(self, target, kwargs, wait):
+        thresholds = {k: kwargs[k] for k in THRESHOLD_ARGS if kwargs.get(k) is not None}
+        index = self.__volcanoIndex(target, {k: v for k, v in kwargs.items() if k not in THRESHOLD_ARGS})
+
+        def answer(index):
+            result = index.volcano(table = self.typed_results, **thresholds)
+            if self.typed_results:
+                result = typedResult(result, target = target)
+            return result
+
+        if wait:
+            return answer(index.result())
+
+        task = RemoteTask(None, target = target, transform = answer)
+        def resolve(index):
+            if index.cancelled():
+                task.cancel()
+            elif index.exception() is not None:
+                task.fail(index.exception())
+            else:
+                task.finish(index.result())
+        index.add_done_callback(resolve)
+        return task
+
+    def __volcanoIndex(self, target, args):
+        # one fetch per dataset and non-threshold arguments, shared by concurrent callers
+        datasetToken = self.datasetToken
+        key = cacheKey(datasetToken, target, args)
+        with self.indexLock:
+            indexes = self.indexes.setdefault(datasetToken, {})
+            if key not in indexes:
+                index = self.__apiTask(
+                    target, {**args, 'fc': 0, 'pval': 0}, wait = False,
+                    transform = functools.partial(VolcanoIndex, **self.local_filtering)
+                )
+                indexes[key] = index
+                index.add_done_callback(functools.partial(self.__dropFailedIndex, datasetToken, key))
+            return indexes[key]
+
+    def __dropFailedIndex(self, datasetToken, key, index):
+        if index.cancelled() or index.exception() is not None:
+            with self.indexLock:
+                if self.indexes.get(datasetToken, {}).get(key) is index:
+                    del self.indexes[datasetToken][key]
+        return
+
+    def __storeResult(self, key, transform = None):
+        datasetToken = self.datasetToken
+        def store(result):
+            self.cache.set(datasetToken, key, result)
+            return transform(result) if transform is not None else result
+        return store
+
+    def __invalidateCache(self, *args):
+        if self.cache is not None:
+            self.cache.invalidate(self.datasetToken)
+        with self.indexLock:
+            self.indexes.pop(self.datasetToken, None)
+        return
+
+    def __advanceJournal(self):
+        # tasks submitted before the server side state changed must not be re-attached to
+        if self.journal is not None:
+            self.journal.advance(self.datasetToken)
+        return
+
+    def close(self):
+        '''
+        Close all pooled connections held by this session.
+        '''
+        self.transport.close()
         return
 
     def setDataSetToken(self, datasetToken):
@@ -160,10 +550,13 @@ class Phosphomatics(object):
 
         Raises:
             Exception: Error generating datasetToken.
+
+            InvalidKey: Raised if the key was not validated yet and is not valid.
         '''
+        if not self.keyValidated:
+            self.__validateKey()
 
-        url = self.BASE_URL + '/getNewDataSetToken'
-        r = requests.post(url, data = { 'key': self.key })
+        r = self.transport.post('/getNewDataSetToken', data = { 'key': self.key })
         try:
             self.datasetToken = r.json()['datasetToken']
             self.__setDefaultDict()
@@ -172,26 +565,49 @@ class Phosphomatics(object):
             self.datasetToken = None
         return self.getDataSetToken()
 
-    def uploadExperimentalData(self, file):
+    def __upload(self, endpoint, file, **encoder_args):
+
+        if isinstance(file, str):
+            with open(file, 'rb') as f:
+                return self.__upload(endpoint, f, **encoder_args)
+
+        body = MultipartEncoder(self.__getDefaultDict(), 'file', file, **encoder_args)
+        with self.instrumentation.timer('upload', endpoint = endpoint) as span:
+            r = self.transport.post(
+                endpoint, data = body, headers = {'Content-Type': body.content_type}
+            )
+            span['bytes'] = body.sent
+        self.__invalidateCache()
+        self.__advanceJournal()
+        return r
+
+    def uploadExperimentalData(self, file, compression = None, progress = None, checksum = False):
         '''
         Upload phosphorylation site and quantitation data. Data file must be \
         in a phosphomatics-compatible format. See \
         `here <https://www.phosphomatics.com/help>`_ for details.
 
+        The file is streamed to the server in chunks so memory use does not \
+        depend on the size of the file.
+
         Args:
-            file (str): Path to experimental data file.
+            file (str): Path to experimental data file, an open binary file, or an in-memory table: a pandas DataFrame (the index is not uploaded), pyarrow Table or NumPy structured array. Tables are serialised to tab separated text while being streamed to the server; no temporary file is written.
+
+            compression (str): Compress the file on the fly before sending. Either 'gzip', 'zstd' (requires the zstandard package) or None. Default = None.
+
+            progress (callable): Called as progress(bytes_read, total_bytes) as the file is sent. total_bytes is None if the size of file is unknown.
+
+            checksum (bool): Send a sha256 digest of the file so the server can verify the upload. Default = False.
 
         Raises:
             NoDataSetTokenError: Raised if method called before a valid \
             datasetToken is obtained or set.
         '''
-
-        if isinstance(file, str): file = open(file,'rb')
-
-        url = self.BASE_URL + '/uploadExperimentalData'
-        data = self.__getDefaultDict()
-        r = requests.post(
-            url, data = data, files = {'file': file}
+        self.__upload(
+            '/uploadExperimentalData',
+            file if isinstance(file, str) or hasattr(file, 'read') else
+                IterFile(tableChunks(file), name = 'data.tsv'),
+            compression = compression, progress = progress, checksum = checksum
         )
         return
 
@@ -200,56 +616,156 @@ class Phosphomatics(object):
         Upload phosphomatics parameter file.
 
         Args:
-            file (str): Path to phosphomatics parameter file.
+            file (str): Path to phosphomatics parameter file, an open binary file, a dict holding the parameter set (serialised to YAML, requires PyYAML) or a ParameterSet. A ParameterSet is validated before it is uploaded.
 
         Raises:
+            InvalidParameterSet: Raised if a ParameterSet is not valid.
+
             NoDataSetTokenError: Raised if method called before a valid \
             datasetToken is obtained or set.
         '''
-
-        if isinstance(file, str): file = open(file,'rb')
-
-        url = self.BASE_URL + '/uploadParameterSet'
-        data = self.__getDefaultDict()
-        requests.post(
-            url, data = data, files = {'file': file}
-        )
+        if isinstance(file, ParameterSet):
+            file = IterFile([file.validate().compile()], name = 'parameters.yaml')
+        elif isinstance(file, dict):
+            file = IterFile(parameterChunks(file), name = 'parameters.yaml')
+        self.__upload('/uploadParameterSet', file)
         return
 
-    def process(self):
+    def process(self, wait = True):
         '''
         Run initial data processing through phosphomatics. Must be called \
         after uploading Experimental data and processing parameter files.
 
+        With a journal, calling process() while processing of the current \
+        data is journaled as running re-attaches to that task instead of \
+        processing again, e.g. when a pipeline is restarted after a crash.
+
+        Args:
+            wait (bool): If False, return a RemoteTask immediately instead of waiting for processing to finish. Default = True.
+
         Raises:
             NoDataSetTokenError: Raised if method called before a valid \
             datasetToken is obtained or set.
         '''
-        url = self.BASE_URL + '/process'
-        data = self.__addArgsToDefaultDict(args = { 'url': '/processSampleGroupings' })
-        r = requests.post( url, data = data)
+        submitted = time.time()
+        taskID, supplemental_args = self.__startProcess()
+        self.__invalidateCache()
 
-        self.__monitorRemoteTask(
-            r.json()['taskID'],
-            supplemental_args = {'url': '/processSampleGroupings'}
-        )
-        self.__updateGroupList()
+        if not wait:
+            task = self.__submitRemoteTask(
+                taskID, target = 'process', supplemental_args = supplemental_args, submitted = submitted
+            )
+            task.add_done_callback(self.__invalidateCache)
+            return task
+
+        try:
+            self.__monitorRemoteTask(
+                taskID, supplemental_args = supplemental_args, target = 'process', submitted = submitted
+            )
+        except Exception as e:
+            self.instrumentation.count('failed', target = 'process', taskID = taskID)
+            self.__journalFailed(taskID, e)
+            raise
+        self.__invalidateCache()
         return
 
-    def volcano(self, kwargs):
-        data = self.__addArgsToDefaultDict(args = kwargs, target = 'getVolcanoPlot')
-        url = self.BASE_URL + '/apiTask'
-        r = requests.post( url, data = data)
+    def resume(self, wait = True):
+        '''
+        Collect tasks for the current dataset that are journaled as running, \
+        e.g. because the process that submitted them stopped before they \
+        finished. Tasks are re-attached by taskID and are not submitted again.
 
-        result = self.__monitorRemoteTask(
-            r.json()['taskID'],
-        )
-        return result
+        Resumed results are returned as typed results and stored in the \
+        cache when the session is configured to do so, so a later call of \
+        the same analysis returns the collected result, unless the task was \
+        submitted before the server side state last changed (see \
+        TaskJournal.advance()). Tasks the server no longer knows about are \
+        marked 'failed' in the journal.
 
-    def getUserDataGroups (self):
+        Args:
+            wait (bool): If False, return RemoteTasks immediately instead of waiting for the results. Default = True.
+
+        Returns:
+            Dict mapping taskID to result, or to a RemoteTask if wait = False. Use journal.pending() beforehand for the target and arguments of each task.
+
+        Raises:
+            NoDataSetTokenError: Raised if method called before a valid \
+            datasetToken is obtained or set.
+
+            ValueError: Raised if the session has no journal.
+
+            Exception: The exception of the first task that could not be collected. The remaining tasks are still collected in the background.
+        '''
+        if self.journal is None:
+            raise ValueError('resume() requires a session created with a journal')
+
+        tasks = {}
+        epoch = self.journal.epoch(self.datasetToken)
+        for entry in self.journal.pending(self.datasetToken):
+            target, kwargs = entry['target'], entry['args']
+            if target == 'process':
+                transform = self.__invalidateCache
+            else:
+                transform = None
+                if self.typed_results:
+                    transform = functools.partial(typedResult, target = target)
+                if self.cache is not None and entry['epoch'] == epoch:
+                    transform = self.__storeResult(cacheKey(self.datasetToken, target, kwargs), transform)
+
+            task = self.__submitRemoteTask(
+                entry['taskID'], target = target,
+                supplemental_args = entry['supplemental'], transform = transform
+            )
+            tasks[entry['taskID']] = task
+
+        if not wait:
+            return tasks
+
+        return {taskID: task.result() for taskID, task in tasks.items()}
+
+    def sweep(self, method, grid, max_in_flight = 64):
+        '''
+        Run an analysis over a grid of arguments, e.g. to choose filtering \
+        thresholds::
+
+            table = exp.sweep('getPCA', {'fc': [0, 0.5, 1], 'pval': [0, 0.01, 0.05], 'pvalType': ['raw', 'BH']})
+            table.to_pandas()
+
+        Grid points are normalised first (see sweep.normalizeArgs) so that \
+        equivalent points, e.g. pval = 0 with either pvalType, are computed \
+        once. The distinct points are submitted concurrently, so a sweep \
+        takes about as long as its slowest point.
+
+        Args:
+            method (str): Name of an analysis method, e.g. 'getPCA' or 'makeKinaseVolcanoPlot'.
+
+            grid (dict or list): Dict mapping argument name to a list of values, expanded to every combination, or a list of such dicts.
+
+            max_in_flight (int): Maximum number of outstanding remote tasks. Default = 64.
+
+        Returns:
+            RecordTable with one row per grid point in grid order, a column per grid argument and a 'result' column holding the results. Equivalent points share a result object.
+
+        Raises:
+            NoDataSetTokenError: Raised if method called before a valid \
+            datasetToken is obtained or set.
+
+            ValueError: Raised for unknown methods or arguments.
+        '''
+        return runSweep(self, method, grid, max_in_flight)
+
+    def volcano(self, kwargs, wait = True, sink = None):
+        return self.__apiTask('getVolcanoPlot', kwargs, wait, sink = sink)
+
+    def getUserDataGroups (self, wait = True, sink = None):
         '''
         Get all data groups that have been created.
 
+        Args:
+            wait (bool): If False, return a RemoteTask immediately instead of waiting for the result. Default = True.
+
+            sink (ResultSink): Write the result to a sink, e.g. ParquetSink(path), while it is decoded and return the value of sink.close() instead. The sink receives the full server response, with the groups under 'userDataGroups'. Default = None.
+
         Returns:
             List of dicts containing group information.
 
@@ -262,19 +778,17 @@ class Phosphomatics(object):
             NoDataSetTokenError: Raised if method called before a valid \
             datasetToken is obtained or set.
         '''
-        data = self.__addArgsToDefaultDict(args = {}, target = 'getUserDataGroups')
-        url = self.BASE_URL + '/apiTask'
-        r = requests.post( url, data = data)
-
-        result = self.__monitorRemoteTask(
-            r.json()['taskID'],
-        )
-        return result['userDataGroups']
+        return self.__apiTask('getUserDataGroups', {}, wait, transform = _userDataGroups, sink = sink)
 
-    def getActiveDataGroup (self):
+    def getActiveDataGroup (self, wait = True, sink = None):
         '''
         Get the currently active data group
 
+        Args:
+            wait (bool): If False, return a RemoteTask immediately instead of waiting for the result. Default = True.
+
+            sink (ResultSink): Write the result to a sink, e.g. ParquetSink(path), while it is decoded and return the value of sink.close() instead. The sink receives the full server response, with every group under 'userDataGroups'. Default = None.
+
         Returns:
             Dict containing group information for selected data group.
 
@@ -287,20 +801,7 @@ class Phosphomatics(object):
             NoDataSetTokenError: Raised if method called before a valid \
             datasetToken is obtained or set.
         '''
-        data = self.__addArgsToDefaultDict(args = {}, target = 'getUserDataGroups')
-        url = self.BASE_URL + '/apiTask'
-        r = requests.post( url, data = data)
-
-        result = self.__monitorRemoteTask(
-            r.json()['taskID'],
-        )
-        selected_group = [
-            _ for _ in result['userDataGroups'] if _['selected'] == 'true'
-        ]
-        if selected_group:
-            return selected_group[0]
-        else:
-            return None
+        return self.__apiTask('getUserDataGroups', {}, wait, transform = _activeDataGroup, sink = sink)
 
     def setSelectedGroup (self, id = None):
         '''
@@ -318,51 +819,24 @@ class Phosphomatics(object):
             return None
 
         data = self.__addArgsToDefaultDict(args = {'groupid': str(id)}, target = 'setSelectedGroup')
-        url = self.BASE_URL + '/apiTask'
-        r = requests.post( url, data = data)
+        r = self.transport.post('/apiTask', data = data)
+        self.__invalidateCache()
+        self.__advanceJournal()
         return
 
-    def makeDistributionPlot (self, sample = None):
-        data = self.__addArgsToDefaultDict(args = kwargs, target = 'makeDistributionPlot')
-        url = self.BASE_URL + '/apiTask'
-        r = requests.post( url, data = data)
+    def makeDistributionPlot (self, sample = None, wait = True, sink = None):
+        return self.__apiTask('makeDistributionPlot', get_kwargs(), wait, sink = sink)
 
-        result = self.__monitorRemoteTask(
-            r.json()['taskID'],
-        )
-        return result
-
-    def makeCorrelationMatrix (self, method = None, transform = None, container = None):
-        data = self.__addArgsToDefaultDict(args = kwargs, target = 'makeCorrelationMatrix')
-        url = self.BASE_URL + '/apiTask'
-        r = requests.post( url, data = data)
-
-        result = self.__monitorRemoteTask(
-            r.json()['taskID'],
-        )
-        return result
-
-    def makeQuantilePlot (self, container = None, sample = None):
-        data = self.__addArgsToDefaultDict(args = kwargs, target = 'makeQuantilePlot')
-        url = self.BASE_URL + '/apiTask'
-        r = requests.post( url, data = data)
+    def makeCorrelationMatrix (self, method = None, transform = None, container = None, wait = True, sink = None):
+        return self.__apiTask('makeCorrelationMatrix', get_kwargs(), wait, sink = sink)
 
-        result = self.__monitorRemoteTask(
-            r.json()['taskID'],
-        )
-        return result
+    def makeQuantilePlot (self, container = None, sample = None, wait = True, sink = None):
+        return self.__apiTask('makeQuantilePlot', get_kwargs(), wait, sink = sink)
 
-    def makeClusterMap (self, fc = None, pval = None, pvalType = None, numClusters = None, transformation = None, metric = None, method = None, container = None, targetClusters = None):
-        data = self.__addArgsToDefaultDict(args = kwargs, target = 'makeClusterMap')
-        url = self.BASE_URL + '/apiTask'
-        r = requests.post( url, data = data)
+    def makeClusterMap (self, fc = None, pval = None, pvalType = None, numClusters = None, transformation = None, metric = None, method = None, container = None, targetClusters = None, wait = True, sink = None):
+        return self.__apiTask('makeClusterMap', get_kwargs(), wait, sink = sink)
 
-        result = self.__monitorRemoteTask(
-            r.json()['taskID'],
-        )
-        return result
-
-    def getPCA (self, pval = 0.5, pvalType = 'raw', fc = 0.5, transformation = None):
+    def getPCA (self, pval = 0.5, pvalType = 'raw', fc = 0.5, transformation = None, wait = True, sink = None):
         '''
         Returns Principal Component Analysis for data in selected data group.
 
@@ -375,6 +849,10 @@ class Phosphomatics(object):
 
             transformation (str): Specifies if data should be z-transformed prior to analysis. Either 'Z-Transform' to conduct transformation or any other value for untransformed data.
 
+            wait (bool): If False, return a RemoteTask immediately instead of waiting for the result. Default = True.
+
+            sink (ResultSink): Write the result to a sink, e.g. ParquetSink(path), while it is decoded and return the value of sink.close() instead. Default = None.
+
         Returns:
             Dict containing PCA data.
 
@@ -388,17 +866,9 @@ class Phosphomatics(object):
             datasetToken is obtained or set.
         '''
 
-        kwargs = get_kwargs()
-        data = self.__addArgsToDefaultDict(args = kwargs, target = 'getPCAPlot')
-        url = self.BASE_URL + '/apiTask'
-        r = requests.post( url, data = data)
+        return self.__apiTask('getPCAPlot', get_kwargs(), wait, sink = sink)
 
-        result = self.__monitorRemoteTask(
-            r.json()['taskID'],
-        )
-        return result
-
-    def getLDA (self, pval = 0.5, pvalType = 'raw', fc = 0.5, transformation = None):
+    def getLDA (self, pval = 0.5, pvalType = 'raw', fc = 0.5, transformation = None, wait = True, sink = None):
         '''
         Returns linear discriminant analysis for data in selected data group.
 
@@ -411,6 +881,10 @@ class Phosphomatics(object):
 
             transformation (str): Specifies if data should be z-transformed prior to analysis. Either 'Z-Transform' to conduct transformation or any other value for untransformed data.
 
+            wait (bool): If False, return a RemoteTask immediately instead of waiting for the result. Default = True.
+
+            sink (ResultSink): Write the result to a sink, e.g. ParquetSink(path), while it is decoded and return the value of sink.close() instead. Default = None.
+
         Returns:
             Dict containing LDA data.
 
@@ -424,134 +898,117 @@ class Phosphomatics(object):
             datasetToken is obtained or set.
         '''
 
-        kwargs = get_kwargs()
-        print(kwargs)
-        data = self.__addArgsToDefaultDict(args = kwargs, target = 'getLDAPlot')
-        url = self.BASE_URL + '/apiTask'
-        r = requests.post( url, data = data)
+        return self.__apiTask('getLDAPlot', get_kwargs(), wait, sink = sink)
 
-        result = self.__monitorRemoteTask(
-            r.json()['taskID'],
-        )
-        return result
+    def makeVolcano (self, fc = None, pval = None, pvalType = None, group1 = None, group2 = None, container = None, wait = True, sink = None):
+        return self.__apiTask('makeVolcano', get_kwargs(), wait, sink = sink)
 
-    def makeVolcano (self, fc = None, pval = None, pvalType = None, group1 = None, group2 = None, container = None):
-        data = self.__addArgsToDefaultDict(args = kwargs, target = 'makeVolcano')
-        url = self.BASE_URL + '/apiTask'
-        r = requests.post( url, data = data)
+    def makeSCurve (self, group1 = None, group2 = None, container = None, wait = True, sink = None):
+        return self.__apiTask('makeSCurve', get_kwargs(), wait, sink = sink)
 
-        result = self.__monitorRemoteTask(
-            r.json()['taskID'],
-        )
-        return result
+    def doKSEAAnslysis (self, group1 = None, group2 = None, networkin = None, networkinThreshold = None, mThreshold = None, pThreshold = None, container = None, wait = True, sink = None):
+        return self.__apiTask('doKSEAAnslysis', get_kwargs(), wait, sink = sink)
 
-    def makeSCurve (self, group1 = None, group2 = None, container = None):
-        data = self.__addArgsToDefaultDict(args = kwargs, target = 'makeSCurve')
-        url = self.BASE_URL + '/apiTask'
-        r = requests.post( url, data = data)
+    def makePhosphorylationNetworks (self, group1 = None, group2 = None, specificity = None, container = None, wait = True, sink = None):
+        return self.__apiTask('makePhosphorylationNetworks', get_kwargs(), wait, sink = sink)
 
-        result = self.__monitorRemoteTask(
-            r.json()['taskID'],
-        )
-        return result
+    def getEnrichmentForProteinList (self, container = None, wait = True, sink = None):
+        return self.__apiTask('getEnrichmentForProteinList', get_kwargs(), wait, sink = sink)
 
-    def doKSEAAnslysis (self, group1 = None, group2 = None, networkin = None, networkinThreshold = None, mThreshold = None, pThreshold = None, container = None):
-        data = self.__addArgsToDefaultDict(args = kwargs, target = 'doKSEAAnslysis')
-        url = self.BASE_URL + '/apiTask'
-        r = requests.post( url, data = data)
+    def getSequenceAnslysis (self, displayType = None, palette = None, showN = None, container = None, wait = True, sink = None):
+        return self.__apiTask('getSequenceAnslysis', get_kwargs(), wait, sink = sink)
 
-        result = self.__monitorRemoteTask(
-            r.json()['taskID'],
-        )
-        return result
+    def makeKinaseClusterMap (self, numClusters = None, transformation = None, palette = None, metric = None, method = None, specificity = None, container = None, targetClusters = None, wait = True, sink = None):
+        return self.__apiTask('makeKinaseClusterMap', get_kwargs(), wait, sink = sink)
 
-    def makePhosphorylationNetworks (self, group1 = None, group2 = None, specificity = None, container = None):
-        data = self.__addArgsToDefaultDict(args = kwargs, target = 'makePhosphorylationNetworks')
-        url = self.BASE_URL + '/apiTask'
-        r = requests.post( url, data = data)
+    def makeKinaseVolcanoPlot (self, fc = None, pval = None, pvalType = None, group1 = None, group2 = None, container = None, specificity = None, wait = True, sink = None):
+        return self.__apiTask('makeKinaseVolcanoPlot', get_kwargs(), wait, sink = sink)
 
-        result = self.__monitorRemoteTask(
-            r.json()['taskID'],
-        )
-        return result
+    def makeKinaseSCurve (self, group1 = None, group2 = None, specificity = None, container = None, wait = True, sink = None):
+        return self.__apiTask('makeKinaseSCurve', get_kwargs(), wait, sink = sink)
 
-    def getEnrichmentForProteinList (self, container = None):
-        data = self.__addArgsToDefaultDict(args = kwargs, target = 'getEnrichmentForProteinList')
-        url = self.BASE_URL + '/apiTask'
-        r = requests.post( url, data = data)
+    def getQuantitationPlotForSelectedKinase (self, specificity = None, kinaseUPID = None, plotType = None, container = None, wait = True, sink = None):
+        return self.__apiTask('getQuantitationPlotForSelectedKinase', get_kwargs(), wait, sink = sink)
 
-        result = self.__monitorRemoteTask(
-            r.json()['taskID'],
-        )
-        return result
+    def makeSubstrateCorrelationPlot (self, substrateUPID = None, position = None, residue = None, topN = None, method = None, plotType = None, container = None, wait = True, sink = None):
+        return self.__apiTask('makeSubstrateCorrelationPlot', get_kwargs(), wait, sink = sink)
 
-    def getSequenceAnslysis (self, displayType = None, palette = None, showN = None, container = None):
-        data = self.__addArgsToDefaultDict(args = kwargs, target = 'getSequenceAnslysis')
-        url = self.BASE_URL + '/apiTask'
-        r = requests.post( url, data = data)
+    def makeFeatureAbundancePlot (self, substrateUPID = None, position = None, residue = None, plotType = None, container = None, wait = True, sink = None):
+        return self.__apiTask('makeFeatureAbundancePlot', get_kwargs(), wait, sink = sink)
 
-        result = self.__monitorRemoteTask(
-            r.json()['taskID'],
-        )
-        return result
+    def makeFeatureAbundancePlots (self, sites, plotType = None, container = None, max_in_flight = 64):
+        '''
+        Feature abundance plots for many phosphorylation sites. A remote task \
+        is submitted per site, up to max_in_flight at a time, and all \
+        outstanding tasks are polled together.
 
-    def makeKinaseClusterMap (self, numClusters = None, transformation = None, palette = None, metric = None, method = None, specificity = None, container = None, targetClusters = None):
-        data = self.__addArgsToDefaultDict(args = kwargs, target = 'makeKinaseClusterMap')
-        url = self.BASE_URL + '/apiTask'
-        r = requests.post( url, data = data)
+        Args:
+            sites (iterable): (substrateUPID, position, residue) tuples, or dicts with those keys.
 
-        result = self.__monitorRemoteTask(
-            r.json()['taskID'],
-        )
-        return result
+            max_in_flight (int): Maximum number of outstanding remote tasks. Default = 64.
 
-    def makeKinaseVolcanoPlot (self, fc = None, pval = None, pvalType = None, group1 = None, group2 = None, container = None, specificity = None):
-        data = self.__addArgsToDefaultDict(args = kwargs, target = 'makeKinaseVolcanoPlot')
-        url = self.BASE_URL + '/apiTask'
-        r = requests.post( url, data = data)
+        Returns:
+            Generator of ((substrateUPID, position, residue), result) pairs in the order the results arrive.
 
-        result = self.__monitorRemoteTask(
-            r.json()['taskID'],
-        )
-        return result
+        Raises:
+            NoDataSetTokenError: Raised if method called before a valid \
+            datasetToken is obtained or set.
+        '''
+        def submit(site):
+            substrateUPID, position, residue = site
+            return self.makeFeatureAbundancePlot(
+                substrateUPID = substrateUPID, position = position, residue = residue,
+                plotType = plotType, container = container, wait = False
+            )
+        return mapTasks(submit, (_site(_) for _ in sites), max_in_flight)
 
-    def makeKinaseSCurve (self, group1 = None, group2 = None, specificity = None, container = None):
-        data = self.__addArgsToDefaultDict(args = kwargs, target = 'makeKinaseSCurve')
-        url = self.BASE_URL + '/apiTask'
-        r = requests.post( url, data = data)
+    def makeSubstrateCorrelationPlots (self, sites, topN = None, method = None, plotType = None, container = None, max_in_flight = 64):
+        '''
+        Substrate correlation plots for many phosphorylation sites. A remote \
+        task is submitted per site, up to max_in_flight at a time, and all \
+        outstanding tasks are polled together.
 
-        result = self.__monitorRemoteTask(
-            r.json()['taskID'],
-        )
-        return result
+        Args:
+            sites (iterable): (substrateUPID, position, residue) tuples, or dicts with those keys.
 
-    def getQuantitationPlotForSelectedKinase (self, specificity = None, kinaseUPID = None, plotType = None, container = None):
-        data = self.__addArgsToDefaultDict(args = kwargs, target = 'getQuantitationPlotForSelectedKinase')
-        url = self.BASE_URL + '/apiTask'
-        r = requests.post( url, data = data)
+            max_in_flight (int): Maximum number of outstanding remote tasks. Default = 64.
 
-        result = self.__monitorRemoteTask(
-            r.json()['taskID'],
-        )
-        return result
+        Returns:
+            Generator of ((substrateUPID, position, residue), result) pairs in the order the results arrive.
+
+        Raises:
+            NoDataSetTokenError: Raised if method called before a valid \
+            datasetToken is obtained or set.
+        '''
+        def submit(site):
+            substrateUPID, position, residue = site
+            return self.makeSubstrateCorrelationPlot(
+                substrateUPID = substrateUPID, position = position, residue = residue,
+                topN = topN, method = method, plotType = plotType, container = container, wait = False
+            )
+        return mapTasks(submit, (_site(_) for _ in sites), max_in_flight)
 
-    def makeSubstrateCorrelationPlot (self, substrateUPID = None, position = None, residue = None, topN = None, method = None, plotType = None, container = None):
-        data = self.__addArgsToDefaultDict(args = kwargs, target = 'makeSubstrateCorrelationPlot')
-        url = self.BASE_URL + '/apiTask'
-        r = requests.post( url, data = data)
+    def getQuantitationPlotsForSelectedKinases (self, kinaseUPIDs, specificity = None, plotType = None, container = None, max_in_flight = 64):
+        '''
+        Quantitation plots for many kinases. A remote task is submitted per \
+        kinase, up to max_in_flight at a time, and all outstanding tasks are \
+        polled together.
 
-        result = self.__monitorRemoteTask(
-            r.json()['taskID'],
-        )
-        return result
+        Args:
+            kinaseUPIDs (iterable): Kinase UniProt IDs.
 
-    def makeFeatureAbundancePlot (self, substrateUPID = None, position = None, residue = None, plotType = None, container = None):
-        data = self.__addArgsToDefaultDict(args = kwargs, target = 'makeFeatureAbundancePlot')
-        url = self.BASE_URL + '/apiTask'
-        r = requests.post( url, data = data)
+            max_in_flight (int): Maximum number of outstanding remote tasks. Default = 64.
 
-        result = self.__monitorRemoteTask(
-            r.json()['taskID'],
-        )
-        return result
+        Returns:
+            Generator of (kinaseUPID, result) pairs in the order the results arrive.
 
+        Raises:
+            NoDataSetTokenError: Raised if method called before a valid \
+            datasetToken is obtained or set.
+        '''
+        def submit(kinaseUPID):
+            return self.getQuantitationPlotForSelectedKinase(
+                specificity = specificity, kinaseUPID = kinaseUPID,
+                plotType = plotType, container = container, wait = False
+            )
+        return mapTasks(submit, kinaseUPIDs, max_in_flight)
@@ -0,0 +1,71 @@
+import random
+
+class PollingStrategy(object):
+    '''
+    Controls how a Phosphomatics session waits for remote tasks to finish.
+
+    Subclasses implement delays(), which yields the number of seconds to \
+    sleep before each /checkProcessingStatus request.
+
+    Args:
+        timeout (float): Overall deadline in seconds for a single task. None waits forever. Default = None.
+
+        long_poll (float): If set, the number of seconds the server is asked to hold each status request open until the task finishes. Servers that do not honour the wait parameter answer immediately and the delays() schedule applies as normal. Default = None.
+    '''
+
+    def __init__(self, timeout = None, long_poll = None):
+        self.timeout = timeout
+        self.long_poll = long_poll
+        return
+
+    def delays(self):
+        raise NotImplementedError
+
+class FixedInterval(PollingStrategy):
+    '''
+    Sleep a fixed interval before every status request. This reproduces \
+    the original client behaviour with the default interval of 1 s.
+
+    Args:
+        interval (float): Seconds between status requests. Default = 1.
+    '''
+
+    def __init__(self, interval = 1, **kwargs):
+        super().__init__(**kwargs)
+        self.interval = interval
+        return
+
+    def delays(self):
+        while True:
+            yield self.interval
+
+class ExponentialBackoff(PollingStrategy):
+    '''
+    Check immediately, then back off exponentially with jitter up to a cap. \
+    Short tasks are picked up within milliseconds while long running tasks \
+    are polled only every few seconds.
+
+    Args:
+        initial (float): Delay before the second status request. Default = 0.05.
+
+        factor (float): Multiplier applied to the delay after each request. Default = 1.5.
+
+        max_interval (float): Upper bound on the delay between requests. Default = 5.
+
+        jitter (float): Fraction of each delay that is randomised so that many clients do not poll in lock-step. Default = 0.1.
+    '''
+
+    def __init__(self, initial = 0.05, factor = 1.5, max_interval = 5, jitter = 0.1, **kwargs):
+        super().__init__(**kwargs)
+        self.initial = initial
+        self.factor = factor
+        self.max_interval = max_interval
+        self.jitter = jitter
+        return
+
+    def delays(self):
+        yield 0
+        delay = self.initial
+        while True:
+            yield delay * (1 - self.jitter * random.random())
+            delay = min(delay * self.factor, self.max_interval)
@@ -0,0 +1,251 @@
+import os, json, hashlib, threading, tempfile
+
+from .phosphomatics import Phosphomatics
+from .transport import Transport
+from .instrumentation import Instrumentation, MetricsSink
+
+class LoadSink(MetricsSink):
+    '''
+    Instrumentation sink tracking the load of one endpoint: the taskIDs in \
+    flight and a moving average of the time taken to submit a task.
+
+    Args:
+        smoothing (float): Weight of the newest submit time in the moving average. Default = 0.2.
+    '''
+
+    def __init__(self, smoothing = 0.2):
+        self.smoothing = smoothing
+        self.lock = threading.Lock()
+        self.inflight = set()
+        self.latency = None
+        self.submitted = 0
+        return
+
+    def span(self, name, start, duration, attributes):
+        taskID = attributes.get('taskID')
+        with self.lock:
+            if name == 'submit':
+                if taskID is not None:
+                    self.inflight.add(taskID)
+                self.submitted += 1
+                if self.latency is None:
+                    self.latency = duration
+                else:
+                    self.latency += self.smoothing * (duration - self.latency)
+            elif name == 'done':
+                self.inflight.discard(taskID)
+        return
+
+    def count(self, name, value, attributes):
+        if name == 'failed':
+            with self.lock:
+                self.inflight.discard(attributes.get('taskID'))
+        return
+
+class Endpoint(object):
+    '''
+    A phosphomatics server and API key used by a PhosphomaticsPool.
+
+    Args:
+        url (str): Root URL of the server.
+
+        key (str): API key for this server.
+
+        max_tasks (int): Number of tasks the endpoint is expected to handle at once. New experiments avoid endpoints at this load while others have capacity, and load is compared relative to it. Default = 16.
+
+        max_rate (float): Maximum requests per second sent to the endpoint. None for no limit. Default = None.
+
+        **transport_args: Passed to Transport, e.g. pool_size or timeout.
+    '''
+
+    def __init__(self, url, key, max_tasks = 16, max_rate = None, **transport_args):
+        self.url = url.rstrip('/')
+        self.key = key
+        self.max_tasks = max_tasks
+        self.load = LoadSink()
+        self.datasets = 0
+        self.transport_args = transport_args
+        self.transport_args['max_rate'] = max_rate
+        self.transport = None
+        self.instrumentation = None
+        return
+
+    def open(self, sinks = ()):
+        self.instrumentation = Instrumentation(self.load, *sinks)
+        self.transport = Transport(self.url, instrumentation = self.instrumentation, **self.transport_args)
+        return self
+
+    @property
+    def inflight(self):
+        return len(self.load.inflight)
+
+    def score(self):
+        '''
+        Routing cost of one more experiment: tasks in flight plus datasets \
+        pinned to the endpoint, relative to capacity and weighted by the \
+        recent submit latency.
+        '''
+        latency = self.load.latency if self.load.latency is not None else 0
+        return (self.inflight + self.datasets + 1) / self.max_tasks * (1 + latency)
+
+    def __repr__(self):
+        return 'Endpoint(%r, inflight = %s, datasets = %s)' %(self.url, self.inflight, self.datasets)
+
+class PhosphomaticsPool(object):
+    '''
+    Spread experiments over several phosphomatics servers and/or API keys::
+
+        pool = PhosphomaticsPool([
+            ('https://phosphomatics.com', 'KEY_1'),
+            ('https://phosphomatics.com', 'KEY_2'),
+            Endpoint('https://mirror.example.org', 'KEY_3', max_tasks = 64, max_rate = 50),
+        ])
+        exp = pool.startNewExperiment()     # least loaded endpoint
+        ...
+        exp = pool.session(datasetToken)    # same endpoint as before
+
+    New experiments go to the endpoint with the lowest load, measured as \
+    tasks in flight plus pinned datasets relative to the endpoint's \
+    max_tasks and weighted by its recent submit latency; ties are broken \
+    round-robin. A datasetToken only exists on the server \
+    that created it, so each token stays pinned to its endpoint. With \
+    pins = path, the pins are saved to a JSON file and survive restarts.
+
+    Args:
+        endpoints (list): Endpoint objects or (url, key) tuples.
+
+        pins (str): Optional JSON file storing the endpoint of each datasetToken. Default = None.
+
+        instrumentation (Instrumentation): Optional instrumentation whose sinks also receive the spans and counters of every endpoint. Default = None.
+
+        **session_args: Passed to every Phosphomatics session, e.g. polling, cache or typed_results.
+    '''
+
+    def __init__(self, endpoints, pins = None, instrumentation = None, **session_args):
+        if not endpoints:
+            raise ValueError('A pool needs at least one endpoint')
+        sinks = instrumentation.sinks if instrumentation is not None else ()
+        self.endpoints = [
+            (_ if isinstance(_, Endpoint) else Endpoint(*_)).open(sinks) for _ in endpoints
+        ]
+        self.session_args = session_args
+        self.lock = threading.Lock()
+        self.sessions = {}
+        self.turn = 0
+
+        self.pinsFile = pins
+        self.pins = {}
+        if pins is not None and os.path.exists(pins):
+            with open(pins) as f:
+                self.pins = json.load(f)
+        pinned = list(self.pins.values())
+        for endpoint in self.endpoints:
+            endpoint.datasets = pinned.count(self.__endpointId(endpoint))
+        return
+
+    def __session(self, endpoint):
+        return Phosphomatics(
+            key = endpoint.key, transport = endpoint.transport,
+            instrumentation = endpoint.instrumentation, lazy_auth = True, **self.session_args
+        )
+
+    def __endpointId(self, endpoint):
+        # stable across restarts and reordering, without storing the key
+        return '%s#%s' %(endpoint.url, hashlib.sha256(endpoint.key.encode()).hexdigest()[:12])
+
+    def __savePins(self):
+        if self.pinsFile is None:
+            return
+        directory = os.path.dirname(os.path.abspath(self.pinsFile))
+        fd, tmp = tempfile.mkstemp(dir = directory, suffix = '.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(self.pins, f, indent = 1)
+        os.replace(tmp, self.pinsFile)
+        return
+
+    def choose(self):
+        '''
+        Returns:
+            The endpoint a new experiment would be routed to.
+        '''
+        n = len(self.endpoints)
+        # equal scores go to the endpoint after the one chosen last
+        ranked = [((_.score(), (i - self.turn) % n), _) for i, _ in enumerate(self.endpoints)]
+        available = [_ for _ in ranked if _[1].inflight < _[1].max_tasks] or ranked
+        return min(available, key = lambda _: _[0])[1]
+
+    def startNewExperiment(self):
+        '''
+        Start a new experiment on the least loaded endpoint.
+
+        Returns:
+            Phosphomatics session with the new datasetToken set.
+        '''
+        # reserve the endpoint before the first request, so that experiments
+        # started at the same time are spread over the pool
+        with self.lock:
+            endpoint = self.choose()
+            endpoint.datasets += 1
+            self.turn = (self.endpoints.index(endpoint) + 1) % len(self.endpoints)
+        exp = self.__session(endpoint)
+        try:
+            datasetToken = exp.startNewExperiment()
+        except Exception:
+            with self.lock:
+                endpoint.datasets -= 1
+            raise
+        with self.lock:
+            self.pins[datasetToken] = self.__endpointId(endpoint)
+            self.sessions[datasetToken] = exp
+            self.__savePins()
+        return exp
+
+    def endpoint(self, datasetToken):
+        '''
+        Returns:
+            The endpoint a datasetToken is pinned to.
+
+        Raises:
+            KeyError: Raised if the token was not created through this pool.
+        '''
+        pinned = self.pins.get(datasetToken)
+        for endpoint in self.endpoints:
+            if self.__endpointId(endpoint) == pinned:
+                return endpoint
+        raise KeyError('datasetToken %s is not pinned to an endpoint of this pool' %datasetToken)
+
+    def session(self, datasetToken):
+        '''
+        Returns:
+            Phosphomatics session for an existing datasetToken on the endpoint it is pinned to. Sessions are reused.
+        '''
+        with self.lock:
+            if datasetToken not in self.sessions:
+                exp = self.__session(self.endpoint(datasetToken))
+                exp.setDataSetToken(datasetToken)
+                self.sessions[datasetToken] = exp
+            return self.sessions[datasetToken]
+
+    def stats(self):
+        '''
+        Returns:
+            List of dicts with url, tasks in flight, pinned datasets, submitted task count and recent submit latency per endpoint.
+        '''
+        return [
+            {
+                'url': _.url, 'inflight': _.inflight, 'datasets': _.datasets, 'submitted': _.load.submitted,
+                'latency': _.load.latency
+            } for _ in self.endpoints
+        ]
+
+    def close(self):
+        for endpoint in self.endpoints:
+            endpoint.transport.close()
+        return
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return
@@ -0,0 +1,287 @@
+import json, numbers
+from collections.abc import Mapping
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+def loads(content):
+    '''
+    Decode JSON bytes, using orjson when it is installed.
+    '''
+    if orjson is not None:
+        return orjson.loads(content)
+    if isinstance(content, bytes):
+        content = content.decode('utf-8')
+    return json.loads(content)
+
+def decodeResponse(r):
+    '''
+    Decode the JSON body of a requests.Response with the fastest available decoder.
+    '''
+    return loads(r.content)
+
+def _isRecords(value):
+    return isinstance(value, list) and len(value) > 0 and \
+        all(isinstance(_, dict) for _ in value)
+
+class Column(object):
+    '''
+    Dictionary encoded string column: integer codes into a list of \
+    distinct values. Used for low cardinality text such as sample groups.
+    '''
+
+    def __init__(self, codes, categories):
+        self.codes = codes
+        self.categories = categories
+        return
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __getitem__(self, index):
+        if isinstance(index, numbers.Integral):
+            code = self.codes[index]
+            return None if code < 0 else self.categories[code]
+        return Column(self.codes[index], self.categories)
+
+    def __eq__(self, value):
+        if value not in self.categories:
+            return numpy.zeros(len(self.codes), dtype = bool)
+        return self.codes == self.categories.index(value)
+
+    def isin(self, values):
+        wanted = [i for i, _ in enumerate(self.categories) if _ in values]
+        return numpy.isin(self.codes, wanted)
+
+    def tolist(self):
+        return [None if _ < 0 else self.categories[_] for _ in self.codes.tolist()]
+
+class RecordTable(object):
+    '''
+    Columnar copy of a list of JSON records (dicts) as returned by the \
+    server. Integer fields without missing values become int64 NumPy \
+    arrays, other numeric fields float64 arrays (missing values are NaN), \
+    booleans become bool arrays and text fields become dictionary \
+    encoded Columns when they repeat, otherwise object arrays.
+
+    Columns are accessed by name, e.g. table['x'], and rows can be selected \
+    with a boolean mask or index array, e.g. table[table['pval'] < 0.05].
+
+    Requires NumPy.
+    '''
+
+    def __init__(self, columns, order = None):
+        self.columns = columns
+        self.order = order or list(columns)
+        return
+
+    @classmethod
+    def fromRecords(cls, records):
+        if numpy is None:
+            raise ImportError('Typed results require numpy. Install it with "pip install numpy"')
+
+        names = {}
+        for record in records:
+            for name in record:
+                names.setdefault(name, None)
+
+        columns = {}
+        for name in names:
+            values = [_.get(name) for _ in records]
+            columns[name] = _column(values)
+        return cls(columns, list(names))
+
+    def __len__(self):
+        if not self.order:
+            return 0
+        return len(self.columns[self.order[0]])
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            return self.columns[key]
+        return RecordTable({k: v[key] for k, v in self.columns.items()}, self.order)
+
+    def __contains__(self, name):
+        return name in self.columns
+
+    @property
+    def names(self):
+        return list(self.order)
+
+    def toRecords(self):
+        '''
+        Convert back to a list of dicts in the server's format.
+        '''
+        values = []
+        for name in self.order:
+            column = self.columns[name]
+            if isinstance(column, Column):
+                values.append(column.tolist())
+            elif column.dtype.kind == 'f':
+                values.append([None if _ != _ else _ for _ in column.tolist()])
+            else:
+                values.append(column.tolist())
+        return [dict(zip(self.order, row)) for row in zip(*values)]
+
+    def to_pandas(self):
+        '''
+        Returns:
+            pandas DataFrame with one column per field. Dictionary encoded columns become pandas Categoricals.
+        '''
+        import pandas
+
+        data = {}
+        for name in self.order:
+            column = self.columns[name]
+            if isinstance(column, Column):
+                data[name] = pandas.Categorical.from_codes(column.codes, column.categories)
+            else:
+                data[name] = column
+        return pandas.DataFrame(data, columns = self.order)
+
+    def nbytes(self):
+        total = 0
+        for column in self.columns.values():
+            if isinstance(column, Column):
+                total += column.codes.nbytes
+            elif column.dtype == object:
+                total += column.nbytes + sum(len(str(_)) + 49 for _ in column.tolist())
+            else:
+                total += column.nbytes
+        return total
+
+def _column(values):
+    present = [_ for _ in values if _ is not None]
+    if present and all(isinstance(_, bool) for _ in present) and len(present) == len(values):
+        return numpy.array(values, dtype = bool)
+    if present and len(present) == len(values) and \
+            all(isinstance(_, numbers.Integral) and not isinstance(_, bool) for _ in present):
+        try:
+            return numpy.array(values, dtype = numpy.int64)
+        except OverflowError:
+            pass
+    elif all(isinstance(_, numbers.Real) and not isinstance(_, bool) for _ in present):
+        return numpy.array([numpy.nan if _ is None else _ for _ in values], dtype = numpy.float64)
+    if all(isinstance(_, str) for _ in present):
+        categories = list(dict.fromkeys(present))
+        if len(categories) <= len(values) // 2:
+            index = {v: i for i, v in enumerate(categories)}
+            codes = numpy.array([-1 if _ is None else index[_] for _ in values], dtype = numpy.int32)
+            return Column(codes, categories)
+    column = numpy.empty(len(values), dtype = object)
+    column[:] = values
+    return column
+
+class Result(Mapping):
+    '''
+    Analysis result with columnar storage. Lists of records in the server \
+    response (e.g. the per-sample 'data' list of a PCA) are stored as \
+    RecordTables; everything else is kept as is.
+
+    Result is a read-only mapping with the same keys as the raw response, \
+    so result['xLabel'] and result['data'] still work; list-of-record \
+    values are converted back to lists of dicts on access. Use \
+    result.table(key) for the columnar form, result.to_pandas(key) for a \
+    DataFrame and result.raw for the complete raw dict.
+
+    Args:
+        raw (dict): Decoded task result. Values may already be RecordTables, e.g. when decoded incrementally.
+
+        target (str): apiFunctionTarget that produced the result.
+    '''
+
+    def __init__(self, raw, target = None):
+        self.target = target
+        self.fields = {}
+        self.tables = {}
+        for key, value in raw.items():
+            if isinstance(value, RecordTable):
+                self.tables[key] = value
+            elif _isRecords(value):
+                self.tables[key] = RecordTable.fromRecords(value)
+            else:
+                self.fields[key] = value
+        self.order = list(raw)
+        return
+
+    def __getitem__(self, key):
+        if key in self.tables:
+            return self.tables[key].toRecords()
+        return self.fields[key]
+
+    def __iter__(self):
+        return iter(self.order)
+
+    def __len__(self):
+        return len(self.order)
+
+    def __repr__(self):
+        parts = ['%s=<%s rows>' %(k, len(v)) for k, v in self.tables.items()]
+        parts += ['%s=%r' %(k, v) for k, v in self.fields.items() if isinstance(v, (str, numbers.Number))]
+        return '%s(%s)' %(type(self).__name__, ', '.join(parts))
+
+    @property
+    def raw(self):
+        return {key: self[key] for key in self.order}
+
+    def table(self, key = 'data'):
+        '''
+        Returns:
+            RecordTable for a list-of-records field.
+        '''
+        return self.tables[key]
+
+    def to_pandas(self, key = 'data'):
+        '''
+        Returns:
+            pandas DataFrame for a list-of-records field.
+        '''
+        return self.tables[key].to_pandas()
+
+class ScatterResult(Result):
+    '''
+    PCA / LDA result. The 'data' records have x, y, label and group fields \
+    which are available directly as arrays.
+    '''
+
+    @property
+    def x(self):
+        return self.tables['data']['x']
+
+    @property
+    def y(self):
+        return self.tables['data']['y']
+
+    @property
+    def labels(self):
+        return self.tables['data']['label']
+
+    @property
+    def groups(self):
+        return self.tables['data']['group']
+
+    @property
+    def xLabel(self):
+        return self.fields.get('xLabel')
+
+    @property
+    def yLabel(self):
+        return self.fields.get('yLabel')
+
+RESULT_TYPES = {
+    'getPCAPlot': ScatterResult,
+    'getLDAPlot': ScatterResult,
+}
+
+def typedResult(raw, target = None):
+    '''
+    Wrap a raw task result in the Result class registered for its target.
+    '''
+    return RESULT_TYPES.get(target, Result)(raw, target = target)
@@ -0,0 +1,290 @@
+import os, sys, json
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+from .results import loads, RecordTable, _column, _isRecords
+
+SKIP = ('container',)
+
+class ResultSink(object):
+    '''
+    Receives a task result piece by piece while it is decoded, so that \
+    large lists of records never need to be held in memory. Subclasses \
+    implement field(), record() and close(), and abort() if they leave \
+    anything behind that should not outlive a failed result.
+    '''
+
+    def open(self, target):
+        '''
+        Called before the first value of a result is received.
+        '''
+        return
+
+    def field(self, key, value):
+        '''
+        A top-level field that is not a list of records.
+        '''
+        raise NotImplementedError
+
+    def record(self, key, record):
+        '''
+        One record (dict) of the top-level list key.
+        '''
+        raise NotImplementedError
+
+    def close(self):
+        '''
+        Called after the last value. The return value is returned to the \
+        caller of the analysis method.
+        '''
+        raise NotImplementedError
+
+    def abort(self):
+        '''
+        Called instead of close() when the result could not be received \
+        or written, to release files and remove partial output.
+        '''
+        return
+
+class JSONLinesSink(ResultSink):
+    '''
+    Write a result to a directory: each list of records to <key>.jsonl, \
+    one record per line, and all other fields to fields.json.
+
+    Args:
+        path (str): Output directory. Created if it does not exist.
+
+    Returns (from close):
+        Dict of the scalar fields plus, for each list of records, the path of its .jsonl file.
+    '''
+
+    def __init__(self, path):
+        self.path = path
+        self.files = {}
+        return
+
+    def open(self, target):
+        os.makedirs(self.path, exist_ok = True)
+        self.fields = {}
+        self.files = {}
+        return
+
+    def field(self, key, value):
+        self.fields[key] = value
+        return
+
+    def record(self, key, record):
+        if key not in self.files:
+            self.files[key] = open(os.path.join(self.path, key + '.jsonl'), 'w')
+        self.files[key].write(json.dumps(record) + '\n')
+        return
+
+    def close(self):
+        with open(os.path.join(self.path, 'fields.json'), 'w') as f:
+            json.dump(self.fields, f)
+        paths = {}
+        for key, file in self.files.items():
+            file.close()
+            paths[key] = file.name
+        return {**self.fields, **paths}
+
+    def abort(self):
+        for file in self.files.values():
+            file.close()
+            os.remove(file.name)
+        self.files = {}
+        return
+
+def writeResult(sink, result, target = None):
+    '''
+    Push an already decoded result into a sink.
+
+    Returns:
+        The return value of sink.close().
+    '''
+    try:
+        _push(sink, result, target)
+        return sink.close()
+    except Exception:
+        sink.abort()
+        raise
+
+def _push(sink, result, target):
+    sink.open(target)
+    for key, value in result.items():
+        if _isRecords(value):
+            for record in value:
+                sink.record(key, record)
+        elif key != 'processingDone':
+            sink.field(key, value)
+    return
+
+def decodeStream(file, skip = SKIP, typed = False, sink = None, target = None):
+    '''
+    Incrementally decode a JSON object from a file-like object.
+
+    Values of keys in skip are parsed past without being built. Top-level \
+    lists of records are decoded one record at a time and either passed to \
+    sink, collected straight into a RecordTable (typed = True) or built as \
+    a normal list.
+
+    Uses ijson when it is installed; otherwise the body is read and decoded \
+    in one go and the same post-processing applied.
+
+    Args:
+        file: File-like object with a read() method, e.g. a streamed response's raw attribute.
+
+        skip (tuple): Top-level keys to discard. Default = ('container',).
+
+        typed (bool): Collect lists of records into RecordTables. Default = False.
+
+        sink (ResultSink): If given, records and fields are pushed to the sink instead of being returned. The sink is opened at the first list of records, or at the end if the response has a 'processingDone' key; responses for unfinished tasks do not touch it. The caller closes the sink.
+
+        target (str): apiFunctionTarget passed to sink.open().
+
+    Returns:
+        Dict of decoded top-level values. With a sink, records are not included.
+    '''
+    if ijson is None:
+        result = loads(file.read())
+        for key in skip:
+            result.pop(key, None)
+        if sink is not None and 'processingDone' in result:
+            _push(sink, result, target)
+            return {k: v for k, v in result.items() if not _isRecords(v)}
+        if typed:
+            for key, value in result.items():
+                if _isRecords(value):
+                    result[key] = RecordTable.fromRecords(value)
+        return result
+
+    events = ijson.basic_parse(file, use_float = True)
+    event, _ = next(events)
+    if event != 'start_map':
+        raise ValueError('Expected a JSON object')
+
+    result = {}
+    opened = False
+    for event, key in events:
+        if event == 'end_map':
+            break
+        event, value = next(events)
+
+        if key in skip:
+            if event in ('start_map', 'start_array'):
+                _skip(events)
+        elif event == 'start_map':
+            result[key] = _build(events, event)
+        elif event == 'start_array':
+            if sink is not None and not opened:
+                sink.open(target)
+                opened = True
+            result[key] = _array(events, key, typed, sink)
+            if result[key] is None:
+                del result[key]
+        else:
+            result[key] = value
+
+    if sink is not None and (opened or 'processingDone' in result):
+        if not opened:
+            sink.open(target)
+        for key, value in result.items():
+            if key != 'processingDone':
+                sink.field(key, value)
+    return result
+
+def _skip(events):
+    depth = 1
+    for event, _ in events:
+        if event in ('start_map', 'start_array'):
+            depth += 1
+        elif event in ('end_map', 'end_array'):
+            depth -= 1
+            if depth == 0:
+                return
+    return
+
+def _build(events, first):
+    '''
+    Build the value that starts with event first from the remaining events.
+    '''
+    value = {} if first == 'start_map' else []
+    stack = []
+    key = None
+    for event, data in events:
+        if event == 'map_key':
+            key = sys.intern(data)
+            continue
+        if event in ('end_map', 'end_array'):
+            if not stack:
+                return value
+            value, key = stack.pop()
+            continue
+        if event == 'start_map':
+            item = {}
+        elif event == 'start_array':
+            item = []
+        else:
+            item = data
+        if isinstance(value, dict):
+            value[key] = item
+        else:
+            value.append(item)
+        if event in ('start_map', 'start_array'):
+            stack.append((value, key))
+            value = item
+    return value
+
+def _record(events):
+    # flat records are by far the most common, handle them without _build
+    record = {}
+    for event, value in events:
+        if event == 'map_key':
+            # ijson returns a new string for every key, share them like json.loads does
+            key = sys.intern(value)
+        elif event == 'end_map':
+            return record
+        elif event in ('start_map', 'start_array'):
+            record[key] = _build(events, event)
+        else:
+            record[key] = value
+    return record
+
+def _array(events, key, typed, sink):
+    '''
+    Decode a top-level array. Records are streamed to the sink or into \
+    per-column lists; any other items are built normally.
+    '''
+    items = []
+    columns = {}
+    count = 0
+    for event, value in events:
+        if event == 'end_array':
+            break
+        if event == 'start_map' and (sink is not None or typed) and not items:
+            record = _record(events)
+            if sink is not None:
+                sink.record(key, record)
+            else:
+                for name in record:
+                    if name not in columns:
+                        columns[name] = [None] * count
+                for name, values in columns.items():
+                    values.append(record.get(name))
+            count += 1
+        else:
+            if count and sink is None and typed:
+                # mixed array, fall back to a plain list
+                names = list(columns)
+                items = [dict(zip(names, row)) for row in zip(*columns.values())]
+                columns, count = {}, 0
+            items.append(_build(events, event) if event in ('start_map', 'start_array') else value)
+
+    if sink is not None and count:
+        return None
+    if typed and count:
+        return RecordTable({k: _column(v) for k, v in columns.items()}, list(columns))
+    return items
@@ -0,0 +1,106 @@
+import json, inspect, numbers, itertools
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from .tasks import mapTasks
+from .results import RecordTable, _column
+
+# arguments the server ignores for some values of another argument, see normalizeArgs
+Z_TRANSFORM_METHODS = ('getPCA', 'getLDA')
+
+def expandGrid(grid):
+    '''
+    Expand a parameter grid into a list of argument dicts.
+
+    Args:
+        grid (dict or list): Dict mapping argument name to a list of values, expanded to every combination, or a list of such dicts whose expansions are concatenated. Values that are not lists or tuples are held fixed.
+
+    Returns:
+        List of argument dicts in grid order.
+    '''
+    if isinstance(grid, dict):
+        grid = [grid]
+    points = []
+    for part in grid:
+        names = list(part)
+        values = [
+            part[_] if isinstance(part[_], (list, tuple)) else [part[_]] for _ in names
+        ]
+        for combination in itertools.product(*values):
+            points.append(dict(zip(names, combination)))
+    return points
+
+def normalizeArgs(method, kwargs):
+    '''
+    Complete kwargs with the defaults of method and canonicalise arguments \
+    that do not change the analysis, so that equivalent calls compare equal:
+
+        - with pval = 0 every phosphorylation site passes, so pvalType is reset to its default.
+        - getPCA and getLDA only z-transform for transformation = 'Z-Transform', so any other value is reset to None.
+        - integral floats and ints are made equal, e.g. fc = 1 and fc = 1.0.
+
+    Args:
+        method (callable): Bound Phosphomatics analysis method.
+
+        kwargs (dict): Arguments for method.
+
+    Returns:
+        Dict with a value for every argument of method.
+
+    Raises:
+        ValueError: Raised for arguments method does not accept.
+    '''
+    parameters = inspect.signature(method).parameters
+    defaults = {
+        name: _.default for name, _ in parameters.items()
+        if name not in ('wait', 'sink') and _.default is not inspect.Parameter.empty
+    }
+    unknown = [_ for _ in kwargs if _ not in defaults]
+    if unknown:
+        raise ValueError('%s does not accept %s' %(method.__name__, ', '.join(unknown)))
+
+    args = {**defaults, **kwargs}
+    for name, value in args.items():
+        if isinstance(value, numbers.Real) and not isinstance(value, bool) and float(value).is_integer():
+            args[name] = int(value)
+    if args.get('pval') == 0 and 'pvalType' in args:
+        args['pvalType'] = defaults['pvalType']
+    if method.__name__ in Z_TRANSFORM_METHODS and args.get('transformation') != 'Z-Transform':
+        args['transformation'] = None
+    return args
+
+def runSweep(exp, method, grid, max_in_flight = 64):
+    '''
+    Implementation of Phosphomatics.sweep.
+    '''
+    if numpy is None:
+        raise ImportError('sweep requires numpy. Install it with "pip install numpy"')
+    function = getattr(exp, method, None) if not method.startswith('_') else None
+    if not callable(function) or 'wait' not in inspect.signature(function).parameters:
+        raise ValueError('Unknown analysis "%s"' %method)
+
+    points = expandGrid(grid)
+    keys, unique = [], {}
+    for point in points:
+        args = normalizeArgs(function, point)
+        key = json.dumps(args, sort_keys = True, default = str)
+        unique.setdefault(key, args)
+        keys.append(key)
+
+    def submit(key):
+        return function(wait = False, **unique[key])
+
+    results = dict(mapTasks(submit, list(unique), max_in_flight))
+
+    names = list(dict.fromkeys(name for point in points for name in point))
+    columns = {
+        name: _column([_.get(name) for _ in points]) for name in names
+    }
+    # results are mappings, which numpy would otherwise try to unpack
+    columns['result'] = numpy.empty(len(keys), dtype = object)
+    for i, key in enumerate(keys):
+        columns['result'][i] = results[key]
+    return RecordTable(columns, names + ['result'])
@@ -0,0 +1,357 @@
+import copy, time, threading, collections
+from concurrent.futures import Future, wait, FIRST_COMPLETED
+
+from .exceptions import TaskTimeoutError
+from .results import decodeResponse
+
+def finishedResult(r):
+    '''
+    Return the task result from a decoded /checkProcessingStatus response, \
+    or None if the task is still running.
+    '''
+    if 'processingDone' not in r:
+        return None
+    del r['processingDone']
+    r.pop('container', None)
+    return r
+
+class RemoteTask(Future):
+    '''
+    Future for a task running on the phosphomatics server. Returned by \
+    analysis methods called with wait = False. RemoteTask is a \
+    concurrent.futures.Future, so concurrent.futures.wait() and \
+    concurrent.futures.as_completed() can be used to collect results as \
+    they finish::
+
+        tasks = [exp.getPCA(wait = False), exp.getLDA(wait = False)]
+        for task in as_completed(tasks):
+            print(task.target, task.result())
+
+    Attributes:
+        taskID (str): Server-side task identifier.
+
+        target (str): apiFunctionTarget of the task.
+    '''
+
+    def __init__(self, taskID, target = None, transform = None):
+        super().__init__()
+        self.taskID = taskID
+        self.target = target
+        self.transform = transform
+        return
+
+    def cancel(self):
+        '''
+        Stop waiting for the task. The task itself keeps running on the \
+        server.
+
+        Returns:
+            True if the task was cancelled, False if it had already finished.
+        '''
+        return super().cancel()
+
+    def finish(self, r):
+        if not self.set_running_or_notify_cancel():
+            return
+        try:
+            if self.transform is not None:
+                r = self.transform(r)
+        except Exception as e:
+            self.set_exception(e)
+        else:
+            self.set_result(r)
+        return
+
+    def fail(self, e):
+        if self.set_running_or_notify_cancel():
+            self.set_exception(e)
+        return
+
+class _Pending(object):
+
+    def __init__(self, task, data, polling, fallback = None, submitted = None):
+        self.task = task
+        # further RemoteTasks for the same taskID, e.g. re-attached through a journal
+        self.followers = []
+        self.data = data
+        self.delays = polling.delays()
+        self.started = time.time()
+        self.submitted = submitted if submitted is not None else self.started
+        self.polls = 0
+        self.notified = False
+        self.due = self.started + (fallback if fallback is not None else next(self.delays))
+        return
+
+    def cancelled(self):
+        return self.task.cancelled() and all(_.cancelled() for _ in self.followers)
+
+    def finish(self, r):
+        # each task gets its own copy, transforms may modify the result
+        for task in self.followers:
+            task.finish(copy.deepcopy(r))
+        self.task.finish(r)
+        return
+
+    def fail(self, e):
+        for task in [self.task] + self.followers:
+            task.fail(e)
+        return
+
+class TaskPoller(object):
+    '''
+    Single background thread that checks the status of every outstanding \
+    RemoteTask of a session. Each task is polled according to its own \
+    PollingStrategy schedule; the thread exits when no tasks are left.
+
+    Tasks sharing a datasetToken and status arguments are checked together \
+    in one /checkProcessingStatus request carrying a comma separated \
+    taskIDs list. If the server does not support multi-ID status requests \
+    the poller falls back to one request per task, oldest due first, at no \
+    more than max_rate requests per second.
+
+    Args:
+        transport (Transport): Transport used for status requests.
+
+        polling (PollingStrategy): Schedule and deadline applied to each task. long_poll is ignored since a held request would delay every other task.
+
+        batch (bool): Try multi-ID status requests. Default = True.
+
+        max_rate (float): Maximum status requests per second when polling tasks one at a time. None for no limit. Default = 20.
+
+        batch_interval (float): Minimum seconds between two multi-ID requests for the same group, so that tasks submitted in quick succession share requests. Default = 0.1.
+
+        notifications (CompletionListener): Optional listener for task finished events. Tasks are then checked when their event arrives, or every listener.fallback seconds without one, and multi-ID requests carry only the tasks that are due. Default = None.
+
+        instrumentation (Instrumentation): Receives the first_poll and decode spans and the polls count of every task, as recorded for tasks that are waited on. Default = None.
+    '''
+
+    def __init__(self, transport, polling, batch = True, max_rate = 20, batch_interval = 0.1, notifications = None,
+            instrumentation = None):
+        self.transport = transport
+        self.polling = polling
+        self.batch = batch
+        self.max_rate = max_rate
+        self.batch_interval = batch_interval
+        self.lastPolled = {}
+        self.pending = {}
+        self.condition = threading.Condition()
+        self.thread = None
+        self.lastRequest = 0
+        self.notifications = notifications
+        self.instrumentation = instrumentation
+        return
+
+    def submit(self, task, data, submitted = None):
+        '''
+        Start polling a task.
+
+        Args:
+            task (RemoteTask): The task to resolve.
+
+            data (dict): Form data for the task's /checkProcessingStatus requests.
+
+            submitted (float): time.time() at which the task was submitted, the start of its first_poll span. Default = now.
+
+        Returns:
+            The task.
+        '''
+        with self.condition:
+            if task.taskID in self.pending:
+                self.pending[task.taskID].followers.append(task)
+                return task
+            pending = _Pending(task, data, self.polling, self.__fallback(), submitted)
+            if self.thread is None:
+                # subscribed only while there are tasks, the listener may outlive the session
+                if self.notifications is not None:
+                    self.notifications.subscribe(self.__notified)
+                self.thread = threading.Thread(target = self.__run, daemon = True)
+                self.thread.start()
+            # the event may have arrived while the task was being submitted
+            if self.notifications is not None and self.notifications.isFinished(task.taskID):
+                pending.notified = True
+                pending.due = time.time()
+            self.pending[task.taskID] = pending
+            self.condition.notify()
+        return task
+
+    def __fallback(self):
+        if self.notifications is None:
+            return None
+        return self.notifications.fallback
+
+    def __notified(self, taskID):
+        with self.condition:
+            pending = self.pending.get(taskID)
+            if pending is not None:
+                pending.notified = True
+                pending.due = time.time()
+                self.condition.notify()
+        return
+
+    def __run(self):
+        while True:
+            with self.condition:
+                for taskID in [k for k, v in self.pending.items() if v.cancelled()]:
+                    del self.pending[taskID]
+                if not self.pending:
+                    self.thread = None
+                    self.lastPolled = {}
+                    if self.notifications is not None:
+                        self.notifications.unsubscribe(self.__notified)
+                    return
+                now = time.time()
+                due = sorted(
+                    [_ for _ in self.pending.values() if self.__dueAt(_) <= now],
+                    key = lambda _: _.due
+                )
+                if not due:
+                    self.condition.wait(
+                        min(self.__dueAt(_) for _ in self.pending.values()) - now
+                    )
+                    continue
+                if self.batch:
+                    groups = collections.OrderedDict()
+                    for pending in due:
+                        groups[_groupKey(pending.data)] = []
+                    for pending in self.pending.values():
+                        key = _groupKey(pending.data)
+                        # with notifications, tasks without an event are not worth checking
+                        if key in groups and (self.notifications is None or pending.due <= now):
+                            groups[key].append(pending)
+
+            if self.batch:
+                for members in groups.values():
+                    self.__checkBatch(members)
+            else:
+                for pending in due:
+                    self.__check(pending)
+
+    def __dueAt(self, pending):
+        if not self.batch:
+            return pending.due
+        return max(
+            pending.due, self.lastPolled.get(_groupKey(pending.data), 0) + self.batch_interval
+        )
+
+    def __throttle(self):
+        if self.max_rate:
+            delay = self.lastRequest + 1 / self.max_rate - time.time()
+            if delay > 0:
+                time.sleep(delay)
+        self.lastRequest = time.time()
+        return
+
+    def __remove(self, pending):
+        with self.condition:
+            self.pending.pop(pending.task.taskID, None)
+        return
+
+    def __checkBatch(self, members):
+        data = {k: v for k, v in members[0].data.items() if k != 'taskID'}
+        data['taskIDs'] = ','.join(_.task.taskID for _ in members)
+        self.lastPolled[_groupKey(members[0].data)] = time.time()
+        try:
+            r = self.transport.post('/checkProcessingStatus', data = data, idempotent = True)
+        except Exception as e:
+            for pending in members:
+                self.__remove(pending)
+                pending.fail(e)
+            return
+
+        statuses = None
+        decoded = time.time()
+        if r.status_code == 200:
+            try:
+                statuses = decodeResponse(r).get('tasks')
+            except (ValueError, AttributeError):
+                pass
+
+        if statuses is None:
+            self.batch = False
+            for pending in members:
+                self.__check(pending)
+            return
+
+        for pending in members:
+            self.__update(pending, statuses.get(pending.task.taskID, {}), decoded)
+        return
+
+    def __check(self, pending):
+        self.__throttle()
+        try:
+            r = self.transport.post('/checkProcessingStatus', data = pending.data, idempotent = True)
+            decoded = time.time()
+            r = decodeResponse(r)
+        except Exception as e:
+            self.__remove(pending)
+            pending.fail(e)
+            return
+        self.__update(pending, r, decoded)
+        return
+
+    def __update(self, pending, r, decoded):
+        result = finishedResult(r)
+        self.__record(pending, decoded, result is not None)
+        if result is not None:
+            self.__remove(pending)
+            pending.finish(result)
+            return
+
+        if self.notifications is not None and not pending.notified:
+            pending.due = time.time() + self.notifications.fallback
+        else:
+            pending.due = time.time() + next(pending.delays)
+        if self.polling.timeout is not None and \
+                pending.due - pending.started > self.polling.timeout:
+            self.__remove(pending)
+            pending.fail(TaskTimeoutError(
+                'Task %s did not finish within %s s' %(pending.task.taskID, self.polling.timeout)
+            ))
+        return
+
+    def __record(self, pending, decoded, finished):
+        pending.polls += 1
+        if not self.instrumentation:
+            return
+        target, taskID = pending.task.target, pending.task.taskID
+        if pending.polls == 1:
+            self.instrumentation.span('first_poll', pending.submitted, target = target, taskID = taskID)
+        if finished:
+            self.instrumentation.span('decode', decoded, target = target, taskID = taskID)
+            self.instrumentation.count('polls', pending.polls, target = target)
+        return
+
+def _groupKey(data):
+    return tuple(sorted((k, str(v)) for k, v in data.items() if k != 'taskID'))
+
+def mapTasks(submit, items, max_in_flight = 64):
+    '''
+    Submit a remote task for every item and yield (item, result) pairs in \
+    completion order. At most max_in_flight tasks are outstanding at once; \
+    tasks still outstanding when the generator is closed are cancelled.
+
+    Args:
+        submit (callable): Called with each item, returns a RemoteTask.
+
+        items (iterable): Items to submit.
+
+        max_in_flight (int): Maximum number of outstanding tasks. Default = 64.
+
+    Raises:
+        Exception: The exception of the first task that failed.
+    '''
+    pending = {}
+    try:
+        for item in items:
+            while len(pending) >= max_in_flight:
+                done, _ = wait(pending, return_when = FIRST_COMPLETED)
+                for task in done:
+                    yield pending.pop(task), task.result()
+            pending[submit(item)] = item
+        while pending:
+            done, _ = wait(pending, return_when = FIRST_COMPLETED)
+            for task in done:
+                yield pending.pop(task), task.result()
+    finally:
+        for task in pending:
+            task.cancel()
@@ -0,0 +1,141 @@
+import time, threading, requests
+from requests.adapters import HTTPAdapter
+
+from .instrumentation import Instrumentation
+
+RETRY_STATUS_CODES = (429, 502, 503, 504)
+
+class Transport(object):
+    '''
+    Pooled, keep-alive HTTP transport shared by every request made by a \
+    Phosphomatics session. Connections to the server are reused across \
+    calls rather than being re-established for each request.
+
+    Args:
+        base_url (str): Root URL of the phosphomatics server.
+
+        pool_size (int): Maximum number of connections kept alive to the server. Default = 10.
+
+        timeout (float or tuple): Per-request timeout in seconds, either a single value or a (connect, read) tuple. Default = (10, 120).
+
+        retries (int): Number of times an idempotent request (e.g. a status check) is retried after a connection error or a 429/502/503/504 response. Default = 3.
+
+        backoff_factor (float): Retry delays grow as backoff_factor * 2 ** attempt seconds. Default = 0.5.
+
+        session (requests.Session): Optional pre-configured session. Useful for pointing the client at a local stand-in server in tests.
+
+        max_rate (float): Maximum requests per second sent through this transport, e.g. to respect a per-key rate limit. None for no limit. Default = None.
+
+        instrumentation (Instrumentation): Receives request, retry and byte counters per endpoint. Default = no instrumentation.
+    '''
+
+    def __init__(self, base_url, pool_size = 10, timeout = (10, 120),
+            retries = 3, backoff_factor = 0.5, session = None, max_rate = None, instrumentation = None):
+
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff_factor = backoff_factor
+
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(
+                pool_connections = 1, pool_maxsize = pool_size, max_retries = 0
+            )
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+        self.session = session
+        self.max_rate = max_rate
+        self.nextRequest = 0
+        self.rateLock = threading.Lock()
+        self.instrumentation = instrumentation or Instrumentation()
+        return
+
+    def __throttle(self):
+        with self.rateLock:
+            now = time.time()
+            delay = self.nextRequest - now
+            self.nextRequest = max(now, self.nextRequest) + 1 / self.max_rate
+        if delay > 0:
+            time.sleep(delay)
+        return
+
+    @property
+    def connect_timeout(self):
+        return self.timeout[0] if isinstance(self.timeout, tuple) else self.timeout
+
+    @property
+    def read_timeout(self):
+        return self.timeout[1] if isinstance(self.timeout, tuple) else self.timeout
+
+    def url(self, endpoint):
+        return self.base_url + endpoint
+
+    def post(self, endpoint, data = None, files = None, headers = None, idempotent = False, timeout = None, stream = False):
+        '''
+        POST to an endpoint on the server.
+
+        Args:
+            endpoint (str): Path of the endpoint, e.g. '/apiTask'.
+
+            data (dict): Form data to send, or a prepared request body such as a MultipartEncoder.
+
+            files (dict): Files to send as multipart/form-data.
+
+            headers (dict): Additional request headers.
+
+            idempotent (bool): If True, the request is retried with exponential backoff on connection errors and transient server errors. Only set this for requests that can be safely repeated.
+
+            timeout (float or tuple): Overrides the transport timeout for this request.
+
+            stream (bool): Do not read the response body up front. The caller reads it from r.raw and must close the response. Default = False.
+
+        Returns:
+            requests.Response
+        '''
+
+        if timeout is None: timeout = self.timeout
+        attempts = self.retries + 1 if idempotent else 1
+
+        for attempt in range(attempts):
+            last = attempt == attempts - 1
+            if attempt:
+                self.instrumentation.count('retries', endpoint = endpoint)
+            if self.max_rate:
+                self.__throttle()
+            try:
+                r = self.session.post(
+                    self.url(endpoint), data = data, files = files,
+                    headers = headers, timeout = timeout, stream = stream
+                )
+            except (requests.ConnectionError, requests.Timeout):
+                if last: raise
+            else:
+                if self.instrumentation:
+                    self.__countBytes(endpoint, r, stream)
+                if last or r.status_code not in RETRY_STATUS_CODES:
+                    return r
+                r.close()
+            time.sleep(self.backoff_factor * 2 ** attempt)
+        return
+
+    def __countBytes(self, endpoint, r, stream):
+        self.instrumentation.count('requests', endpoint = endpoint)
+        body = r.request.body
+        sent = len(body) if isinstance(body, (str, bytes)) else getattr(body, 'sent', None)
+        if sent:
+            self.instrumentation.count('bytes_sent', sent, endpoint = endpoint)
+        if not stream:
+            self.instrumentation.count('bytes_received', len(r.content), endpoint = endpoint)
+        return
+
+    def close(self):
+        self.session.close()
+        return
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return
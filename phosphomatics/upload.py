@@ -0,0 +1,263 @@
+import os, io, csv, zlib, uuid, hashlib
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+CHUNK_SIZE = 2 ** 16
+
+COMPRESSION_SUFFIX = {'gzip': '.gz', 'zstd': '.zst'}
+
+class MultipartEncoder(object):
+    '''
+    Streaming multipart/form-data body. The file is read, optionally \
+    compressed and sent in fixed size chunks so memory use does not depend \
+    on the size of the file.
+
+    The encoder can be passed directly as the request body. Without \
+    compression the total length is known and sent as Content-Length; with \
+    compression the body is sent using chunked transfer encoding.
+
+    Args:
+        fields (dict): Form fields sent before the file. None values are dropped.
+
+        name (str): Form field name of the file.
+
+        file (file): Open binary file to upload.
+
+        filename (str): File name reported to the server. Default = name of file.
+
+        compression (str): None, 'gzip' or 'zstd'. Compressed uploads add '.gz' / '.zst' to the file name and send a 'compression' form field. Default = None.
+
+        checksum (bool): If True, a 'sha256' form field with the digest of the uncompressed file is sent after the file. Default = False.
+
+        progress (callable): Called as progress(bytes_read, total_bytes) after each chunk of the file is read. total_bytes is None if the file size is unknown.
+
+        chunk_size (int): Bytes read from the file at a time. Default = 64 kB.
+    '''
+
+    def __init__(self, fields, name, file, filename = None, compression = None,
+            checksum = False, progress = None, chunk_size = CHUNK_SIZE):
+
+        if compression not in (None, 'gzip', 'zstd'):
+            raise ValueError('Unknown compression %s' %compression)
+        if compression == 'zstd' and zstandard is None:
+            raise ImportError('zstd compression requires zstandard. Install it with "pip install zstandard"')
+
+        self.fields = {k: v for k, v in (fields or {}).items() if v is not None}
+        if compression:
+            self.fields['compression'] = compression
+        self.name = name
+        self.file = file
+        self.compression = compression
+        self.checksum = checksum
+        self.progress = progress
+        self.chunk_size = chunk_size
+
+        if filename is None:
+            filename = os.path.basename(getattr(file, 'name', name) or name)
+        self.filename = filename + COMPRESSION_SUFFIX.get(compression, '')
+
+        self.boundary = uuid.uuid4().hex
+        self.content_type = 'multipart/form-data; boundary=%s' %self.boundary
+
+        self.total = _fileSize(file)
+        self.len = None
+        if compression is None and self.total is not None:
+            self.len = len(self.__head()) + self.total + len(self.__tail(hashlib.sha256()))
+
+        self.stream = None
+        self.sent = 0
+        return
+
+    def __field(self, name, value):
+        return (
+            '--%s\r\nContent-Disposition: form-data; name="%s"\r\n\r\n%s\r\n'
+            %(self.boundary, name, value)
+        ).encode()
+
+    def __head(self):
+        head = b''.join(self.__field(k, v) for k, v in self.fields.items())
+        return head + (
+            '--%s\r\nContent-Disposition: form-data; name="%s"; filename="%s"\r\n'
+            'Content-Type: application/octet-stream\r\n\r\n'
+            %(self.boundary, self.name, self.filename)
+        ).encode()
+
+    def __tail(self, digest):
+        tail = b'\r\n'
+        if self.checksum:
+            tail += self.__field('sha256', digest.hexdigest())
+        return tail + ('--%s--\r\n' %self.boundary).encode()
+
+    def __iter__(self):
+        self.sent = 0
+        for chunk in self.__chunks():
+            self.sent += len(chunk)
+            yield chunk
+
+    def __chunks(self):
+        yield self.__head()
+
+        compressor = None
+        if self.compression == 'gzip':
+            compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+        elif self.compression == 'zstd':
+            compressor = zstandard.ZstdCompressor().compressobj()
+
+        digest = hashlib.sha256()
+        read = 0
+        while True:
+            chunk = self.file.read(self.chunk_size)
+            if not chunk:
+                break
+            if isinstance(chunk, str):
+                chunk = chunk.encode()
+            read += len(chunk)
+            if self.checksum:
+                digest.update(chunk)
+            if self.progress is not None:
+                self.progress(read, self.total)
+            if compressor is not None:
+                chunk = compressor.compress(chunk)
+            if chunk:
+                yield chunk
+
+        if compressor is not None:
+            yield compressor.flush()
+        yield self.__tail(digest)
+
+    def read(self, size = -1):
+        '''
+        File-like access to the encoded body.
+        '''
+        if self.stream is None:
+            self.stream = IterFile(self)
+        return self.stream.read(size)
+
+class IterFile(object):
+    '''
+    Read-only file-like wrapper around an iterator of byte strings. Used to \
+    stream serialised in-memory data into a MultipartEncoder without \
+    building the whole file first.
+    '''
+
+    def __init__(self, chunks, name = None):
+        self.chunks = iter(chunks)
+        self.name = name
+        self.buffer = b''
+        return
+
+    def read(self, size = -1):
+        while size < 0 or len(self.buffer) < size:
+            try:
+                self.buffer += next(self.chunks)
+            except StopIteration:
+                break
+        if size < 0:
+            size = len(self.buffer)
+        data, self.buffer = self.buffer[:size], self.buffer[size:]
+        return data
+
+def tableChunks(table, chunk_rows = 10000):
+    '''
+    Serialise a table to tab separated text, chunk_rows rows at a time.
+
+    Every kind of table is written the same way: numbers and booleans as \
+    Python prints them (1.0, True), missing values as empty fields and \
+    text unquoted. Values cannot contain tabs or line breaks.
+
+    Args:
+        table: A pandas DataFrame (the index is not written), pyarrow Table or RecordBatch, or NumPy structured / record array.
+
+        chunk_rows (int): Number of rows serialised per chunk. Default = 10000.
+
+    Returns:
+        Iterator of bytes.
+
+    Raises:
+        ValueError: Raised, while the table is read, for a column name or value containing a tab or line break.
+    '''
+    if hasattr(table, 'to_csv') and hasattr(table, 'iloc'):
+        return _dataFrameChunks(table, chunk_rows)
+    if hasattr(table, 'to_batches') or hasattr(table, 'num_rows'):
+        return _arrowChunks(table, chunk_rows)
+    if getattr(getattr(table, 'dtype', None), 'names', None):
+        return _recordChunks(table, chunk_rows)
+    raise TypeError('Cannot upload %s as tabular data' %type(table).__name__)
+
+def _dataFrameChunks(df, chunk_rows):
+    names = [str(_) for _ in df.columns]
+    yield _line(names, names, None).encode()
+    text = [i for i, dtype in enumerate(df.dtypes) if dtype.kind in 'OSU' or str(dtype) == 'string']
+    for start in range(0, len(df), chunk_rows):
+        chunk = df.iloc[start:start + chunk_rows]
+        for i in text:
+            invalid = chunk.iloc[:, i].astype(str).str.contains('[\t\r\n]', regex = True)
+            if invalid.any():
+                raise _separatorError(names[i], start + int(invalid.values.argmax()))
+        # unquoted like the other tables; separators were ruled out above
+        yield chunk.to_csv(sep = '\t', index = False, header = False, quoting = csv.QUOTE_NONE).encode()
+
+def _arrowChunks(table, chunk_rows):
+    batches = table.to_batches(max_chunksize = chunk_rows) if hasattr(table, 'to_batches') else [table]
+    names = list(table.schema.names)
+    yield _line(names, names, None).encode()
+    row = 0
+    for batch in batches:
+        columns = [batch.column(i).to_pylist() for i in range(batch.num_columns)]
+        yield _lines(names, zip(*columns), row).encode()
+        row += batch.num_rows
+
+def _recordChunks(records, chunk_rows):
+    names = list(records.dtype.names)
+    yield _line(names, names, None).encode()
+    for start in range(0, len(records), chunk_rows):
+        yield _lines(names, records[start:start + chunk_rows].tolist(), start).encode()
+
+def _lines(names, rows, start):
+    return ''.join(_line(names, values, start + i) for i, values in enumerate(rows))
+
+def _line(names, values, row):
+    text = '\t'.join(map(_text, values))
+    # a separator inside a value shows up as an extra field or line
+    if text.count('\t') != len(names) - 1 or '\n' in text or '\r' in text:
+        for name, value in zip(names, values):
+            if any(_ in _text(value) for _ in '\t\r\n'):
+                raise _separatorError(name, row)
+    return text + '\n'
+
+def _separatorError(name, row):
+    where = 'Column name "%s"' %name if row is None else 'Value of column "%s" in row %s' %(name, row)
+    return ValueError('%s contains a tab or line break, which cannot be uploaded as tab separated text' %where)
+
+def _text(value):
+    if value is None:
+        return ''
+    if isinstance(value, bytes):
+        return value.decode()
+    if value != value:
+        return ''
+    return str(value)
+
+def parameterChunks(parameters):
+    '''
+    Serialise a parameter set dict to YAML.
+
+    Returns:
+        Iterator of bytes.
+    '''
+    import yaml
+
+    yield yaml.safe_dump(parameters, default_flow_style = False).encode()
+
+def _fileSize(file):
+    try:
+        return os.fstat(file.fileno()).st_size - file.tell()
+    except (AttributeError, OSError, io.UnsupportedOperation):
+        pass
+    try:
+        return len(file.getbuffer()) - file.tell()
+    except (AttributeError, ValueError):
+        return None
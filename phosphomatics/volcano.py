@@ -0,0 +1,186 @@
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from .results import RecordTable
+
+# analysis targets re-thresholded locally, from one fetch of the same target
+LOCAL_TARGETS = ('makeVolcano', 'makeKinaseVolcanoPlot')
+
+# VolcanoIndex arguments naming record fields, the first three are required
+FIELD_ARGS = ('fc_field', 'pval_field', 'significant_field', 'adjusted_field')
+
+# arguments applied by the index rather than sent to the server
+THRESHOLD_ARGS = ('fc', 'pval', 'pvalType')
+
+class VolcanoIndex(object):
+    '''
+    Per-site statistics of a volcano result, held as NumPy columns sorted \
+    by p-value and by absolute fold change, so that thresholds can be \
+    changed locally::
+
+        index = VolcanoIndex(
+            exp.makeVolcano(fc = 0, pval = 0, group1 = 'CTRL', group2 = 'THZ1'),
+            fc_field = 'log2FC', pval_field = 'pval', significant_field = 'significant'
+        )
+        index.volcano(fc = 1, pval = 0.05)      # same shape as makeVolcano
+        index.top(20, fc = 1)                   # 20 most significant sites with |FC| >= 1
+
+    The source result must contain every site, i.e. be fetched with fc = 0 \
+    and pval = 0. Phosphomatics(local_filtering = {...}) does this \
+    automatically.
+
+    Thresholds follow the server's conventions: a site is significant if \
+    its p-value is below pval and its absolute fold change is at least fc, \
+    and a threshold of 0 or None lets every site pass. Benjamini-Hochberg \
+    adjusted p-values are computed locally unless adjusted_field is given.
+
+    Requires NumPy.
+
+    Args:
+        result (dict or Result): Volcano result with every site.
+
+        fc_field (str): Record field holding the log2 fold change.
+
+        pval_field (str): Record field holding the raw p-value.
+
+        significant_field (str): Record field flagging significant sites, updated by volcano().
+
+        records (str): Key of the per-site records. Default = 'data'.
+
+        adjusted_field (str): Record field holding BH adjusted p-values. Default = None, i.e. computed locally.
+
+    Raises:
+        ValueError: Raised if result has no records key, or its records lack one of the named fields.
+    '''
+
+    def __init__(self, result, fc_field, pval_field, significant_field, records = 'data', adjusted_field = None):
+        if numpy is None:
+            raise ImportError('VolcanoIndex requires numpy. Install it with "pip install numpy"')
+        self.key = records
+        self.significant_field = significant_field
+
+        tables = getattr(result, 'tables', {})
+        if records in tables:
+            self.table = tables[records]
+        elif records in result:
+            self.table = RecordTable.fromRecords(result[records])
+        else:
+            raise ValueError('Result has no "%s" records, its keys are %s' %(records, ', '.join(map(str, result))))
+        self.fields = {k: result[k] for k in result if k != records}
+        self.order = list(result)
+
+        fields = [fc_field, pval_field, significant_field]
+        if adjusted_field is not None:
+            fields.append(adjusted_field)
+        missing = [_ for _ in fields if _ not in self.table.names]
+        if missing and len(self.table):
+            raise ValueError('Records of "%s" have no field %s; their fields are %s' %(
+                records, ', '.join(map(str, missing)), ', '.join(map(str, self.table.names))
+            ))
+
+        self.fc = self.__column(fc_field)
+        self.pval = self.__column(pval_field)
+        self.absfc = numpy.abs(self.fc)
+        self.adjusted = None
+        if adjusted_field is not None:
+            self.adjusted = self.__column(adjusted_field)
+
+        # NaN sorts last, so the valid p-values form a prefix of byPval
+        self.byPval = numpy.argsort(self.pval, kind = 'stable')
+        self.byFC = numpy.argsort(-self.absfc, kind = 'stable')
+        self.valid = int(numpy.count_nonzero(~numpy.isnan(self.pval)))
+        return
+
+    def __column(self, name):
+        # a result without sites has no fields to check
+        if name not in self.table.names:
+            return numpy.zeros(0)
+        return numpy.asarray(self.table[name], dtype = numpy.float64)
+
+    def __len__(self):
+        return len(self.pval)
+
+    def pvalues(self, pvalType = 'raw'):
+        '''
+        Returns:
+            Raw p-values, or Benjamini-Hochberg adjusted p-values for pvalType = 'BH'.
+        '''
+        if pvalType != 'BH':
+            return self.pval
+        if self.adjusted is None:
+            order = self.byPval[:self.valid]
+            ranked = self.pval[order] * self.valid / numpy.arange(1, self.valid + 1)
+            ranked = numpy.minimum.accumulate(ranked[::-1])[::-1]
+            self.adjusted = numpy.full(len(self.pval), numpy.nan)
+            self.adjusted[order] = numpy.minimum(ranked, 1)
+        return self.adjusted
+
+    def mask(self, fc = None, pval = None, pvalType = 'raw'):
+        '''
+        Returns:
+            Boolean array, True for sites passing both thresholds.
+        '''
+        if not pval:
+            passed = numpy.ones(len(self.pval), dtype = bool)
+            if fc:
+                passed &= self.absfc >= fc
+            return passed
+        # adjusted p-values keep the order of the raw ones, so the sites
+        # below the cutoff are a prefix of byPval
+        ordered = self.pvalues(pvalType)[self.byPval[:self.valid]]
+        candidates = self.byPval[:numpy.searchsorted(ordered, pval, side = 'left')]
+        if fc:
+            candidates = candidates[self.absfc[candidates] >= fc]
+        passed = numpy.zeros(len(self.pval), dtype = bool)
+        passed[candidates] = True
+        return passed
+
+    def volcano(self, fc = None, pval = None, pvalType = 'raw', table = False):
+        '''
+        Every site, with significant_field set from the thresholds.
+
+        Args:
+            table (bool): Put a RecordTable under the records key instead of a list of dicts, e.g. for typedResult. Default = False.
+
+        Returns:
+            Dict shaped like the source result.
+        '''
+        columns = {**self.table.columns, self.significant_field: self.mask(fc, pval, pvalType)}
+        names = self.table.names
+        if self.significant_field not in names:
+            names.append(self.significant_field)
+        return self.__result(RecordTable(columns, names), table)
+
+    def filter(self, fc = None, pval = None, pvalType = 'raw', table = False):
+        '''
+        Returns:
+            Dict shaped like the source result holding only the sites that pass, in p-value order.
+        '''
+        passed = self.mask(fc, pval, pvalType)
+        order = self.byPval[passed[self.byPval]]
+        return self.__result(self.table[order], table)
+
+    def top(self, n, by = 'pval', fc = None, pval = None, pvalType = 'raw', table = False):
+        '''
+        The n sites with the lowest p-value (by = 'pval') or the largest \
+        absolute fold change (by = 'fc') among those passing the thresholds.
+
+        Returns:
+            Dict shaped like the source result.
+        '''
+        if by not in ('pval', 'fc'):
+            raise ValueError('by must be "pval" or "fc", not "%s"' %by)
+        order = self.byPval if by == 'pval' else self.byFC
+        if fc or pval:
+            order = order[self.mask(fc, pval, pvalType)[order]]
+        return self.__result(self.table[order[:n]], table)
+
+    def __result(self, records, table):
+        if not table:
+            records = records.toRecords()
+        result = {}
+        for key in self.order:
+            result[key] = records if key == self.key else self.fields[key]
+        return result
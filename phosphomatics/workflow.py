@@ -0,0 +1,169 @@
+from concurrent.futures import wait, FIRST_COMPLETED
+
+class Workflow(object):
+    '''
+    Run the analyses of a dataset as a dependency graph::
+
+        flow = Workflow(exp)
+        flow.add('process')
+        for group in (1, 2):
+            flow.add('pca%s' %group, 'getPCA', group = group, after = ['process'])
+            flow.add('volcano%s' %group, 'makeVolcano', group = group, after = ['process'], fc = 1)
+        results = flow.run()
+
+    Analyses whose dependencies have finished are submitted concurrently. \
+    The selected data group is server side state, so analyses that need a \
+    group only run while that group is selected: the engine runs every \
+    ready analysis of the selected group, and switches group only when none \
+    are left and no analysis of the current group is still running. \
+    It then switches to the group with the most ready analyses. Analyses \
+    without a group run alongside any group. After run() the last group \
+    used remains selected.
+
+    Args:
+        exp (Phosphomatics): Session with a datasetToken set.
+
+        max_in_flight (int): Maximum number of tasks running at once. Default = 16.
+    '''
+
+    def __init__(self, exp, max_in_flight = 16):
+        self.exp = exp
+        self.max_in_flight = max_in_flight
+        self.steps = {}
+        self.switches = 0
+        self.groups = None
+        return
+
+    def add(self, name, method = None, group = None, after = (), **kwargs):
+        '''
+        Declare an analysis.
+
+        Args:
+            name (str): Unique name of the step. Results are returned under this name.
+
+            method (str): Phosphomatics method to call, e.g. 'getPCA' or 'process'. Default = name.
+
+            group (int or str): Data group id or name that must be selected while the analysis runs. None for analyses that do not depend on the selected group. Default = None.
+
+            after (list): Names of steps that must finish first. Default = ().
+
+            **kwargs: Arguments for the method.
+
+        Returns:
+            name, so that it can be used in another step's after list.
+        '''
+        if name in self.steps:
+            raise ValueError('Duplicate step "%s"' %name)
+        method = method or name
+        if method.startswith('_') or not callable(getattr(self.exp, method, None)):
+            raise ValueError('Unknown analysis "%s"' %method)
+        self.steps[name] = {
+            'method': method, 'group': group, 'after': list(after), 'kwargs': kwargs
+        }
+        return name
+
+    def order(self):
+        '''
+        Returns:
+            Step names in a valid execution order.
+
+        Raises:
+            ValueError: Raised for unknown dependencies or dependency cycles.
+        '''
+        order, state = [], {}
+
+        def visit(name, path):
+            if state.get(name) == 'done':
+                return
+            if state.get(name) == 'visiting':
+                raise ValueError('Dependency cycle: %s' %' -> '.join(path + [name]))
+            state[name] = 'visiting'
+            for dependency in self.steps[name]['after']:
+                if dependency not in self.steps:
+                    raise ValueError('Step "%s" depends on unknown step "%s"' %(name, dependency))
+                visit(dependency, path + [name])
+            state[name] = 'done'
+            order.append(name)
+
+        for name in self.steps:
+            visit(name, [])
+        return order
+
+    def run(self):
+        '''
+        Run every step.
+
+        Returns:
+            Dict mapping step name to result.
+
+        Raises:
+            Exception: The exception of the first step that failed. No new steps are started after a failure; running steps are waited for.
+        '''
+        order = self.order()
+        pending = {name: set(self.steps[name]['after']) for name in order}
+        results = {}
+        running = {}
+        selected = None
+        error = None
+
+        while pending or running:
+            ready = [_ for _ in pending if not pending[_]] if error is None else []
+
+            # submit everything that can run under the current group
+            for name in ready:
+                if len(running) >= self.max_in_flight:
+                    break
+                step = self.steps[name]
+                if step['group'] is not None and self.__groupId(step['group']) != selected:
+                    continue
+                running[self.__submit(step)] = name
+                del pending[name]
+
+            # switch group once nothing bound to the current group is running
+            waiting = [_ for _ in pending if not pending[_] and self.steps[_]['group'] is not None]
+            bound = [_ for _ in running.values() if self.steps[_]['group'] is not None]
+            if waiting and not bound and error is None and len(running) < self.max_in_flight:
+                counts = {}
+                for name in waiting:
+                    group = self.__groupId(self.steps[name]['group'])
+                    counts[group] = counts.get(group, 0) + 1
+                selected = max(counts, key = counts.get)
+                self.exp.setSelectedGroup(selected)
+                self.switches += 1
+                continue
+
+            if not running:
+                if error is not None:
+                    break
+                if pending:
+                    raise ValueError('Steps can not be scheduled: %s' %', '.join(pending))
+                break
+
+            done, _ = wait(running, return_when = FIRST_COMPLETED)
+            for task in done:
+                name = running.pop(task)
+                try:
+                    results[name] = task.result()
+                except Exception as e:
+                    if error is None:
+                        error = e
+                    continue
+                for dependencies in pending.values():
+                    dependencies.discard(name)
+
+        if error is not None:
+            raise error
+        return results
+
+    def __submit(self, step):
+        return getattr(self.exp, step['method'])(wait = False, **step['kwargs'])
+
+    def __groupId(self, group):
+        if isinstance(group, int):
+            return group
+        # group names are looked up once, when first needed, i.e. after processing
+        if self.groups is None:
+            self.groups = {_['name']: int(_['id']) for _ in self.exp.getUserDataGroups()}
+        if group not in self.groups:
+            raise ValueError('Unknown data group "%s"' %group)
+        return self.groups[group]
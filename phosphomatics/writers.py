@@ -0,0 +1,447 @@
+import os, json
+
+try:
+    import pyarrow, pyarrow.ipc, pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+try:
+    import h5py
+except ImportError:
+    h5py = None
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from .streaming import ResultSink
+
+# column types: float64, int64, bool, string, and json for nested values stored as JSON text
+TYPES = ('float64', 'int64', 'bool', 'string', 'json')
+
+# known record layouts per apiFunctionTarget, as {key: {column: type}}
+SCHEMAS = {
+    'getPCAPlot': {'data': {'x': 'float64', 'y': 'float64', 'label': 'string', 'group': 'string'}},
+    'getLDAPlot': {'data': {'x': 'float64', 'y': 'float64', 'label': 'string', 'group': 'string'}},
+}
+
+def inferSchema(records):
+    '''
+    Column types for a batch of records. Integers are int64 and other \
+    numbers float64, as are columns mixing integers, floats or bools; \
+    nested values are json and columns without any value are string.
+
+    Returns:
+        Dict mapping column name to type, in first seen order.
+    '''
+    return {name: _columnType(kinds) or 'string' for name, kinds in _kinds(records).items()}
+
+# kinds of values each column type holds without loss; string columns hold anything as str()
+ACCEPTS = {
+    'float64': {'float64', 'int64', 'bool'},
+    'int64': {'int64'},
+    'bool': {'bool'},
+    'string': set(TYPES),
+    'json': set(TYPES),
+}
+
+def _kinds(records):
+    kinds = {}
+    for record in records:
+        for name, value in record.items():
+            seen = kinds.setdefault(name, set())
+            if value is not None:
+                seen.add(_kind(value))
+    return kinds
+
+def _kind(value):
+    if isinstance(value, bool):
+        return 'bool'
+    if isinstance(value, int):
+        # beyond int64, as in results._column
+        return 'int64' if -2 ** 63 <= value < 2 ** 63 else 'float64'
+    if isinstance(value, float):
+        return 'float64'
+    if isinstance(value, str):
+        return 'string'
+    return 'json'
+
+def _columnType(kinds):
+    if not kinds:
+        return None
+    if len(kinds) == 1:
+        return next(iter(kinds))
+    if kinds <= {'float64', 'int64', 'bool'}:
+        return 'float64'
+    return 'json'
+
+def _convert(values, type):
+    if type == 'json':
+        return [None if _ is None else json.dumps(_) for _ in values]
+    if type == 'float64':
+        return [None if _ is None else float(_) for _ in values]
+    if type == 'string':
+        return [_ if _ is None or isinstance(_, str) else str(_) for _ in values]
+    return values
+
+def _values(records, name, type):
+    return _convert([_.get(name) for _ in records], type)
+
+class TableSink(ResultSink):
+    '''
+    Base class for sinks writing each list of records of a result as a \
+    table, batch_size records at a time, so memory use is bounded by the \
+    batch size rather than the result size. Other fields are written to \
+    fields.json.
+
+    Column types come from schema, else SCHEMAS for the analysis target, \
+    else the first batch of records (see inferSchema). Fields first seen \
+    in a later batch are added as new columns, empty for earlier records. \
+    An inferred column receiving a value its type cannot hold is widened, \
+    int64 or bool to float64 and anything else to json, and the records \
+    already written are rewritten once with the wider type. A value that \
+    does not fit a column typed by schema or SCHEMAS raises ValueError.
+
+    Files are written under a temporary name and renamed when the sink is \
+    closed, so readers never see a partial table. abort() removes them.
+
+    Sinks that cannot store missing integers (nullable_ints = False) infer \
+    float64 for integer fields with missing values.
+
+    Args:
+        path (str): Output directory. Created if it does not exist.
+
+        schema (dict): Column types per records key, as {key: {column: type}} with types from TYPES. Default = None.
+
+        batch_size (int): Records buffered per table before they are written. Default = 65536.
+
+        partition (dict): Hive style partition values, e.g. {'dataset': name}. Tables are then written to <path>/<key>/<name>=<value>/part-0.<extension> and the fields to <path>/<name>=<value>/fields.json, so that results of many datasets form one table per key, readable with e.g. pyarrow.dataset.dataset(path + '/data', partitioning = 'hive'). Default = None, i.e. <path>/<key>.<extension>.
+
+    Returns (from close):
+        Dict of the scalar fields plus, for each list of records, the path of its table.
+    '''
+
+    extension = None
+    nullable_ints = True
+
+    def __init__(self, path, schema = None, batch_size = 65536, partition = None):
+        self.path = path
+        self.schema = schema or {}
+        self.batch_size = batch_size
+        self.partition = partition
+        self.written = []
+        return
+
+    def open(self, target):
+        self.target = target
+        self.fields = {}
+        self.batches = {}
+        self.schemas = {}
+        self.fixed = {}
+        self.untyped = {}
+        self.writers = {}
+        self.files = {}
+        self.temporaries = {}
+        self.written = []
+        return
+
+    def field(self, key, value):
+        self.fields[key] = value
+        return
+
+    def record(self, key, record):
+        batch = self.batches.setdefault(key, [])
+        batch.append(record)
+        if len(batch) >= self.batch_size:
+            self.__flush(key)
+        return
+
+    def file(self, key):
+        '''
+        Returns:
+            Final path of the table for key.
+        '''
+        if not self.partition:
+            return os.path.join(self.path, '%s.%s' %(key, self.extension))
+        return os.path.join(self.path, key, self.__partitionDir(), 'part-0.%s' %self.extension)
+
+    def __partitionDir(self):
+        return os.path.join(*['%s=%s' %(k, v) for k, v in self.partition.items()])
+
+    def __temporary(self, file, generation = 0):
+        # leading dot: pyarrow.dataset and most query engines skip hidden files
+        directory, name = os.path.split(file)
+        return os.path.join(directory, '.%s.%s.tmp' %(name, generation))
+
+    def __schema(self, key, records):
+        kinds = _kinds(records)
+        if key not in self.schemas:
+            schema = self.schema.get(key) or SCHEMAS.get(self.target, {}).get(key)
+            if schema:
+                unknown = [_ for _ in schema.values() if _ not in TYPES]
+                if unknown:
+                    raise ValueError('Unknown column type %s, use one of %s' %(unknown[0], ', '.join(TYPES)))
+                self.fixed[key] = set(schema)
+            else:
+                schema = {}
+                self.fixed[key] = set()
+            self.schemas[key] = dict(schema)
+            self.untyped[key] = set()
+
+        schema = dict(self.schemas[key])
+        untyped = self.untyped[key]
+        if not self.nullable_ints:
+            for name, seen in kinds.items():
+                # fields first seen after a batch was written are missing from the earlier records
+                if 'int64' in seen | {schema.get(name)} and name not in self.fixed[key] and (
+                        (key in self.writers and name not in schema) or
+                        any(_.get(name) is None for _ in records)):
+                    seen.add('float64')
+        for name, seen in kinds.items():
+            if name not in schema or name in untyped:
+                # new fields, and inferred columns that only held None so far
+                schema[name] = _columnType(set(seen)) or 'string'
+                if seen:
+                    untyped.discard(name)
+                else:
+                    untyped.add(name)
+            elif not seen <= ACCEPTS[schema[name]]:
+                if name in self.fixed[key]:
+                    raise ValueError('Field %s of "%s" holds %s values, but its schema type is %s' %(
+                        name, key, ', '.join(sorted(seen - ACCEPTS[schema[name]])), schema[name]
+                    ))
+                schema[name] = _columnType(seen | {schema[name]})
+        return schema
+
+    def __flush(self, key):
+        records = self.batches.pop(key, None)
+        if not records:
+            return
+        schema = self.__schema(key, records)
+        if key in self.writers and schema != self.schemas[key]:
+            self.__rewrite(key, schema)
+        self.schemas[key] = schema
+
+        if key not in self.writers:
+            self.files[key] = self.file(key)
+            self.temporaries[key] = self.__temporary(self.files[key])
+            os.makedirs(os.path.dirname(self.files[key]), exist_ok = True)
+            self.writers[key] = self.openWriter(self.temporaries[key], schema)
+        self.write(self.writers[key], {name: _values(records, name, type) for name, type in schema.items()}, schema)
+        return
+
+    def __rewrite(self, key, schema):
+        # copy the records written so far, batch by batch, into a table with the new schema
+        old = self.temporaries[key]
+        self.closeWriter(self.writers.pop(key))
+        new = self.__temporary(self.files[key], int(old.rsplit('.', 2)[1]) + 1)
+        self.temporaries[key] = new
+        writer = self.writers[key] = self.openWriter(new, schema)
+        for columns in self.readBatches(old, self.schemas[key]):
+            size = len(next(iter(columns.values()), []))
+            self.write(writer, {
+                name: _convert(columns.get(name) or [None] * size, type) for name, type in schema.items()
+            }, schema)
+        os.remove(old)
+        return
+
+    def close(self):
+        try:
+            for key in list(self.batches):
+                self.__flush(key)
+            for key, writer in list(self.writers.items()):
+                self.closeWriter(writer)
+                del self.writers[key]
+                os.replace(self.temporaries.pop(key), self.files[key])
+                self.written.append(self.files[key])
+        except Exception:
+            self.abort()
+            raise
+
+        directory = self.path
+        if self.partition:
+            directory = os.path.join(self.path, self.__partitionDir())
+        os.makedirs(directory, exist_ok = True)
+        file = os.path.join(directory, 'fields.json')
+        with open(file, 'w') as f:
+            json.dump(self.fields, f)
+        self.written.append(file)
+        return {**self.fields, **self.files}
+
+    def abort(self):
+        '''
+        Discard the result: close open tables and remove their temporary \
+        files. Tables already renamed by close() are kept.
+        '''
+        for key, writer in getattr(self, 'writers', {}).items():
+            try:
+                self.closeWriter(writer)
+            except Exception:
+                pass
+        for file in getattr(self, 'temporaries', {}).values():
+            if os.path.exists(file):
+                os.remove(file)
+        self.writers, self.temporaries, self.batches = {}, {}, {}
+        return
+
+    def openWriter(self, file, schema):
+        raise NotImplementedError
+
+    def write(self, writer, columns, schema):
+        '''
+        Append a batch given as {column: list of values}.
+        '''
+        raise NotImplementedError
+
+    def closeWriter(self, writer):
+        raise NotImplementedError
+
+    def readBatches(self, file, schema):
+        '''
+        Read back a closed table written with schema, as batches of \
+        {column: list of values}. Used when a column has to be widened.
+        '''
+        raise NotImplementedError
+
+def _decodeJSON(columns, schema):
+    # json columns are re-encoded by _convert when written again
+    for name, type in schema.items():
+        if type == 'json' and name in columns:
+            columns[name] = [None if _ is None or _ == '' else json.loads(_) for _ in columns[name]]
+    return columns
+
+def _arrowSchema(schema):
+    if pyarrow is None:
+        raise ImportError('Parquet and Arrow output require pyarrow. Install it with "pip install pyarrow"')
+    return pyarrow.schema([
+        (name, pyarrow.string() if type == 'json' else pyarrow.type_for_alias(type))
+        for name, type in schema.items()
+    ])
+
+class ParquetSink(TableSink):
+    '''
+    Write each list of records to a Parquet file, one row group per batch. \
+    Requires pyarrow. See TableSink for the arguments.
+
+    Args:
+        compression (str): Parquet compression codec. Default = 'zstd'.
+    '''
+
+    extension = 'parquet'
+
+    def __init__(self, path, schema = None, batch_size = 65536, partition = None, compression = 'zstd'):
+        super().__init__(path, schema = schema, batch_size = batch_size, partition = partition)
+        self.compression = compression
+        return
+
+    def openWriter(self, file, schema):
+        return pyarrow.parquet.ParquetWriter(file, _arrowSchema(schema), compression = self.compression)
+
+    def write(self, writer, columns, schema):
+        writer.write_table(pyarrow.table(columns, schema = _arrowSchema(schema)))
+        return
+
+    def closeWriter(self, writer):
+        writer.close()
+        return
+
+    def readBatches(self, file, schema):
+        for batch in pyarrow.parquet.ParquetFile(file).iter_batches(batch_size = self.batch_size):
+            yield _decodeJSON(batch.to_pydict(), schema)
+        return
+
+class ArrowSink(TableSink):
+    '''
+    Write each list of records to an Arrow IPC file (Feather v2), one \
+    record batch per batch. Requires pyarrow. See TableSink for the \
+    arguments.
+    '''
+
+    extension = 'arrow'
+
+    def openWriter(self, file, schema):
+        schema = _arrowSchema(schema)
+        return pyarrow.ipc.new_file(pyarrow.OSFile(file, 'wb'), schema)
+
+    def write(self, writer, columns, schema):
+        writer.write_table(pyarrow.table(columns, schema = _arrowSchema(schema)))
+        return
+
+    def closeWriter(self, writer):
+        writer.close()
+        return
+
+    def readBatches(self, file, schema):
+        with pyarrow.OSFile(file, 'rb') as f:
+            reader = pyarrow.ipc.open_file(f)
+            for i in range(reader.num_record_batches):
+                yield _decodeJSON(reader.get_batch(i).to_pydict(), schema)
+        return
+
+class HDF5Sink(TableSink):
+    '''
+    Write each list of records to an HDF5 file with one resizable, \
+    compressed dataset per column. float64 columns store missing values as \
+    NaN; int64 and bool columns store them as 0 and False; string and json \
+    columns as ''. Inferred integer columns with missing values are \
+    therefore float64. Partitioning is not supported. Requires h5py. See \
+    TableSink for the arguments.
+    '''
+
+    extension = 'h5'
+    nullable_ints = False
+
+    def __init__(self, path, schema = None, batch_size = 65536, partition = None):
+        if partition:
+            raise ValueError('HDF5Sink does not support partition')
+        super().__init__(path, schema = schema, batch_size = batch_size)
+        return
+
+    def openWriter(self, file, schema):
+        if h5py is None:
+            raise ImportError('HDF5 output requires h5py. Install it with "pip install h5py"')
+        writer = h5py.File(file, 'w')
+        for name, type in schema.items():
+            writer.create_dataset(
+                name, shape = (0,), maxshape = (None,), chunks = True, compression = 'gzip',
+                dtype = h5py.string_dtype() if type in ('string', 'json') else type
+            )
+        return writer
+
+    def write(self, writer, columns, schema):
+        for name, values in columns.items():
+            type = schema[name]
+            if type == 'float64':
+                values = numpy.array([numpy.nan if _ is None else _ for _ in values], dtype = numpy.float64)
+            elif type in ('int64', 'bool'):
+                values = numpy.array([_ or 0 for _ in values], dtype = type)
+            else:
+                values = numpy.array(['' if _ is None else _ for _ in values], dtype = object)
+            dataset = writer[name]
+            start = dataset.shape[0]
+            dataset.resize((start + len(values),))
+            dataset[start:] = values
+        return
+
+    def closeWriter(self, writer):
+        writer.close()
+        return
+
+    def readBatches(self, file, schema):
+        with h5py.File(file, 'r') as f:
+            size = f[next(iter(schema))].shape[0] if schema else 0
+            for start in range(0, size, self.batch_size):
+                columns = {}
+                for name, type in schema.items():
+                    dataset = f[name]
+                    if type in ('string', 'json'):
+                        dataset = dataset.asstr()
+                    values = dataset[start:start + self.batch_size].tolist()
+                    if type == 'float64':
+                        values = [None if _ != _ else _ for _ in values]
+                    columns[name] = values
+                yield _decodeJSON(columns, schema)
+        return
+
+SINKS = {'parquet': ParquetSink, 'arrow': ArrowSink, 'hdf5': HDF5Sink}
@@ -25,5 +25,19 @@ setup(
     ],
     packages=["phosphomatics"],
     install_requires=["requests"],
+    extras_require={
+        "async": ["aiohttp"],
+        "zstd": ["zstandard"],
+        "pandas": ["pandas"],
+        "arrow": ["pyarrow"],
+        "yaml": ["PyYAML"],
+        "typed": ["numpy", "orjson"],
+        "streaming": ["ijson"],
+        "keyring": ["keyring"],
+        "hdf5": ["h5py", "numpy"],
+    },
+    entry_points={
+        "console_scripts": ["phosphomatics=phosphomatics.cli:main"],
+    },
 )
 
@@ -0,0 +1,31 @@
+import asyncio
+import pytest
+
+pytest.importorskip('aiohttp')
+
+from phosphomatics.aio import AsyncPhosphomatics, AsyncTransport
+from phosphomatics.exceptions import NoPhosphomaticsKey
+from phosphomatics.fakeserver import FakePhosphomaticsServer
+
+def test_concurrent_analyses():
+    async def main(url):
+        async with AsyncPhosphomatics(key = 'KEY', transport = AsyncTransport(url, max_tasks_per_dataset = 2)) as exp:
+            await exp.startNewExperiment()
+            return await asyncio.gather(*[exp.getPCA(pval = _ / 10) for _ in range(6)])
+
+    with FakePhosphomaticsServer(task_latency = 0.3) as server:
+        results = asyncio.run(main(server.url))
+        assert [_['xLabel'] for _ in results] == ['PC1 (50%)'] * 6
+        assert server.requests['apiTask'] == 6
+
+def test_session_must_be_opened():
+    async def main(url):
+        exp = AsyncPhosphomatics(key = 'KEY', transport = AsyncTransport(url))
+        try:
+            await exp.startNewExperiment()
+        finally:
+            await exp.transport.close()
+
+    with FakePhosphomaticsServer() as server:
+        with pytest.raises(NoPhosphomaticsKey):
+            asyncio.run(main(server.url))
@@ -0,0 +1,50 @@
+import os, json
+import pytest
+
+from phosphomatics.batch import BatchRunner
+from phosphomatics.transport import Transport
+from phosphomatics.fakeserver import FakePhosphomaticsServer
+
+def manifest(tmp_path, names):
+    rows = ['name,data,parameters']
+    for name in names:
+        (tmp_path / ('%s.tsv' %name)).write_text('Protein\tIntensity\nP1\t1\n')
+        (tmp_path / ('%s.yaml' %name)).write_text('processing: {}\n')
+        rows.append('%s,%s.tsv,%s.yaml' %(name, name, name))
+    path = tmp_path / 'manifest.csv'
+    path.write_text('\n'.join(rows) + '\n')
+    return str(path)
+
+def runner(server, tmp_path, **kwargs):
+    return BatchRunner(
+        'KEY', manifest(tmp_path, ['a', 'b', 'c']), str(tmp_path / 'out'), analyses = {'getPCA': {}, 'lda': {'method': 'getLDA', 'pval': 0.05}},
+        jobs = 2, validate = False, transport = Transport(server.url), progress = False, **kwargs
+    )
+
+def test_batch_runs_and_resumes(tmp_path):
+    with FakePhosphomaticsServer(task_latency = 0.1) as server:
+        summary = runner(server, tmp_path).run()
+        assert summary == {'a': 'done', 'b': 'done', 'c': 'done'}
+        assert server.requests['process'] == 3 and server.requests['apiTask'] == 6
+        with open(str(tmp_path / 'out' / 'b' / 'lda.json')) as f:
+            assert json.load(f)['xLabel'] == 'PC1 (50%)'
+
+        # completed stages are skipped when the batch is run again
+        with open(str(tmp_path / 'out' / 'batch_state.json')) as f:
+            state = json.load(f)
+        state['c']['stages'] = ['process', 'upload']
+        with open(str(tmp_path / 'out' / 'batch_state.json'), 'w') as f:
+            json.dump(state, f)
+        assert runner(server, tmp_path).run()['c'] == 'done'
+        assert server.requests['process'] == 3 and server.requests['apiTask'] == 8
+        assert server.requests['getNewDataSetToken'] == 3
+
+def test_partitioned_parquet(tmp_path):
+    pyarrow = pytest.importorskip('pyarrow')
+    import pyarrow.dataset
+    with FakePhosphomaticsServer() as server:
+        assert set(runner(server, tmp_path, format = 'parquet', partition = True).run().values()) == {'done'}
+    table = pyarrow.dataset.dataset(str(tmp_path / 'out' / 'getPCA' / 'data'), partitioning = 'hive').to_table()
+    assert table.num_rows == 18
+    assert sorted(set(table.column('dataset').to_pylist())) == ['a', 'b', 'c']
+    assert os.path.exists(str(tmp_path / 'out' / 'getPCA' / 'dataset=a' / 'fields.json'))
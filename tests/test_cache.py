@@ -0,0 +1,46 @@
+import pytest
+
+from phosphomatics.phosphomatics import Phosphomatics
+from phosphomatics.transport import Transport
+from phosphomatics.cache import MemoryCache, DiskCache
+from phosphomatics.fakeserver import FakePhosphomaticsServer
+
+@pytest.fixture
+def server():
+    with FakePhosphomaticsServer() as server:
+        yield server
+
+def session(server, cache):
+    return Phosphomatics(key = 'KEY', transport = Transport(server.url), progress = False, cache = cache)
+
+def test_results_are_cached_until_the_dataset_changes(server, tmp_path):
+    exp = session(server, MemoryCache())
+    exp.startNewExperiment()
+    first = exp.getPCA()
+    assert exp.getPCA() == first and exp.getPCA(wait = False).result() == first
+    assert server.requests['apiTask'] == 1
+    # other arguments are another result
+    exp.getPCA(pval = 0.05)
+    assert server.requests['apiTask'] == 2
+
+    parameters = tmp_path / 'parameters.yaml'
+    parameters.write_text('processing: {}\n')
+    # setSelectedGroup is itself an /apiTask request
+    for change, requests in ((lambda: exp.setSelectedGroup(2), 2), (exp.process, 1),
+            (lambda: exp.uploadParameterSet(str(parameters)), 1)):
+        before = server.requests['apiTask']
+        change()
+        assert exp.getPCA() == first
+        assert exp.getPCA() == first
+        assert server.requests['apiTask'] == before + requests
+
+def test_disk_cache_is_shared(server, tmp_path):
+    cache = str(tmp_path / 'cache')
+    exp = session(server, DiskCache(cache))
+    exp.startNewExperiment()
+    result = exp.getLDA()
+
+    other = session(server, DiskCache(cache))
+    other.setDataSetToken(exp.datasetToken)
+    assert other.getLDA() == result
+    assert server.requests['apiTask'] == 1
@@ -0,0 +1,37 @@
+import sys, json, subprocess
+
+from phosphomatics import cli
+from phosphomatics.cli import main, parser
+from phosphomatics.fakeserver import FakePhosphomaticsServer
+
+def test_commands(tmp_path, capsys):
+    with FakePhosphomaticsServer(task_latency = 0.1) as server:
+        common = ['--key', 'KEY', '--url', server.url]
+        assert main(['new'] + common) is None
+        token = capsys.readouterr().out.strip()
+        assert token in server.datasets
+
+        data = tmp_path / 'data.tsv'
+        data.write_text('Protein\tIntensity\nP1\t1\n')
+        assert main(['upload', '--token', token, '--data', str(data)] + common) is None
+        assert main(['process', '--token', token] + common) is None
+        assert server.requests['uploadExperimentalData'] == server.requests['process'] == 1
+
+        assert main(['run', 'getPCA', 'getLDA', '--token', token, '--arg', 'pval=0.05', '--arg', 'pvalType=BH'] + common) is None
+        results = json.loads(capsys.readouterr().out)
+        assert sorted(results) == ['getLDA', 'getPCA'] and results['getPCA']['xLabel'] == 'PC1 (50%)'
+
+        assert main(['run', 'getPCA', '--token', token, '--format', 'csv', '--output', str(tmp_path / 'out')] + common) is None
+        assert (tmp_path / 'out' / 'getPCA' / 'data.csv').exists()
+
+        # usage errors exit with 2 and a message on stderr
+        assert main(['run', 'notAnAnalysis', '--token', token] + common) == 2
+        assert 'Unknown analysis' in capsys.readouterr().err
+
+def test_help_is_light():
+    # the client and its dependencies are only imported when a command runs
+    code = 'import sys, phosphomatics.cli as cli; cli.parser().format_help(); print("phosphomatics.phosphomatics" in sys.modules)'
+    assert subprocess.check_output([sys.executable, '-c', code]).strip() == b'False'
+    from phosphomatics.phosphomatics import DEFAULT_URL
+    # repeated in the CLI for --help, so it must not drift
+    assert cli.DEFAULT_URL == DEFAULT_URL
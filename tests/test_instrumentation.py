@@ -0,0 +1,30 @@
+import collections
+
+from phosphomatics.phosphomatics import Phosphomatics
+from phosphomatics.transport import Transport
+from phosphomatics.instrumentation import Instrumentation, CallbackSink
+from phosphomatics.fakeserver import FakePhosphomaticsServer
+
+def test_spans_for_blocking_and_concurrent_tasks():
+    records = collections.defaultdict(list)
+    instrumentation = Instrumentation(CallbackSink(lambda kind, name, value, attributes: records[name].append(attributes)))
+
+    with FakePhosphomaticsServer(task_latency = 0.3) as server:
+        exp = Phosphomatics(
+            key = 'KEY', transport = Transport(server.url, instrumentation = instrumentation),
+            progress = False, instrumentation = instrumentation
+        )
+        exp.startNewExperiment()
+        exp.getPCA()
+        tasks = [exp.getLDA(wait = False, pval = _ / 10) for _ in range(3)]
+        for task in tasks:
+            task.result(timeout = 10)
+        exp.close()
+
+    taskIDs = [_.taskID for _ in tasks]
+    # tasks waited on and tasks polled in the background are recorded alike
+    for name in ('submit', 'first_poll', 'decode', 'done'):
+        assert [_['target'] for _ in records[name]].count('getPCAPlot') == 1
+        assert sorted(_['taskID'] for _ in records[name] if _['target'] == 'getLDAPlot') == sorted(taskIDs)
+    assert sorted(_['target'] for _ in records['polls']) == ['getLDAPlot'] * 3 + ['getPCAPlot']
+    assert records['requests'] and not records['failed']
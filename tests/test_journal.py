@@ -0,0 +1,71 @@
+import pytest
+
+from phosphomatics.phosphomatics import Phosphomatics
+from phosphomatics.transport import Transport
+from phosphomatics.journal import TaskJournal, RUNNING, DONE, FAILED
+from phosphomatics.fakeserver import FakePhosphomaticsServer
+
+@pytest.fixture
+def server():
+    with FakePhosphomaticsServer(task_latency = 0.2) as server:
+        yield server
+
+def session(server, journal):
+    exp = Phosphomatics(key = 'KEY', transport = Transport(server.url), progress = False, journal = journal)
+    exp.startNewExperiment()
+    return exp
+
+def status(journal, taskID):
+    return journal.db.execute('SELECT status FROM tasks WHERE taskID = ?', (taskID,)).fetchone()['status']
+
+def test_resume_and_reattach(server, tmp_path):
+    journal = TaskJournal(str(tmp_path / 'journal.sqlite'))
+    exp = session(server, journal)
+    task = exp.getPCA(wait = False)
+    task.cancel()
+    assert [_['taskID'] for _ in journal.pending(exp.datasetToken)] == [task.taskID]
+
+    # a new session, e.g. after a crash, re-attaches instead of submitting again
+    restarted = Phosphomatics(key = 'KEY', transport = Transport(server.url), progress = False, journal = journal)
+    restarted.setDataSetToken(exp.datasetToken)
+    assert restarted.getPCA()['xLabel']
+    assert server.requests['apiTask'] == 1
+    assert status(journal, task.taskID) == DONE
+
+    # a new epoch, here after setSelectedGroup, is never re-attached to
+    pending = restarted.getLDA(wait = False)
+    pending.cancel()
+    restarted.setSelectedGroup(2)
+    assert restarted.getLDA()['xLabel']
+    assert server.requests['apiTask'] == 4
+    assert restarted.resume() == {pending.taskID: server.tasks[pending.taskID][1]}
+    assert journal.pending() == []
+
+def test_lost_task_is_submitted_again(server, tmp_path):
+    journal = TaskJournal(str(tmp_path / 'journal.sqlite'))
+    exp = session(server, journal)
+    # journaled as running, but unknown to the server
+    args = {'pval': 0.5, 'pvalType': 'raw', 'fc': 0.5, 'transformation': None}
+    journal.record('lost-task', exp.datasetToken, 'getPCAPlot', args)
+
+    for _ in range(3):
+        assert exp.getPCA()['xLabel']
+    assert status(journal, 'lost-task') == FAILED
+    assert server.requests['apiTask'] == 3
+    assert journal.pending() == []
+
+    journal.record('lost-task-2', exp.datasetToken, 'getPCAPlot', args)
+    assert exp.getPCA(wait = False).result(timeout = 10)['xLabel']
+    assert status(journal, 'lost-task-2') == FAILED
+
+    journal.record('lost-process', exp.datasetToken, 'process', supplemental = {'url': '/processSampleGroupings'})
+    exp.process()
+    assert status(journal, 'lost-process') == FAILED
+    assert server.requests['process'] == 1
+
+def test_find_is_bounded_by_age(tmp_path):
+    journal = TaskJournal(str(tmp_path / 'journal.sqlite'), max_age = 60)
+    journal.record('old', 'TOKEN', 'getPCAPlot')
+    journal.db.execute('UPDATE tasks SET submitted = submitted - 120')
+    assert journal.find('TOKEN', 'getPCAPlot') is None
+    assert [_['status'] for _ in journal.pending()] == [RUNNING]
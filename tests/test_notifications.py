@@ -0,0 +1,130 @@
+import time
+import pytest
+
+from phosphomatics.phosphomatics import Phosphomatics
+from phosphomatics.transport import Transport
+from phosphomatics.polling import ExponentialBackoff
+from phosphomatics.tasks import RemoteTask, TaskPoller
+from phosphomatics.fakeserver import FakePhosphomaticsServer
+from phosphomatics.notifications import CompletionListener, WebhookListener, EventStreamListener
+
+LATENCY = 0.5
+
+@pytest.fixture
+def server():
+    with FakePhosphomaticsServer(task_latency = LATENCY) as server:
+        yield server
+
+def session(server, notifications):
+    exp = Phosphomatics(
+        key = 'KEY', transport = Transport(server.url), progress = False, notifications = notifications,
+        polling = ExponentialBackoff(timeout = 20)
+    )
+    exp.startNewExperiment()
+    server.requests.clear()
+    return exp
+
+def statusRequests(server):
+    return server.requests['checkProcessingStatus']
+
+def test_webhook_delivery(server):
+    with WebhookListener(fallback = 30) as listener:
+        exp = session(server, listener)
+        t1 = time.time()
+        result = exp.getPCA()
+        assert time.time() - t1 < 5
+        assert result['xLabel']
+        assert server.events['webhook'] == 1
+        assert listener.isFinished(list(server.tasks)[-1])
+        # without polling, the result is fetched with a single status request
+        assert statusRequests(server) == 1
+
+        tasks = [exp.getLDA(wait = False) for _ in range(5)]
+        assert all(_.result(timeout = 5)['xLabel'] for _ in tasks)
+        assert server.events['webhook'] == 6
+        exp.close()
+
+def test_idle_pollers_unsubscribe(server):
+    with WebhookListener(fallback = 30) as listener:
+        # sessions come and go while the listener is shared
+        for _ in range(3):
+            exp = session(server, listener)
+            tasks = [exp.getPCA(wait = False) for _ in range(2)]
+            assert len(listener.subscribers) == 1
+            assert all(_.result(timeout = 5)['xLabel'] for _ in tasks)
+            deadline = time.time() + 5
+            while listener.subscribers and time.time() < deadline:
+                time.sleep(0.05)
+            assert listener.subscribers == []
+            exp.close()
+
+def test_event_stream_delivery(server):
+    with EventStreamListener(fallback = 30) as listener:
+        exp = session(server, listener)
+        t1 = time.time()
+        assert exp.getPCA()['xLabel']
+        assert time.time() - t1 < 5
+        assert listener.events == 1
+        assert statusRequests(server) == 1
+        exp.close()
+
+def test_event_stream_reconnect(server):
+    with EventStreamListener(fallback = 30) as listener:
+        exp = session(server, listener)
+        exp.getPCA()
+        streams = server.requests['taskEvents']
+
+        server.dropStreams()
+        deadline = time.time() + 5
+        while server.requests['taskEvents'] == streams and time.time() < deadline:
+            time.sleep(0.05)
+        assert server.requests['taskEvents'] == streams + 1
+
+        # the event arrives on the new stream, well before the fallback
+        t1 = time.time()
+        exp.getPCA(pval = 0.05)
+        assert time.time() - t1 < 5
+        assert listener.events == 2
+        exp.close()
+
+def test_event_before_wait(server):
+    listener = CompletionListener(fallback = 30, history = 2)
+    transport = Transport(server.url)
+    data = {'key': 'KEY', 'datasetToken': 'TOKEN', 'api': True}
+    taskID = transport.post('/apiTask', data = {**data, 'apiFunctionTarget': 'getPCAPlot'}).json()['taskID']
+    time.sleep(LATENCY)
+
+    # the event arrives before anything waits on the task
+    listener.notify(taskID)
+    assert listener.isFinished(taskID)
+    assert listener.wait(taskID, timeout = 0)
+
+    poller = TaskPoller(transport, ExponentialBackoff(), notifications = listener)
+    task = poller.submit(RemoteTask(taskID), {**data, 'taskID': taskID})
+    t1 = time.time()
+    assert task.result(timeout = 5)['xLabel']
+    assert time.time() - t1 < 5
+    assert statusRequests(server) == 1
+
+    # only the most recent history events are remembered
+    listener.notify('a')
+    listener.notify('b')
+    assert not listener.isFinished(taskID)
+    assert listener.isFinished('a') and listener.isFinished('b')
+    transport.close()
+
+def test_fallback_when_events_are_lost(server):
+    # the server cannot reach the callback URL, so no event ever arrives
+    with WebhookListener(url = 'http://127.0.0.1:9/taskFinished', fallback = 0.5) as listener:
+        exp = session(server, listener)
+        assert exp.getPCA()['xLabel']
+        task = exp.getLDA(wait = False)
+        assert task.result(timeout = 10)['xLabel']
+
+        deadline = time.time() + 5
+        while server.events['webhook_failed'] < 2 and time.time() < deadline:
+            time.sleep(0.05)
+        assert server.events['webhook_failed'] == 2
+        assert listener.events == 0
+        assert statusRequests(server) >= 2
+        exp.close()
@@ -0,0 +1,37 @@
+import pytest
+
+from phosphomatics.parameters import ParameterSet
+from phosphomatics.exceptions import InvalidParameterSet
+
+PARAMETERS = '''
+sampleAlias:
+  2021: CTRL_1
+  Intensity B: CTRL_2
+columnAssignments:
+  upidColumn: Protein
+  residueColumn: Amino acid
+  siteColumn: Position
+  quantColumns: [2021, CTRL_2, 2022]
+sampleMaps:
+  sampleGroupMap:
+    CTRL_2: CTRL
+    1999: THZ1
+comparisons:
+  - {group1: CTRL, group2: THZ1, name: CTRL vs THZ1}
+processing: {}
+'''
+
+def test_numeric_column_names_are_reported():
+    # YAML reads 2021, 2022 and 1999 as ints
+    params = ParameterSet.fromYAML(PARAMETERS)
+    errors = params.errors(data = ['Protein', 'Amino acid', 'Position', '2022', 'Intensity B'])
+    assert 'quantColumns must use sample aliases, not original names: 2021' in errors
+    assert 'Samples missing from sampleGroupMap: 2021, 2022' in errors
+    assert 'sampleGroupMap samples not in quantColumns: 1999' in errors
+    assert 'sampleAlias columns not found in experimental data: 2021' in errors
+    # the int 2022 matches the header's '2022'
+    assert 'Columns not found in experimental data: 2021' in errors
+
+    with pytest.raises(InvalidParameterSet) as e:
+        params.validate()
+    assert e.value.errors == params.errors()
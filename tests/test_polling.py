@@ -0,0 +1,39 @@
+import time
+import itertools
+import pytest
+
+from phosphomatics.phosphomatics import Phosphomatics
+from phosphomatics.transport import Transport
+from phosphomatics.polling import ExponentialBackoff, FixedInterval
+from phosphomatics.exceptions import TaskTimeoutError
+from phosphomatics.fakeserver import FakePhosphomaticsServer
+
+def session(server, polling):
+    exp = Phosphomatics(key = 'KEY', transport = Transport(server.url), polling = polling, progress = False)
+    exp.startNewExperiment()
+    return exp
+
+def test_backoff_schedule():
+    delays = list(itertools.islice(ExponentialBackoff(initial = 0.1, factor = 2, max_interval = 0.5, jitter = 0).delays(), 6))
+    assert delays == [0, 0.1, 0.2, 0.4, 0.5, 0.5]
+    assert list(itertools.islice(FixedInterval(2).delays(), 3)) == [2, 2, 2]
+
+def test_backoff_picks_up_short_tasks():
+    with FakePhosphomaticsServer(task_latency = 0.1) as server:
+        exp = session(server, ExponentialBackoff())
+        t1 = time.time()
+        exp.getPCA()
+        assert time.time() - t1 < 0.5
+        exp.close()
+
+def test_long_poll_and_timeout():
+    with FakePhosphomaticsServer(task_latency = 0.5) as server:
+        exp = session(server, ExponentialBackoff(long_poll = 5))
+        exp.getPCA()
+        # the server held the first status request until the task finished
+        assert server.requests['checkProcessingStatus'] == 1
+
+        exp = session(server, FixedInterval(0.1, timeout = 0.2))
+        with pytest.raises(TaskTimeoutError):
+            exp.getPCA()
+        exp.close()
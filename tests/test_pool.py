@@ -0,0 +1,37 @@
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+
+from phosphomatics.pool import PhosphomaticsPool
+from phosphomatics.fakeserver import FakePhosphomaticsServer
+
+@pytest.fixture
+def servers():
+    servers = [FakePhosphomaticsServer(task_latency = 0.2) for _ in range(3)]
+    for server in servers:
+        server.__enter__()
+    yield servers
+    for server in servers:
+        server.__exit__(None, None, None)
+
+def test_experiments_are_spread_over_endpoints(servers, tmp_path):
+    pins = str(tmp_path / 'pins.json')
+    with PhosphomaticsPool([(_.url, 'KEY') for _ in servers], pins = pins, progress = False) as pool:
+        tokens = []
+        for _ in range(6):
+            exp = pool.startNewExperiment()
+            exp.process()
+            tokens.append(exp.datasetToken)
+        assert [_.requests['process'] for _ in servers] == [2, 2, 2]
+
+        # experiments started at the same time reserve their endpoint up front
+        with ThreadPoolExecutor(6) as executor:
+            list(executor.map(lambda _: pool.startNewExperiment().process(), range(6)))
+        assert [_.requests['process'] for _ in servers] == [4, 4, 4]
+
+    # pins survive a restart and keep counting towards the endpoint's load
+    with PhosphomaticsPool([(_.url, 'KEY') for _ in servers], pins = pins, progress = False) as pool:
+        assert [_['datasets'] for _ in pool.stats()] == [4, 4, 4]
+        exp = pool.session(tokens[1])
+        assert exp.transport is pool.endpoint(tokens[1]).transport
+        exp.getPCA()
+        assert sum(_.requests['apiTask'] for _ in servers) == 1
@@ -0,0 +1,10 @@
+from phosphomatics.results import Result, RecordTable
+
+def test_integers_are_returned_unchanged():
+    raw = {'data': [{'n': 12, 'x': 0.5, 'm': 1}, {'n': 3, 'x': 2.0, 'm': None}], 'count': 2}
+    result = Result(raw, target = 'makeVolcano')
+    assert result.table('data')['n'].dtype.kind == 'i'
+    assert result['data'][0]['n'] == 12 and isinstance(result['data'][0]['n'], int)
+    assert result.raw == raw
+    # missing values need NaN, so such columns stay float64
+    assert RecordTable.fromRecords(raw['data'])['m'].dtype.kind == 'f'
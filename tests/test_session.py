@@ -0,0 +1,51 @@
+import pytest
+
+from phosphomatics.phosphomatics import Phosphomatics
+from phosphomatics.transport import Transport
+from phosphomatics.cache import KeyCache
+from phosphomatics.exceptions import NoDataSetTokenError, NoPhosphomaticsKey, InvalidKey
+from phosphomatics.fakeserver import FakePhosphomaticsServer
+
+@pytest.fixture
+def server():
+    with FakePhosphomaticsServer(keys = ['KEY']) as server:
+        yield server
+
+def session(server, key = 'KEY', **kwargs):
+    return Phosphomatics(key = key, transport = Transport(server.url), progress = False, **kwargs)
+
+def test_methods_require_a_dataset_token(server):
+    exp = session(server)
+    for call in (exp.getPCA, exp.process, lambda: exp.getLDA(wait = False), lambda: exp.uploadParameterSet({})):
+        with pytest.raises(NoDataSetTokenError):
+            call()
+    assert server.requests['apiTask'] == server.requests['process'] == 0
+    # the check is applied once to the class, not on every attribute access
+    assert '__getattribute__' not in vars(Phosphomatics)
+    assert Phosphomatics.getPCA.__wrapped__.__name__ == 'getPCA'
+    assert exp.getDataSetToken() is None
+
+    exp.startNewExperiment()
+    assert exp.getPCA()['xLabel']
+
+def test_key_validation(server, tmp_path):
+    with pytest.raises(NoPhosphomaticsKey):
+        session(server, key = None)
+    with pytest.raises(InvalidKey):
+        session(server, key = 'WRONG')
+    assert server.requests['authenticateAPIKey'] == 1
+
+    # lazily validated: not at all when restoring a dataset token, once before a new experiment
+    exp = session(server, key = 'WRONG', lazy_auth = True)
+    exp.setDataSetToken('TOKEN')
+    assert server.requests['authenticateAPIKey'] == 1
+    with pytest.raises(InvalidKey):
+        exp.startNewExperiment()
+    assert server.requests['authenticateAPIKey'] == 2
+
+def test_key_cache(server, tmp_path):
+    cache = KeyCache(str(tmp_path / 'keys'))
+    for _ in range(3):
+        session(server, key_cache = cache).startNewExperiment()
+    assert server.requests['authenticateAPIKey'] == 1
+    assert server.requests['getNewDataSetToken'] == 3
@@ -0,0 +1,23 @@
+from phosphomatics.phosphomatics import Phosphomatics
+from phosphomatics.transport import Transport
+from phosphomatics.fakeserver import FakePhosphomaticsServer
+
+def test_many_sites_share_status_requests():
+    sites = [('P%05d' %i, i, 'S') for i in range(200)]
+    with FakePhosphomaticsServer(task_latency = 0.3) as server:
+        exp = Phosphomatics(key = 'KEY', transport = Transport(server.url), progress = False)
+        exp.startNewExperiment()
+        server.requests.clear()
+
+        results = dict(exp.makeFeatureAbundancePlots(sites, max_in_flight = 50))
+        assert sorted(results) == sites
+        assert all(_['target'] == 'makeFeatureAbundancePlot' for _ in results.values())
+        assert server.requests['apiTask'] == 200
+        assert server.requests['checkProcessingStatus'] < 100
+
+        # dicts are accepted as well
+        correlations = list(exp.makeSubstrateCorrelationPlots(
+            [{'substrateUPID': 'P1', 'position': 5, 'residue': 'T'}], topN = 10
+        ))
+        assert correlations[0][0] == ('P1', 5, 'T')
+        exp.close()
@@ -0,0 +1,42 @@
+import io, json
+import pytest
+
+from phosphomatics.phosphomatics import Phosphomatics
+from phosphomatics.transport import Transport
+from phosphomatics.streaming import decodeStream, JSONLinesSink
+from phosphomatics.results import Result
+from phosphomatics.fakeserver import FakePhosphomaticsServer
+
+RESULT = {
+    'container': 'x' * 1000, 'target': 'makeVolcano', 'nested': {'a': [1, 2]},
+    'data': [{'id': 'P%s' %i, 'log2FC': i / 10, 'significant': i % 2 == 0} for i in range(100)],
+    'processingDone': True,
+}
+
+def test_decode_stream():
+    result = decodeStream(io.BytesIO(json.dumps(RESULT).encode()))
+    assert 'container' not in result
+    assert result['data'] == RESULT['data'] and result['nested'] == {'a': [1, 2]}
+
+    typed = decodeStream(io.BytesIO(json.dumps(RESULT).encode()), typed = True)
+    assert typed['data']['log2FC'].dtype.kind == 'f' and len(typed['data']) == 100
+
+def test_streaming_session(tmp_path):
+    with FakePhosphomaticsServer(result_size = 5000, container_size = 10000) as server:
+        plain = Phosphomatics(key = 'KEY', transport = Transport(server.url), progress = False)
+        streaming = Phosphomatics(
+            key = 'KEY', transport = Transport(server.url), progress = False, streaming = True, typed_results = True
+        )
+        plain.startNewExperiment()
+        streaming.setDataSetToken(plain.datasetToken)
+
+        expected = plain.makeVolcano()
+        result = streaming.makeVolcano()
+        assert isinstance(result, Result)
+        assert result.raw == expected and 'container' not in expected
+
+        written = streaming.makeClusterMap(sink = JSONLinesSink(str(tmp_path)))
+        with open(written['data']) as f:
+            assert sum(1 for _ in f) == 5000
+        plain.close()
+        streaming.close()
@@ -0,0 +1,21 @@
+from phosphomatics.phosphomatics import Phosphomatics
+from phosphomatics.transport import Transport
+from phosphomatics.sweep import expandGrid, normalizeArgs
+from phosphomatics.fakeserver import FakePhosphomaticsServer
+
+def test_equivalent_points_are_computed_once():
+    with FakePhosphomaticsServer(task_latency = 0.1) as server:
+        exp = Phosphomatics(key = 'KEY', transport = Transport(server.url), progress = False)
+        exp.startNewExperiment()
+
+        grid = {'fc': [0, 0.5, 1.0], 'pval': [0, 0.05], 'pvalType': ['raw', 'BH']}
+        assert len(expandGrid(grid)) == 12
+        assert normalizeArgs(exp.getPCA, {'pval': 0, 'pvalType': 'BH', 'fc': 1.0}) == \
+            normalizeArgs(exp.getPCA, {'pval': 0, 'fc': 1})
+
+        table = exp.sweep('getPCA', grid)
+        # pvalType does not matter for pval = 0, so 3 * (1 + 2) distinct points
+        assert server.requests['apiTask'] == 9
+        assert len(table) == 12 and table.names == ['fc', 'pval', 'pvalType', 'result']
+        assert all(_['xLabel'] == 'PC1 (50%)' for _ in table['result'])
+        exp.close()
@@ -0,0 +1,57 @@
+from concurrent.futures import as_completed
+import pytest
+
+from phosphomatics.phosphomatics import Phosphomatics
+from phosphomatics.transport import Transport
+from phosphomatics.tasks import RemoteTask, mapTasks
+from phosphomatics.fakeserver import FakePhosphomaticsServer
+
+def session(server):
+    exp = Phosphomatics(key = 'KEY', transport = Transport(server.url), progress = False)
+    exp.startNewExperiment()
+    server.requests.clear()
+    return exp
+
+@pytest.mark.parametrize('batch_status', [True, False])
+def test_concurrent_tasks(batch_status):
+    with FakePhosphomaticsServer(task_latency = 0.5, batch_status = batch_status) as server:
+        exp = session(server)
+        tasks = [exp.getPCA(wait = False, pval = _ / 100) for _ in range(20)]
+        assert all(isinstance(_, RemoteTask) and _.target == 'getPCAPlot' for _ in tasks)
+        assert not any(_.done() for _ in tasks)
+        assert [_.result(timeout = 10)['xLabel'] for _ in as_completed(tasks)] == ['PC1 (50%)'] * 20
+
+        if batch_status:
+            # outstanding tasks share status requests
+            assert server.requests['checkProcessingStatus'] < 20
+        else:
+            # one rejected multi-ID request, then one request per task
+            assert exp.poller.batch is False
+            assert server.requests['checkProcessingStatus'] >= 20
+        exp.close()
+
+def test_map_tasks_limits_tasks_in_flight():
+    with FakePhosphomaticsServer(task_latency = 0.2) as server:
+        exp = session(server)
+        submitted = []
+
+        def submit(pval):
+            submitted.append(pval)
+            assert sum(1 for _ in tasks if not _.done()) < 4
+            task = exp.getLDA(wait = False, pval = pval)
+            tasks.append(task)
+            return task
+
+        tasks = []
+        results = dict(mapTasks(submit, [_ / 10 for _ in range(10)], max_in_flight = 4))
+        assert sorted(results) == submitted
+        exp.close()
+
+def test_cancel_leaves_other_tasks():
+    with FakePhosphomaticsServer(task_latency = 0.3) as server:
+        exp = session(server)
+        first, second = exp.getPCA(wait = False), exp.getLDA(wait = False)
+        assert first.cancel()
+        assert second.result(timeout = 5)['xLabel']
+        assert first.cancelled()
+        exp.close()
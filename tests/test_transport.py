@@ -0,0 +1,37 @@
+import time
+
+from phosphomatics.phosphomatics import Phosphomatics
+from phosphomatics.transport import Transport
+from phosphomatics.fakeserver import FakePhosphomaticsServer
+
+def test_status_checks_are_retried():
+    with FakePhosphomaticsServer(failure_rate = 0.3, seed = 1) as server:
+        transport = Transport(server.url, retries = 8, backoff_factor = 0.01)
+        for _ in range(20):
+            assert transport.post('/authenticateAPIKey', data = {'key': 'KEY'}, idempotent = True).json()['valid'] == 'true'
+        assert server.failures['authenticateAPIKey'] > 0
+        # a request that is not idempotent is sent once
+        statuses = [transport.post('/getNewDataSetToken', data = {'key': 'KEY'}).status_code for _ in range(20)]
+        assert 503 in statuses and server.requests['getNewDataSetToken'] == 20
+        transport.close()
+
+def test_rate_limit():
+    with FakePhosphomaticsServer() as server:
+        transport = Transport(server.url, max_rate = 50)
+        t1 = time.time()
+        for _ in range(11):
+            transport.post('/authenticateAPIKey', data = {'key': 'KEY'})
+        assert time.time() - t1 >= 0.19
+        transport.close()
+
+def test_session_shares_one_transport():
+    with FakePhosphomaticsServer() as server:
+        exp = Phosphomatics(key = 'KEY', transport = Transport(server.url, pool_size = 2), progress = False)
+        exp.startNewExperiment()
+        adapter = exp.transport.session.get_adapter(server.url)
+        for _ in range(5):
+            exp.getPCA()
+        # every request went through the same keep-alive pool
+        assert len(adapter.poolmanager.pools) == 1
+        assert server.requests['apiTask'] == 5
+        exp.close()
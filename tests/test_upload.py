@@ -0,0 +1,74 @@
+import gzip, hashlib
+import pytest
+
+from phosphomatics.phosphomatics import Phosphomatics
+from phosphomatics.transport import Transport
+from phosphomatics.upload import MultipartEncoder, tableChunks
+from phosphomatics.fakeserver import FakePhosphomaticsServer
+
+DATA = b''.join(b'P%05d\tS\t%d\t%f\n' %(i, i % 500, i / 7) for i in range(20000))
+
+def filePart(body, encoder):
+    # the file sits between the part headers and the closing boundary
+    start = body.index(b'\r\n\r\n', body.index(b'filename=')) + 4
+    end = body.index(b'\r\n--%s' %encoder.boundary.encode(), start)
+    return body[start:end]
+
+@pytest.mark.parametrize('compression', [None, 'gzip'])
+def test_streamed_upload(tmp_path, compression):
+    path = tmp_path / 'data.tsv'
+    path.write_bytes(DATA)
+    progress = []
+
+    with FakePhosphomaticsServer() as server:
+        exp = Phosphomatics(key = 'KEY', transport = Transport(server.url), progress = False)
+        exp.startNewExperiment()
+        exp.uploadExperimentalData(
+            str(path), compression = compression, checksum = True, progress = lambda read, total: progress.append((read, total))
+        )
+        received = server.bytes_received['uploadExperimentalData']
+        exp.close()
+
+    assert progress[-1] == (len(DATA), len(DATA)) and len(progress) > 1
+    with open(str(path), 'rb') as f:
+        encoder = MultipartEncoder({'key': 'KEY'}, 'file', f, compression = compression, checksum = True)
+        body = encoder.read()
+    part = filePart(body, encoder)
+    assert (gzip.decompress(part) if compression else part) == DATA
+    assert hashlib.sha256(DATA).hexdigest().encode() in body
+    if compression:
+        assert received < len(DATA) / 2
+    else:
+        assert encoder.len == len(body) and received > len(DATA)
+
+def test_tables_serialise_identically():
+    pandas = pytest.importorskip('pandas')
+    pyarrow = pytest.importorskip('pyarrow')
+    numpy = pytest.importorskip('numpy')
+
+    frame = pandas.DataFrame({
+        'Protein': ['P1', 'P2', None], 'Position': [10, 20, 30], 'Intensity': [1.5, None, 3.0], 'Flag': [True, False, True]
+    })
+    records = numpy.rec.fromrecords(
+        [('P1', 10, 1.5, True), ('P2', 20, float('nan'), False), ('', 30, 3.0, True)],
+        names = ['Protein', 'Position', 'Intensity', 'Flag']
+    )
+    chunks = [
+        b''.join(tableChunks(_, chunk_rows = 2))
+        for _ in (frame, pyarrow.Table.from_pandas(frame, preserve_index = False), records)
+    ]
+    assert chunks[0] == chunks[1] == chunks[2]
+    assert chunks[0].splitlines()[:2] == [b'Protein\tPosition\tIntensity\tFlag', b'P1\t10\t1.5\tTrue']
+
+    with pytest.raises(ValueError):
+        b''.join(tableChunks(pandas.DataFrame({'Protein': ['P1\tP2']})))
+
+def test_upload_dataframe():
+    pandas = pytest.importorskip('pandas')
+    frame = pandas.DataFrame({'Protein': ['P%s' %i for i in range(1000)], 'Intensity': range(1000)})
+    with FakePhosphomaticsServer() as server:
+        exp = Phosphomatics(key = 'KEY', transport = Transport(server.url), progress = False)
+        exp.startNewExperiment()
+        exp.uploadExperimentalData(frame)
+        assert server.bytes_received['uploadExperimentalData'] > len(b''.join(tableChunks(frame)))
+        exp.close()
@@ -0,0 +1,50 @@
+import pytest
+
+numpy = pytest.importorskip('numpy')
+
+from phosphomatics.phosphomatics import Phosphomatics
+from phosphomatics.transport import Transport
+from phosphomatics.volcano import VolcanoIndex
+from phosphomatics.fakeserver import FakePhosphomaticsServer
+
+FIELDS = {'fc_field': 'log2FC', 'pval_field': 'pval', 'significant_field': 'significant'}
+
+def expected(records, fc, pval):
+    return [abs(_['log2FC']) >= fc and _['pval'] < pval for _ in records]
+
+def test_thresholds_are_applied_locally():
+    with FakePhosphomaticsServer(result_size = 2000) as server:
+        exp = Phosphomatics(key = 'KEY', transport = Transport(server.url), progress = False, local_filtering = FIELDS)
+        exp.startNewExperiment()
+        server.requests.clear()
+
+        for fc, pval in ((1, 0.05), (0.5, 0.2), (1.5, 0.01)):
+            result = exp.makeVolcano(fc = fc, pval = pval, group1 = 'A', group2 = 'B')
+            assert [_['significant'] for _ in result['data']] == expected(result['data'], fc, pval)
+        task = exp.makeKinaseVolcanoPlot(fc = 1, pval = 0.05, wait = False)
+        assert len(task.result(timeout = 5)['data']) == 2000
+        # one fetch per target and non-threshold arguments
+        assert server.requests['apiTask'] == 2
+
+        # other groups need their own statistics, S-curves always go to the server
+        exp.makeVolcano(fc = 1, pval = 0.05, group1 = 'A', group2 = 'C')
+        exp.makeSCurve(group1 = 'A', group2 = 'B')
+        assert server.requests['apiTask'] == 4
+
+        # changing the selected group discards the statistics
+        exp.setSelectedGroup(2)
+        exp.makeVolcano(fc = 1, pval = 0.05, group1 = 'A', group2 = 'B')
+        assert server.requests['apiTask'] == 6
+        exp.close()
+
+def test_index_queries():
+    records = [{'id': i, 'log2FC': (i % 9) - 4, 'pval': i / 100, 'significant': False} for i in range(100)]
+    index = VolcanoIndex({'data': records, 'n': 100}, **FIELDS)
+    assert len(index.filter(fc = 3, pval = 0.5)['data']) == sum(expected(records, 3, 0.5))
+    top = index.top(5, by = 'fc')['data']
+    assert all(abs(_['log2FC']) == 4 for _ in top)
+    assert index.volcano()['n'] == 100 and all(_['significant'] for _ in index.volcano()['data'])
+    with pytest.raises(ValueError):
+        VolcanoIndex({'data': records}, fc_field = 'fc', pval_field = 'pval', significant_field = 'significant')
+    with pytest.raises(ValueError):
+        Phosphomatics(key = 'KEY', lazy_auth = True, local_filtering = True)
@@ -0,0 +1,40 @@
+import pytest
+
+from phosphomatics.phosphomatics import Phosphomatics
+from phosphomatics.transport import Transport
+from phosphomatics.workflow import Workflow
+from phosphomatics.fakeserver import FakePhosphomaticsServer
+
+def test_steps_run_by_group_and_dependency():
+    with FakePhosphomaticsServer(task_latency = 0.2) as server:
+        exp = Phosphomatics(key = 'KEY', transport = Transport(server.url), progress = False)
+        exp.startNewExperiment()
+
+        flow = Workflow(exp)
+        flow.add('process')
+        for group in (1, 2):
+            flow.add('pca%s' %group, 'getPCA', group = group, after = ['process'])
+            flow.add('lda%s' %group, 'getLDA', group = group, after = ['process'], pval = 0.05)
+        flow.add('volcano', 'makeVolcano', group = 'group 1', after = ['pca1'])
+        flow.add('groups', 'getUserDataGroups')
+        assert flow.order().index('process') < flow.order().index('pca1') < flow.order().index('volcano')
+
+        results = flow.run()
+        assert sorted(results) == ['groups', 'lda1', 'lda2', 'pca1', 'pca2', 'process', 'volcano']
+        assert results['pca1']['xLabel'] == 'PC1 (50%)'
+        # every analysis of a group runs while it is selected, so each group is selected once
+        assert flow.switches == 2
+        exp.close()
+
+def test_invalid_graphs():
+    with FakePhosphomaticsServer() as server:
+        exp = Phosphomatics(key = 'KEY', transport = Transport(server.url), progress = False)
+        flow = Workflow(exp)
+        flow.add('a', 'getPCA', after = ['b'])
+        flow.add('b', 'getLDA', after = ['a'])
+        with pytest.raises(ValueError, match = 'cycle'):
+            flow.order()
+        with pytest.raises(ValueError):
+            flow.add('c', 'notAnAnalysis')
+        with pytest.raises(ValueError):
+            flow.add('a', 'getPCA')
@@ -0,0 +1,57 @@
+import os
+import pytest
+
+from phosphomatics.phosphomatics import Phosphomatics
+from phosphomatics.transport import Transport
+from phosphomatics.writers import ParquetSink, HDF5Sink, inferSchema
+from phosphomatics.streaming import writeResult
+from phosphomatics.fakeserver import FakePhosphomaticsServer
+
+pyarrow = pytest.importorskip('pyarrow')
+import pyarrow.parquet
+
+def test_infer_schema():
+    schema = inferSchema([
+        {'n': 1, 'x': 1.5, 'flag': True, 'name': 'a', 'nested': [1], 'mixed': 1, 'empty': None},
+        {'n': 2, 'mixed': 2.5},
+    ])
+    assert schema == {
+        'n': 'int64', 'x': 'float64', 'flag': 'bool', 'name': 'string', 'nested': 'json',
+        'mixed': 'float64', 'empty': 'string'
+    }
+
+def test_schema_grows_and_widens(tmp_path):
+    records = [{'n': i, 'x': i} for i in range(4)] + [{'n': 4, 'x': 0.5, 'extra': 'e'}]
+    sink = ParquetSink(str(tmp_path), batch_size = 2)
+    writeResult(sink, {'data': records, 'count': 5})
+
+    table = pyarrow.parquet.read_table(str(tmp_path / 'data.parquet'))
+    assert str(table.schema.field('n').type) == 'int64'
+    assert str(table.schema.field('x').type) == 'double'
+    assert table.to_pydict() == {
+        'n': [0, 1, 2, 3, 4], 'x': [0.0, 1.0, 2.0, 3.0, 0.5], 'extra': [None] * 4 + ['e']
+    }
+    # only the final table and the fields are left
+    assert sorted(os.listdir(str(tmp_path))) == ['data.parquet', 'fields.json']
+
+def test_typed_columns_and_abort(tmp_path):
+    sink = ParquetSink(str(tmp_path), schema = {'data': {'n': 'int64'}}, batch_size = 1)
+    with pytest.raises(ValueError):
+        writeResult(sink, {'data': [{'n': 1}, {'n': 'one'}]})
+    assert os.listdir(str(tmp_path)) == []
+
+def test_hdf5_missing_integers(tmp_path):
+    h5py = pytest.importorskip('h5py')
+    sink = HDF5Sink(str(tmp_path), batch_size = 2)
+    writeResult(sink, {'data': [{'n': 1}, {'n': 2}, {'n': None}, {'n': 3}]})
+    with h5py.File(str(tmp_path / 'data.h5'), 'r') as f:
+        values = f['n'][:].tolist()
+    assert values[:2] == [1, 2] and values[2] != values[2] and values[3] == 3
+
+def test_analysis_to_sink(tmp_path):
+    with FakePhosphomaticsServer(result_size = 1000) as server:
+        exp = Phosphomatics(key = 'KEY', transport = Transport(server.url), progress = False)
+        exp.startNewExperiment()
+        written = exp.makeVolcano(sink = ParquetSink(str(tmp_path), batch_size = 300))
+        exp.close()
+    assert pyarrow.parquet.read_table(written['data']).num_rows == 1000